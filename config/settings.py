@@ -10,11 +10,15 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# `manage.py test` runs with these settings; a few are adjusted for it below
+TESTING = sys.argv[1:2] == ['test']
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -31,7 +35,10 @@ ALLOWED_HOSTS = ['localhost', '127.0.0.1', 'krishiv2409.pythonanywhere.com', 'ww
 # Application definition
 
 INSTALLED_APPS = [
-    'django.contrib.admin',
+    # Admin modules are autodiscovered when the URLconf loads (config/urls.py),
+    # not in django.setup(), so management commands and the task worker never
+    # import them
+    'django.contrib.admin.apps.SimpleAdminConfig',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -41,6 +48,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'store.requestlog.RequestLogMiddleware',
+    'store.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -48,6 +57,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'store.ratelimit.RateLimitMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -56,19 +66,30 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            # Compiled templates are kept in memory for the life of the process,
+            # so template changes need a restart outside DEBUG
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
         },
     },
 ]
 
 WSGI_APPLICATION = 'config.wsgi.application'
 
+# Load the URLconf, compile templates and read the static manifest when a
+# worker starts (store/warmup.py) instead of on its first requests
+WARM_UP_ON_STARTUP = True
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -81,6 +102,229 @@ DATABASES = {
 }
 
 
+# Cache
+# The default cache is shared by every worker process and by management
+# commands (e.g. build_home_feeds), unlike the per-process LocMemCache.
+# CACHE_PROFILE picks the backend:
+# - 'redis' (pip install redis, and a Redis server): O(1) writes and atomic
+#   incr/add; use it once there are many workers
+# - 'memcached' (pip install pymemcache, and a memcached server): the same
+# - 'file': no server needed. Every set() lists the whole cache directory to
+#   decide whether to cull, so writes cost O(MAX_ENTRIES) (about 2ms per set
+#   at 1000 entries, 10ms at 5000); the cap is kept small and a full cache
+#   drops a random third of its entries. Its incr()
+#   is a non-atomic read and write, so nothing relies on it for counters
+#   shared between processes.
+# Everything cached can be rebuilt: sessions fall back to the database,
+# rate-limit buckets refill, feeds and page stamps are recomputed.
+# Home feeds (store/feed.py) get their own 'feeds' cache, one entry per
+# active user, so filling it cannot cull sessions and rate-limit buckets
+# from the default cache, nor they the feeds. With the file backend it has
+# its own directory and a larger cap: feed writes come mostly from the
+# build_home_feeds batch and cost about 20ms each at FEED_CACHE_MAX_ENTRIES;
+# beyond that many active users, feeds start being rebuilt on the request
+# path, so use redis or memcached at that point.
+
+CACHE_PROFILE = 'file'
+FEED_CACHE_MAX_ENTRIES = 10000
+
+CACHE_BACKENDS = {
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://127.0.0.1:6379/1',
+        'TIMEOUT': 300,
+    },
+    'memcached': {
+        'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+        'LOCATION': '127.0.0.1:11211',
+        'TIMEOUT': 300,
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+        },
+    },
+}
+
+FEED_CACHE = dict(CACHE_BACKENDS[CACHE_PROFILE], KEY_PREFIX='feeds')
+if CACHE_PROFILE == 'file':
+    FEED_CACHE.update(LOCATION=BASE_DIR / 'cache' / 'feeds', OPTIONS={'MAX_ENTRIES': FEED_CACHE_MAX_ENTRIES})
+
+CACHES = {
+    'default': CACHE_BACKENDS[CACHE_PROFILE],
+    'feeds': FEED_CACHE,
+    # Rendered template fragments ({% cache ... using="templates" %}). Keys
+    # include the object's updated_at, so stale entries are never read and a
+    # per-process cache is safe; it saves a file read per fragment.
+    'templates': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'template-fragments',
+        'TIMEOUT': 3600,
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    },
+}
+
+if TESTING:
+    # Keep the test run out of the project's cache directory
+    CACHES = {
+        alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'test-{alias}'}
+        for alias in CACHES
+    }
+
+
+# HTTP caching (store/conditional.py)
+# Anonymous catalog pages may be cached by browsers and proxies for this many
+# seconds. Bump CONDITIONAL_PAGE_VERSION when a deploy changes templates so
+# cached pages are not revalidated as unchanged.
+
+ANONYMOUS_PAGE_MAX_AGE = 60
+CONDITIONAL_PAGE_VERSION = '1'
+
+
+# Quick ratings
+# With RATING_WRITE_BEHIND enabled, submit_rating buffers star clicks in memory
+# and flushes them in bulk (see store/rating_buffer.py). Ratings accepted in
+# the last flush interval are lost if a worker crashes.
+
+RATING_WRITE_BEHIND = False
+RATING_BUFFER_FLUSH_INTERVAL = 2.0  # seconds
+RATING_BUFFER_MAX_SIZE = 1000
+
+
+# Background tasks
+# Queued tasks are run by `python manage.py run_worker`. Set TASK_QUEUE_EAGER
+# to True to run them inline instead (e.g. when no worker is running).
+
+TASK_QUEUE_EAGER = False
+
+
+# API tokens (store/api.py)
+# Clients without a browser session POST their credentials to /api/token/ and
+# send `Authorization: Bearer <token>` to the write endpoints. Tokens are
+# signed with SECRET_KEY and expire after API_TOKEN_MAX_AGE seconds.
+
+API_TOKEN_MAX_AGE = 60 * 60 * 24 * 30
+
+
+# Rate limiting (store/ratelimit.py)
+# Token bucket per client and URL name: (burst capacity, seconds to refill it).
+# Over-limit requests get a 429 with Retry-After.
+
+RATE_LIMITS = {
+    'submit_rating': (30, 60),
+    'api_bulk_rate': (10, 60),
+    'report_review': (10, 300),
+    'add_to_cart': (30, 60),
+    'create_review': (5, 300),
+    'place_order': (5, 60),
+    'login': (10, 300),
+    'api_token': (10, 300),
+}
+
+# Password checks are CPU-bound; at most LOGIN_MAX_CONCURRENT logins per worker
+# process hash at once, so a burst of logins cannot starve catalog requests.
+# A login that waits longer than LOGIN_QUEUE_TIMEOUT seconds for a slot gets a 429.
+
+LOGIN_MAX_CONCURRENT = 2
+LOGIN_QUEUE_TIMEOUT = 2.0
+
+
+# Sessions
+# SESSION_PROFILE picks where session data lives:
+# - 'cached_db': read from the shared cache, written through to the database,
+#   so an authenticated request normally does not query django_session
+# - 'signed_cookies': nothing stored server-side; the data is signed but
+#   readable by the client, and logging out does not revoke copies of the cookie
+# - 'db': Django's default, one django_session query per request
+# Sessions are only saved when modified. Flash messages live in a cookie,
+# so messages.success() does not touch the session at all. Compare the
+# profiles with `manage.py benchmark_sessions`.
+
+SESSION_PROFILE = 'cached_db'
+
+SESSION_ENGINES = {
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+    'db': 'django.contrib.sessions.backends.db',
+}
+
+SESSION_ENGINE = SESSION_ENGINES[SESSION_PROFILE]
+SESSION_CACHE_ALIAS = 'default'
+SESSION_SAVE_EVERY_REQUEST = False
+
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
+
+# Logging (store/requestlog.py)
+# Everything is written as JSON lines to stderr by a background thread, each
+# record tagged with the request's correlation id (also sent back as the
+# X-Request-ID header). Queries slower than SLOW_QUERY_THRESHOLD_MS are logged
+# with their SQL for a SLOW_QUERY_SAMPLE_RATE fraction of them.
+
+SLOW_QUERY_THRESHOLD_MS = 100
+SLOW_QUERY_SAMPLE_RATE = 0.25
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'correlation_id': {
+            '()': 'store.requestlog.CorrelationIdFilter',
+        },
+    },
+    'formatters': {
+        'json': {
+            '()': 'store.requestlog.JsonFormatter',
+        },
+    },
+    'handlers': {
+        'queue': {
+            'class': 'store.requestlog.QueuedStreamHandler',
+            'formatter': 'json',
+            'filters': ['correlation_id'],
+        },
+    },
+    'root': {
+        'handlers': ['queue'],
+        'level': 'WARNING',
+    },
+    'loggers': {
+        'django': {
+            'handlers': ['queue'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+        'store': {
+            'handlers': ['queue'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+if TESTING:
+    # One access line per test request would bury the test runner's output
+    LOGGING['loggers']['store']['level'] = 'WARNING'
+
+
+# Metrics (store/metrics.py)
+# Served at /metrics in the Prometheus text format to METRICS_ALLOWED_IPS.
+# Each worker process writes its counters to METRICS_DIR (from a background
+# thread, every METRICS_FLUSH_INTERVAL seconds) and a scrape sums all of
+# them, folding the files of exited workers into one. Set METRICS_DIR to None
+# for single-process metrics; the test run does, so it leaves no snapshots
+# behind (the snapshot tests use a temporary directory).
+
+METRICS_DIR = None if TESTING else BASE_DIR / 'cache' / 'metrics'
+METRICS_FLUSH_INTERVAL = 1.0
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -99,6 +343,39 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing
+# PASSWORD_HASHER_PROFILE picks the hasher for new and changed passwords:
+# 'argon2' (pip install argon2-cffi), 'scrypt' (no extra dependency) or
+# 'pbkdf2' (Django's default). The other hashers stay listed so existing
+# hashes still verify, and a user's hash is upgraded to the selected hasher
+# the next time they log in. Compare the CPU cost per login of each profile
+# with `manage.py benchmark_login`.
+
+PASSWORD_HASHER_PROFILE = 'scrypt'
+
+PASSWORD_HASHER_PROFILES = {
+    'argon2': [
+        'django.contrib.auth.hashers.Argon2PasswordHasher',
+        'django.contrib.auth.hashers.ScryptPasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    ],
+    'scrypt': [
+        'django.contrib.auth.hashers.ScryptPasswordHasher',
+        'django.contrib.auth.hashers.Argon2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    ],
+    'pbkdf2': [
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+        'django.contrib.auth.hashers.ScryptPasswordHasher',
+        'django.contrib.auth.hashers.Argon2PasswordHasher',
+    ],
+}
+
+PASSWORD_HASHERS = PASSWORD_HASHER_PROFILES[PASSWORD_HASHER_PROFILE]
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -121,10 +398,40 @@ STATICFILES_DIRS = [
     BASE_DIR / "static",
 ]
 
+# collectstatic writes content-hashed copies plus .gz/.br variants
+# (store/staticfiles.py). Outside DEBUG, {% static %} needs the manifest, so
+# run collectstatic before starting the server.
+STORAGES = {
+    # Uploads are stored once per distinct content, under hash-sharded names
+    # (store/mediastorage.py)
+    'default': {
+        'BACKEND': 'store.mediastorage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'store.staticfiles.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# Cache lifetime for hashed static files served by store.staticfiles.serve_static
+STATIC_MAX_AGE = 60 * 60 * 24 * 365
+
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Cache lifetime for content-addressed media served by store.mediastorage.serve_media
+MEDIA_MAX_AGE = 60 * 60 * 24 * 365
+
+# Uploads larger than this are streamed to a temporary file instead of memory
+FILE_UPLOAD_MAX_MEMORY_SIZE = 256 * 1024
+
+# Profile picture uploads (UserProfileForm). Dimensions are read from the
+# image header before anything is decoded, so oversized images are rejected
+# cheaply; avatars are rendered by the process_profile_picture task.
+PROFILE_PICTURE_MAX_BYTES = 5 * 1024 * 1024
+PROFILE_PICTURE_MAX_DIMENSION = 6000  # pixels, either side
+PROFILE_PICTURE_FORMATS = ['JPEG', 'PNG', 'WEBP', 'GIF']
+
 # Login/Logout URLs
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
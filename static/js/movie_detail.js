@@ -0,0 +1,258 @@
+// Star rating and review reporting on the movie detail page. The page passes
+// its settings as data-* attributes on the script tag.
+const config = document.currentScript.dataset;
+
+document.addEventListener('DOMContentLoaded', function() {
+    // ===== Star Rating Functionality =====
+    const starIcons = document.querySelectorAll('.star-icon');
+    const ratingMessage = document.getElementById('rating-message');
+    const userRatingBadge = document.getElementById('user-rating-badge');
+    const avgRatingDisplay = document.getElementById('avg-rating-display');
+    const ratingCount = document.getElementById('rating-count');
+    let currentUserRating = parseInt(config.userRating) || 0;
+    
+    // Initialize stars with user's existing rating
+    if (currentUserRating > 0) {
+        updateStarDisplay(currentUserRating);
+    }
+    
+    // Hover effect
+    starIcons.forEach(function(star) {
+        star.addEventListener('mouseenter', function() {
+            const rating = parseInt(this.getAttribute('data-rating'));
+            highlightStars(rating);
+        });
+    });
+    
+    // Reset to current rating on mouse leave
+    document.getElementById('starRatingInput').addEventListener('mouseleave', function() {
+        if (currentUserRating > 0) {
+            updateStarDisplay(currentUserRating);
+        } else {
+            resetStars();
+        }
+    });
+    
+    // Click to submit rating
+    starIcons.forEach(function(star) {
+        star.addEventListener('click', function() {
+            const rating = parseInt(this.getAttribute('data-rating'));
+            submitRating(rating);
+        });
+    });
+    
+    function highlightStars(rating) {
+        starIcons.forEach(function(star, index) {
+            if (index < rating) {
+                star.classList.remove('far');
+                star.classList.add('fas');
+            } else {
+                star.classList.remove('fas');
+                star.classList.add('far');
+            }
+        });
+    }
+    
+    function resetStars() {
+        starIcons.forEach(function(star) {
+            star.classList.remove('fas');
+            star.classList.add('far');
+        });
+    }
+    
+    function updateStarDisplay(rating) {
+        starIcons.forEach(function(star, index) {
+            if (index < rating) {
+                star.classList.remove('far');
+                star.classList.add('fas');
+            } else {
+                star.classList.remove('fas');
+                star.classList.add('far');
+            }
+        });
+    }
+    
+    function submitRating(rating) {
+        const formData = new FormData();
+        formData.append('rating', rating);
+        
+        fetch(config.ratingUrl, {
+            method: 'POST',
+            headers: {
+                'X-CSRFToken': config.csrfToken,
+            },
+            body: formData
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                currentUserRating = rating;
+                updateStarDisplay(rating);
+                
+                // Update user rating badge
+                if (userRatingBadge) {
+                    userRatingBadge.innerHTML = `<i class="fas fa-check-circle"></i> You rated this ${rating}/5 stars`;
+                } else {
+                    const hint = document.getElementById('rating-hint');
+                    if (hint) {
+                        hint.outerHTML = `<span class="badge bg-success" id="user-rating-badge"><i class="fas fa-check-circle"></i> You rated this ${rating}/5 stars</span>`;
+                    }
+                }
+                
+                // Update average rating display
+                if (avgRatingDisplay) {
+                    avgRatingDisplay.innerHTML = `${data.avg_rating}/5.0 (<span id="rating-count">${data.total_count}</span> rating${data.total_count !== 1 ? 's' : ''})`;
+                } else {
+                    // If no ratings existed before, update the whole section
+                    const ratingStars = document.querySelector('.rating-stars');
+                    ratingStars.innerHTML = `
+                        <i class="fas fa-star"></i>
+                        <i class="far fa-star"></i>
+                        <i class="far fa-star"></i>
+                        <i class="far fa-star"></i>
+                        <i class="far fa-star"></i>
+                        <span class="ms-2" id="avg-rating-display">${data.avg_rating}/5.0 (<span id="rating-count">${data.total_count}</span> rating${data.total_count !== 1 ? 's' : ''})</span>
+                    `;
+                }
+                
+                // Show success message
+                ratingMessage.innerHTML = `
+                    <div class="alert alert-success alert-dismissible fade show" role="alert">
+                        <i class="fas fa-check-circle"></i> ${data.message}
+                        <button type="button" class="btn-close" data-bs-dismiss="alert"></button>
+                    </div>
+                `;
+                
+                // Auto-dismiss after 3 seconds
+                setTimeout(() => {
+                    ratingMessage.innerHTML = '';
+                }, 3000);
+            } else {
+                ratingMessage.innerHTML = `
+                    <div class="alert alert-danger alert-dismissible fade show" role="alert">
+                        <i class="fas fa-exclamation-circle"></i> ${data.message}
+                        <button type="button" class="btn-close" data-bs-dismiss="alert"></button>
+                    </div>
+                `;
+            }
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            ratingMessage.innerHTML = `
+                <div class="alert alert-danger alert-dismissible fade show" role="alert">
+                    <i class="fas fa-exclamation-circle"></i> An error occurred. Please try again.
+                    <button type="button" class="btn-close" data-bs-dismiss="alert"></button>
+                </div>
+            `;
+        });
+    }
+    
+    // ===== Review Reporting Functionality =====
+    const reportButtons = document.querySelectorAll('.report-btn');
+    const reportModal = new bootstrap.Modal(document.getElementById('reportModal'));
+    const confirmReportBtn = document.getElementById('confirmReportBtn');
+    const reportSuccessToast = new bootstrap.Toast(document.getElementById('reportSuccessToast'));
+    
+    let currentReviewId = null;
+    let currentReviewCard = null;
+    
+    reportButtons.forEach(function(button) {
+        button.addEventListener('click', function() {
+            currentReviewId = this.getAttribute('data-review-id');
+            currentReviewCard = this.closest('.col-12');
+            reportModal.show();
+        });
+    });
+    
+    confirmReportBtn.addEventListener('click', function() {
+        if (!currentReviewId) return;
+        
+        // Disable button and show loading state
+        this.disabled = true;
+        this.innerHTML = '<i class="fas fa-spinner fa-spin me-1"></i>Reporting...';
+        
+        fetch(`/reviews/${currentReviewId}/report/`, {
+            method: 'POST',
+            headers: {
+                'X-CSRFToken': config.csrfToken,
+                'Content-Type': 'application/json',
+            },
+        })
+        .then(response => response.json())
+        .then(data => {
+            reportModal.hide();
+            
+            if (data.success) {
+                // Remove the review from the page with animation
+                currentReviewCard.style.transition = 'all 0.4s ease-out';
+                currentReviewCard.style.transform = 'translateX(-100%)';
+                currentReviewCard.style.opacity = '0';
+                
+                setTimeout(() => {
+                    currentReviewCard.remove();
+                    
+                    // Check if there are no more reviews
+                    const remainingReviews = document.querySelectorAll('.col-12 .card');
+                    if (remainingReviews.length === 0) {
+                        const noReviewsHtml = `
+                            <div class="text-center py-4">
+                                <i class="fas fa-comments fa-2x text-muted mb-3"></i>
+                                <p class="text-muted">No reviews yet. Be the first to review this movie!</p>
+                            </div>
+                        `;
+                        document.querySelector('.row:last-child').innerHTML = noReviewsHtml;
+                    }
+                }, 400);
+                
+                // Show success toast
+                reportSuccessToast.show();
+            } else {
+                // Show error modal
+                showErrorModal(data.message);
+            }
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            reportModal.hide();
+            showErrorModal('An error occurred while reporting the review. Please try again.');
+        })
+        .finally(() => {
+            // Reset button state
+            confirmReportBtn.disabled = false;
+            confirmReportBtn.innerHTML = '<i class="fas fa-flag me-1"></i>Report Review';
+            currentReviewId = null;
+            currentReviewCard = null;
+        });
+    });
+    
+    function showErrorModal(message) {
+        const errorModalHtml = `
+            <div class="modal fade" id="errorModal" tabindex="-1">
+                <div class="modal-dialog modal-dialog-centered">
+                    <div class="modal-content">
+                        <div class="modal-header bg-danger text-white">
+                            <h5 class="modal-title">
+                                <i class="fas fa-exclamation-circle me-2"></i>Error
+                            </h5>
+                            <button type="button" class="btn-close btn-close-white" data-bs-dismiss="modal"></button>
+                        </div>
+                        <div class="modal-body">
+                            <p class="mb-0">${message}</p>
+                        </div>
+                        <div class="modal-footer">
+                            <button type="button" class="btn btn-secondary" data-bs-dismiss="modal">Close</button>
+                        </div>
+                    </div>
+                </div>
+            </div>
+        `;
+        
+        document.body.insertAdjacentHTML('beforeend', errorModalHtml);
+        const errorModal = new bootstrap.Modal(document.getElementById('errorModal'));
+        errorModal.show();
+        
+        document.getElementById('errorModal').addEventListener('hidden.bs.modal', function() {
+            this.remove();
+        });
+    }
+});
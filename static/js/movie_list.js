@@ -0,0 +1,36 @@
+// Search-as-you-type suggestions for the movie list search box
+const config = document.currentScript.dataset;
+
+document.addEventListener('DOMContentLoaded', function() {
+    // ===== Search-as-you-type suggestions =====
+    const searchInput = document.querySelector('input[name="search"]');
+    const suggestions = document.getElementById('search-suggestions');
+    let lastQuery = '';
+    let pending = null;
+
+    searchInput.addEventListener('input', function() {
+        const query = this.value.trim();
+        if (query === lastQuery) return;
+        lastQuery = query;
+        clearTimeout(pending);
+        if (!query) {
+            suggestions.innerHTML = '';
+            return;
+        }
+        pending = setTimeout(function() {
+            fetch(config.autocompleteUrl + '?q=' + encodeURIComponent(query))
+                .then(response => response.json())
+                .then(data => {
+                    if (data.query !== lastQuery) return;
+                    suggestions.innerHTML = '';
+                    data.results.forEach(function(result) {
+                        const option = document.createElement('option');
+                        option.value = result.label;
+                        option.label = result.type === 'title' ? 'Movie' : (result.type === 'director' ? 'Director' : 'Cast');
+                        suggestions.appendChild(option);
+                    });
+                })
+                .catch(error => console.error('Error:', error));
+        }, 100);
+    });
+});
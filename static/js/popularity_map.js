@@ -0,0 +1,81 @@
+// Region center points for the map
+const REGIONS = {
+  northeast: { name: "Northeast",  center: [41.3, -73.5], zoom: 5 },
+  southeast: { name: "Southeast",  center: [33.7, -84.4], zoom: 5 },
+  midwest:   { name: "Midwest",    center: [41.2, -89.1], zoom: 5 },
+  west:      { name: "West",       center: [37.7, -119.6], zoom: 5 },
+};
+
+let map;
+
+document.addEventListener('DOMContentLoaded', () => {
+  // Initialize map
+  map = L.map('map').setView([39.5, -98.35], 4); // center of USA
+  L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
+    maxZoom: 18,
+    attribution: '&copy; OpenStreetMap',
+  }).addTo(map);
+
+  // Add markers for each region
+  for (const [key, R] of Object.entries(REGIONS)) {
+    const marker = L.marker(R.center).addTo(map);
+    marker.bindPopup(`${R.name}`);
+    marker.on('click', () => {
+      map.setView(R.center, R.zoom);
+      selectRegion(key);
+    });
+  }
+
+  // Create region buttons (+ global)
+  const btnContainer = document.getElementById('regionButtons');
+
+  const globalBtn = document.createElement('button');
+  globalBtn.textContent = "🌍 Global";
+  globalBtn.className = 'region-btn';
+  globalBtn.onclick = () => selectRegion('global');
+  btnContainer.appendChild(globalBtn);
+
+  for (const [key, R] of Object.entries(REGIONS)) {
+    const btn = document.createElement('button');
+    btn.textContent = R.name;
+    btn.className = 'region-btn';
+    btn.onclick = () => selectRegion(key);
+    btnContainer.appendChild(btn);
+  }
+
+  // ✅ Load global trends on startup
+  selectRegion("global");
+});
+
+async function selectRegion(regionKey) {
+  // Update active button
+  [...document.querySelectorAll('.region-btn')].forEach(b => b.classList.remove('active'));
+  const regionButtons = document.querySelectorAll('.region-btn');
+  for (const btn of regionButtons) {
+    if (btn.textContent.toLowerCase().includes(regionKey)) btn.classList.add('active');
+    if (regionKey === 'global' && btn.textContent.includes('Global')) btn.classList.add('active');
+  }
+
+  // Fetch top movies for region
+  const resp = await fetch(`/api/trending/${regionKey}/`);
+  const data = await resp.json();
+
+  const list = document.getElementById('topList');
+  const title = document.getElementById('panelTitle');
+  title.textContent =
+    regionKey === "global"
+      ? "Top Movies — Global"
+      : `Top Movies — ${REGIONS[regionKey].name}`;
+
+  list.innerHTML = '';
+  if (!data.top || data.top.length === 0) {
+    list.innerHTML = '<li class="muted">No purchases found for this region.</li>';
+    return;
+  }
+
+  data.top.forEach(item => {
+    const li = document.createElement('li');
+    li.innerHTML = `${item.title} <span class="badge">${item.count}</span>`;
+    list.appendChild(li);
+  });
+}
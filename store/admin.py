@@ -1,7 +1,60 @@
-from django.contrib import admin
+from decimal import Decimal
+
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import User
-from .models import Movie, Review, Cart, Order, OrderItem, Rating, UserProfile
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils.functional import cached_property
+from django.utils import timezone
+from . import bulk, moderation
+from .models import Movie, Review, Cart, Order, OrderItem, Rating, UserProfile, RelatedMovie, FacetCount, Person, MovieCredit, Task, DailySales, DailyMovieSales
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that estimates the size of large unfiltered tables.
+
+    An exact COUNT(*) scans the whole table; for an unfiltered changelist the
+    row count the database keeps for its query planner is close enough for
+    page links: pg_class.reltuples on PostgreSQL, sqlite_stat1 on SQLite once
+    ANALYZE has run (prune_stale_data does). Without statistics, and for
+    filtered or small result sets, the count is exact.
+    """
+    exact_count_limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if getattr(queryset, 'query', None) is None or queryset.query.where:
+            return super().count
+        estimate = self._estimate(queryset)
+        if estimate is None or estimate < self.exact_count_limit:
+            return super().count
+        return estimate
+
+    def _estimate(self, queryset):
+        table = queryset.model._meta.db_table
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [table])
+            elif connection.vendor == 'sqlite':
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+                if cursor.fetchone() is None:
+                    return None
+                # The first number of each row's stat is the table's row count
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+            else:
+                return None
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        estimate = int(str(row[0]).split()[0])
+        return estimate if estimate > 0 else None
 
 
 class OrderItemInline(admin.TabularInline):
@@ -9,9 +62,18 @@ class OrderItemInline(admin.TabularInline):
     extra = 0
 
 
+class MovieBulkActionForm(ActionForm):
+    """Extra inputs next to the action dropdown, read by the bulk edit actions"""
+    percent = forms.DecimalField(
+        required=False, label='Price change %', max_digits=6, decimal_places=2, min_value=Decimal('-99.99')
+    )
+    genre = forms.ChoiceField(required=False, choices=[('', 'Genre')] + Movie.GENRE_CHOICES)
+    language = forms.CharField(required=False, max_length=50, label='Language')
+
+
 @admin.register(Movie)
 class MovieAdmin(admin.ModelAdmin):
-    list_display = ['title', 'genre', 'rating', 'release_year', 'price', 'created_at']
+    list_display = ['title', 'genre', 'rating', 'release_year', 'price', 'language', 'created_at']
     list_filter = ['genre', 'rating', 'release_year', 'created_at', 'price']
     search_fields = ['title', 'description', 'director', 'cast']
     ordering = ['-created_at']
@@ -28,6 +90,77 @@ class MovieAdmin(admin.ModelAdmin):
         }),
     )
     readonly_fields = ['created_at', 'updated_at']
+    action_form = MovieBulkActionForm
+    actions = ['change_prices', 'reassign_genre', 'fix_language']
+    
+    def _action_form(self, request):
+        form = self.action_form(request.POST, auto_id=None)
+        form.fields['action'].choices = self.get_action_choices(request)
+        return form
+    
+    def response_action(self, request, queryset):
+        # Django reports any invalid action form as "No action selected";
+        # say which input was wrong instead
+        form = self._action_form(request)
+        if not form.is_valid() and 'action' not in form.errors:
+            for field, errors in form.errors.items():
+                label = form.fields[field].label or field.capitalize()
+                self.message_user(request, f"{label}: {' '.join(errors)}", messages.ERROR)
+            return None
+        return super().response_action(request, queryset)
+    
+    def _action_input(self, request, name, missing):
+        """A cleaned MovieBulkActionForm value, or None after asking for it"""
+        form = self._action_form(request)
+        value = form.cleaned_data.get(name) if form.is_valid() else None
+        if value in (None, ''):
+            self.message_user(request, missing, messages.ERROR)
+            return None
+        return value
+    
+    def _bulk_edit(self, request, operation, queryset, value, describe):
+        try:
+            changed = operation(queryset, value)
+        except ValueError as exc:
+            self.message_user(request, str(exc), messages.ERROR)
+            return
+        self.message_user(request, f'{changed} movie(s) {describe}.')
+    
+    @admin.action(description='Change price of selected movies by percent')
+    def change_prices(self, request, queryset):
+        percent = self._action_input(request, 'percent', 'Enter a price change percentage (e.g. 10 or -15).')
+        if percent is not None:
+            self._bulk_edit(request, bulk.change_prices, queryset, percent, f'repriced by {percent}%')
+    
+    @admin.action(description='Move selected movies to genre')
+    def reassign_genre(self, request, queryset):
+        genre = self._action_input(request, 'genre', 'Choose the genre to move the movies to.')
+        if genre is not None:
+            self._bulk_edit(request, bulk.reassign_genre, queryset, genre, f'moved to {genre}')
+    
+    @admin.action(description='Set language of selected movies')
+    def fix_language(self, request, queryset):
+        language = self._action_input(request, 'language', 'Enter the language to set.')
+        if language is not None:
+            self._bulk_edit(request, bulk.fix_language, queryset, language, f'set to {language}')
+
+
+class MovieCreditInline(admin.TabularInline):
+    model = MovieCredit
+    extra = 0
+    fields = ['movie', 'role', 'order']
+    readonly_fields = ['movie', 'role', 'order']
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Person)
+class PersonAdmin(admin.ModelAdmin):
+    list_display = ['name', 'created_at']
+    search_fields = ['name']
+    inlines = [MovieCreditInline]
 
 
 @admin.register(Rating)
@@ -39,72 +172,152 @@ class RatingAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at', 'updated_at']
 
 
+@admin.register(RelatedMovie)
+class RelatedMovieAdmin(admin.ModelAdmin):
+    list_display = ['movie', 'rank', 'related', 'score', 'computed_at']
+    search_fields = ['movie__title', 'related__title']
+    list_select_related = ['movie', 'related']
+    readonly_fields = ['computed_at']
+
+
+@admin.register(FacetCount)
+class FacetCountAdmin(admin.ModelAdmin):
+    list_display = ['facet', 'value', 'count']
+    list_filter = ['facet']
+
+
 @admin.register(Review)
 class ReviewAdmin(admin.ModelAdmin):
-    list_display = ['user', 'movie', 'rating', 'created_at']
-    list_filter = ['rating', 'created_at']
+    list_display = ['user', 'movie', 'rating', 'is_reported', 'reported_at', 'approved_at', 'created_at']
+    list_filter = ['is_reported', 'rating', 'created_at']
+    list_select_related = ['user', 'movie']
     search_fields = ['user__username', 'movie__title', 'content']
     ordering = ['-created_at']
+    actions = ['approve_reviews', 'remove_reviews']
+
+    @admin.action(description='Approve selected reported reviews')
+    def approve_reviews(self, request, queryset):
+        count = moderation.approve_reviews(list(queryset.values_list('id', flat=True)))
+        self.message_user(request, f'{count} review(s) approved.')
+
+    @admin.action(description='Remove selected reported reviews')
+    def remove_reviews(self, request, queryset):
+        count = moderation.remove_reviews(list(queryset.values_list('id', flat=True)))
+        self.message_user(request, f'{count} review(s) removed.')
+
+
+LINE_TOTAL = ExpressionWrapper(F('quantity') * F('price'), output_field=DecimalField(max_digits=12, decimal_places=2))
 
 
 @admin.register(Cart)
 class CartAdmin(admin.ModelAdmin):
     list_display = ['user', 'get_movie_count', 'get_total_price', 'created_at']
     list_filter = ['created_at']
+    list_select_related = ['user']
     search_fields = ['user__username']
     ordering = ['-created_at']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    
+    def get_queryset(self, request):
+        # Correlated subqueries, as in OrderAdmin, so only the carts on the page are aggregated
+        entries = Cart.movies.through.objects.filter(cart=OuterRef('pk')).order_by().values('cart')
+        return super().get_queryset(request).annotate(
+            movie_count=Coalesce(Subquery(entries.annotate(count=Count('pk')).values('count')), 0),
+            total_price=Subquery(entries.annotate(total=Sum('movie__price')).values('total')),
+        )
     
     def get_movie_count(self, obj):
-        return obj.get_movie_count()
+        return obj.movie_count
     get_movie_count.short_description = 'Movie Count'
+    get_movie_count.admin_order_field = 'movie_count'
     
     def get_total_price(self, obj):
-        return f"${obj.get_total_price():.2f}"
+        return f"${obj.total_price or 0:.2f}"
     get_total_price.short_description = 'Total Price'
+    get_total_price.admin_order_field = 'total_price'
 
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ['id', 'user', 'status', 'get_total_price', 'created_at']
     list_filter = ['status', 'created_at']
+    list_select_related = ['user']
     search_fields = ['user__username']
     ordering = ['-created_at']
     inlines = [OrderItemInline]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    
+    def get_queryset(self, request):
+        # A correlated subquery is only evaluated for the rows on the page,
+        # where a JOIN + GROUP BY would aggregate every order first
+        totals = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order').annotate(
+            total=Sum(LINE_TOTAL)
+        ).values('total')
+        return super().get_queryset(request).annotate(total_price=Subquery(totals))
     
     def get_total_price(self, obj):
-        return f"${obj.get_total_price():.2f}"
+        return f"${obj.total_price or 0:.2f}"
     get_total_price.short_description = 'Total Price'
+    get_total_price.admin_order_field = 'total_price'
 
 
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
     list_display = ['order', 'movie', 'quantity', 'price', 'get_total_price']
     list_filter = ['order__status', 'order__created_at']
+    list_select_related = ['order__user', 'movie']
     search_fields = ['order__user__username', 'movie__title']
     ordering = ['-order__created_at']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(line_total=LINE_TOTAL)
     
     def get_total_price(self, obj):
-        return f"${obj.get_total_price():.2f}"
+        return f"${obj.line_total:.2f}"
     get_total_price.short_description = 'Total Price'
+    get_total_price.admin_order_field = 'line_total'
 
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ['user', 'get_email', 'get_full_name', 'created_at']
     list_filter = ['created_at']
+    list_select_related = ['user']
     search_fields = ['user__username', 'user__email', 'user__first_name', 'user__last_name', 'bio']
     ordering = ['-created_at']
     readonly_fields = ['created_at', 'updated_at']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     
     def get_email(self, obj):
         return obj.user.email
     get_email.short_description = 'Email'
+    get_email.admin_order_field = 'user__email'
     
     def get_full_name(self, obj):
         return f"{obj.user.first_name} {obj.user.last_name}".strip() or "N/A"
     get_full_name.short_description = 'Full Name'
 
 
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'status', 'attempts', 'duration_ms', 'run_at', 'finished_at']
+    list_filter = ['status', 'name']
+    search_fields = ['name']
+    ordering = ['-created_at']
+    readonly_fields = ['created_at', 'finished_at', 'locked_by', 'locked_at', 'duration_ms', 'last_error']
+    actions = ['retry_tasks']
+
+    @admin.action(description='Retry selected tasks now')
+    def retry_tasks(self, request, queryset):
+        updated = queryset.exclude(status='running').update(status='queued', attempts=0, run_at=timezone.now())
+        self.message_user(request, f'{updated} task(s) queued for retry.')
+
+
 # Customize User admin
 class ProfileInline(admin.StackedInline):
     model = UserProfile
@@ -123,3 +336,20 @@ class CustomUserAdmin(UserAdmin):
 # Unregister the default User admin and register our custom one
 admin.site.unregister(User)
 admin.site.register(User, CustomUserAdmin)
+
+
+@admin.register(DailySales)
+class DailySalesAdmin(admin.ModelAdmin):
+    list_display = ['date', 'region', 'orders', 'units', 'revenue', 'computed_at']
+    list_filter = ['region']
+    date_hierarchy = 'date'
+    ordering = ['-date', 'region']
+
+
+@admin.register(DailyMovieSales)
+class DailyMovieSalesAdmin(admin.ModelAdmin):
+    list_display = ['date', 'region', 'movie', 'genre', 'units', 'revenue']
+    list_filter = ['region', 'genre']
+    list_select_related = ['movie']
+    date_hierarchy = 'date'
+    ordering = ['-date', 'region']
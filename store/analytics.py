@@ -0,0 +1,280 @@
+"""
+Sales reporting from daily fact tables.
+
+Order/OrderItem rows are aggregated once into DailySales (per day and
+region) and DailyMovieSales (per day, region and movie), so a report over
+years of orders reads a few thousand small rows instead of every order.
+Cancelled orders are left out.
+
+The facts are maintained incrementally: update_sales_facts() rebuilds only
+the days that have orders created or changed since the last build (the
+refresh_sales_facts task runs it shortly after orders are placed), and
+`manage.py build_sales_facts --full` rebuilds everything, e.g. after orders
+were deleted. Week and month rollups are done with NumPy over the daily
+rows. DailyMovieSales copies each movie's genre for grouping, and changing a
+movie's genre rewrites it on that movie's facts.
+"""
+from datetime import date, datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Max, Min, Sum
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import DailyMovieSales, DailySales, Movie, Order, OrderItem
+
+
+PERIODS = ['day', 'week', 'month']
+METRICS = ['revenue', 'units', 'orders']
+BREAKDOWNS = ['region', 'genre', 'movie']
+DAYS_PER_BATCH = 31
+TOP_MOVIES = 10
+
+# Orders change status a little after they are created; look back this far
+# past the last build so those days are picked up too
+CHANGE_MARGIN = timedelta(minutes=5)
+
+REVENUE = ExpressionWrapper(F('quantity') * F('price'), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+def _rebuild(first, last):
+    """Replace the facts for the days first..last (inclusive)"""
+    # Plain datetime bounds (rather than __date) so the created_at index is used
+    start = timezone.make_aware(datetime.combine(first, time.min))
+    end = timezone.make_aware(datetime.combine(last + timedelta(days=1), time.min))
+    items = OrderItem.objects.exclude(order__status='cancelled').filter(
+        order__created_at__gte=start, order__created_at__lt=end
+    ).annotate(day=F('order__created_at__date')).order_by()
+
+    regions = items.values('day', 'order__region').annotate(
+        orders=Count('order', distinct=True), units=Sum('quantity'), revenue=Sum(REVENUE)
+    )
+    movies = items.values('day', 'order__region', 'movie_id', 'movie__genre').annotate(
+        units=Sum('quantity'), revenue=Sum(REVENUE)
+    )
+
+    with transaction.atomic():
+        DailySales.objects.filter(date__range=(first, last)).delete()
+        DailyMovieSales.objects.filter(date__range=(first, last)).delete()
+        DailySales.objects.bulk_create(
+            DailySales(
+                date=row['day'], region=row['order__region'],
+                orders=row['orders'], units=row['units'], revenue=row['revenue'],
+            )
+            for row in regions
+        )
+        DailyMovieSales.objects.bulk_create(
+            (
+                DailyMovieSales(
+                    date=row['day'], region=row['order__region'], movie_id=row['movie_id'],
+                    genre=row['movie__genre'], units=row['units'], revenue=row['revenue'],
+                )
+                for row in movies
+            ),
+            batch_size=2000,
+        )
+
+
+def rebuild_days(days):
+    """Rebuild the facts for the given dates; returns how many days were rebuilt"""
+    days = sorted(set(days))
+    # Consecutive days are rebuilt together, up to DAYS_PER_BATCH at a time
+    first = previous = None
+    for day in days:
+        if first is not None and (day - previous).days == 1 and (day - first).days < DAYS_PER_BATCH:
+            previous = day
+            continue
+        if first is not None:
+            _rebuild(first, previous)
+        first = previous = day
+    if first is not None:
+        _rebuild(first, previous)
+    return len(days)
+
+
+def _delete_facts_outside(first=None, last=None):
+    for model in (DailySales, DailyMovieSales):
+        facts = model.objects.all()
+        if first is not None:
+            facts = facts.exclude(date__range=(first, last))
+        facts.delete()
+
+
+def rebuild_all_sales_facts(progress=None):
+    """
+    Rebuild every fact row, a month at a time; returns how many days were covered.
+
+    Each month's rows are swapped in its own transaction and days without
+    orders any more are dropped at the end, so reports never see empty
+    tables and the database is not held locked for the whole rebuild.
+    """
+    bounds = Order.objects.aggregate(first=Min('created_at'), last=Max('created_at'))
+    if bounds['first'] is None:
+        with transaction.atomic():
+            _delete_facts_outside()
+        return 0
+
+    first = timezone.localtime(bounds['first']).date()
+    last = timezone.localtime(bounds['last']).date()
+    start = first
+    while start <= last:
+        end = min(date(start.year + start.month // 12, start.month % 12 + 1, 1) - timedelta(days=1), last)
+        _rebuild(start, end)
+        if progress:
+            progress(start, end)
+        start = end + timedelta(days=1)
+    with transaction.atomic():
+        _delete_facts_outside(first, last)
+    return (last - first).days + 1
+
+
+def changed_days():
+    """Dates with orders created or updated since the facts were last built (None: never built)"""
+    built_at = DailySales.objects.aggregate(latest=Max('computed_at'))['latest']
+    if built_at is None:
+        return None
+    return set(
+        Order.objects.filter(updated_at__gte=built_at - CHANGE_MARGIN)
+        .annotate(day=F('created_at__date'))
+        .values_list('day', flat=True)
+        .distinct()
+    )
+
+
+def update_sales_facts():
+    """Incrementally bring the fact tables up to date; returns how many days were rebuilt"""
+    days = changed_days()
+    if days is None:
+        return rebuild_all_sales_facts()
+    return rebuild_days(days)
+
+
+@receiver(post_save, sender=Movie)
+def update_fact_genre(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Regroup a movie's past sales under its new genre"""
+    if raw or (update_fields is not None and 'genre' not in update_fields):
+        return
+    DailyMovieSales.objects.filter(movie_id=instance.pk).exclude(genre=instance.genre).update(genre=instance.genre)
+
+
+def _period_keys(np, days, period):
+    """Map datetime64[D] days to the first day of their period"""
+    if period == 'week':
+        # 1970-01-01 was a Thursday; shift so weeks start on Monday
+        return days - (days.astype('int64') + 3) % 7
+    if period == 'month':
+        return days.astype('datetime64[M]').astype('datetime64[D]')
+    return days
+
+
+def _period_range(np, keys, period):
+    first, last = keys.min(), keys.max()
+    if period == 'month':
+        months = np.arange(first.astype('datetime64[M]'), last.astype('datetime64[M]') + 1)
+        return months.astype('datetime64[D]')
+    step = 7 if period == 'week' else 1
+    return np.arange(first, last + np.timedelta64(step, 'D'), np.timedelta64(step, 'D'))
+
+
+def rollup(dates, groups, values, period='day'):
+    """
+    Sum daily values into periods with NumPy.
+
+    Returns (periods, group keys, matrix) where matrix[g][p] is the total of
+    group g in period p; periods without sales are included as zeros.
+    """
+    import numpy as np
+
+    if not len(dates):
+        return [], [], np.zeros((0, 0))
+
+    keys = _period_keys(np, np.array(dates, dtype='datetime64[D]'), period)
+    periods = _period_range(np, keys, period)
+    period_index = np.searchsorted(periods, keys)
+    group_keys, group_index = np.unique(np.array(groups, dtype=object).astype(str), return_inverse=True)
+
+    matrix = np.zeros((len(group_keys), len(periods)))
+    np.add.at(matrix, (group_index, period_index), np.array(values, dtype=float))
+    return periods.astype(date).tolist(), group_keys.tolist(), matrix
+
+
+def sales_report(period='week', metric='revenue', by='region', start=None, end=None, region=None):
+    """
+    Sales per period, broken down by region, genre or (top) movie.
+
+    Returns {'periods': [...], 'series': [{'key', 'label', 'values', 'total'}],
+    'totals': [...]} with series sorted by total, largest first.
+    """
+    if period not in PERIODS or metric not in METRICS or by not in BREAKDOWNS:
+        raise ValueError('Unknown period, metric or breakdown')
+    if metric == 'orders' and by != 'region':
+        raise ValueError('Order counts are only available by region')
+
+    if by == 'region':
+        facts = DailySales.objects.all()
+    else:
+        facts = DailyMovieSales.objects.all()
+    if start:
+        facts = facts.filter(date__gte=start)
+    if end:
+        facts = facts.filter(date__lte=end)
+    if region:
+        facts = facts.filter(region=region)
+
+    if by == 'region':
+        labels = dict(Order.REGION_CHOICES)
+        group_field = 'region'
+    elif by == 'genre':
+        labels = dict(Movie.GENRE_CHOICES)
+        group_field = 'genre'
+    else:
+        top = facts.values('movie_id').annotate(total=Sum(metric)).order_by('-total')[:TOP_MOVIES]
+        top_ids = [row['movie_id'] for row in top]
+        facts = facts.filter(movie_id__in=top_ids)
+        labels = {str(pk): title for pk, title in Movie.objects.filter(id__in=top_ids).values_list('id', 'title')}
+        group_field = 'movie_id'
+
+    # Collapse regions (and movies, for genres) in SQL so NumPy only sees one row per day and group
+    rows = list(facts.order_by().values_list('date', group_field).annotate(total=Sum(metric)))
+    periods, groups, matrix = rollup(
+        [row[0] for row in rows], [row[1] for row in rows], [row[2] for row in rows], period
+    )
+
+    def number(value):
+        return round(float(value), 2) if metric == 'revenue' else int(value)
+
+    series = [
+        {
+            'key': group,
+            'label': labels.get(group, group),
+            'values': [number(value) for value in matrix[index]],
+            'total': number(matrix[index].sum()),
+        }
+        for index, group in enumerate(groups)
+    ]
+    series.sort(key=lambda item: item['total'], reverse=True)
+    totals = matrix.sum(axis=0) if len(groups) else []
+    return {
+        'period': period,
+        'metric': metric,
+        'by': by,
+        'periods': [day.isoformat() for day in periods],
+        'series': series,
+        'totals': [number(value) for value in totals],
+    }
+
+
+def report_params(params):
+    """Validated sales_report() keyword arguments from a GET QueryDict (raises ValueError)"""
+    options = {
+        'period': params.get('period') or 'week',
+        'metric': params.get('metric') or 'revenue',
+        'by': params.get('by') or 'region',
+        'start': date.fromisoformat(params['start']) if params.get('start') else None,
+        'end': date.fromisoformat(params['end']) if params.get('end') else None,
+        'region': params.get('region') or None,
+    }
+    if options['region'] and options['region'] not in dict(Order.REGION_CHOICES):
+        raise ValueError(f"Unknown region: {options['region']}")
+    return options
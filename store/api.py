@@ -0,0 +1,328 @@
+"""
+Read-optimised JSON API for movies, plus batch lookups and bulk ratings.
+
+Rows come from values() querysets and rating aggregates from two grouped
+queries per response, so no model instances are built. Responses are
+encoded with orjson when it is installed (pip install orjson), falling back
+to the standard library encoder.
+
+Write endpoints accept either the browser session (with the usual CSRF
+check) or a bearer token, for mobile and partner clients that have no CSRF
+cookie: POST {"username": ..., "password": ...} to /api/token/ and send
+`Authorization: Bearer <token>`. Tokens are signed, not stored; they expire
+after API_TOKEN_MAX_AGE seconds and stop working when the user changes
+their password.
+"""
+import json
+from decimal import Decimal
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Sum
+from django.http import HttpResponse
+from django.middleware.csrf import CsrfViewMiddleware
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from . import analytics
+from .conditional import conditional_page
+from .autocomplete import search_movies
+from .facets import apply_facet_filters
+from .models import Movie, MovieCredit, Rating, Review
+from .ratelimit import login_slot, record_rejection
+from .rating_buffer import buffer as rating_buffer
+
+
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+MAX_BATCH_SIZE = 100
+MAX_PAGE = 10000
+# Primary keys are signed 64-bit integers; larger values overflow the lookup
+MAX_ID = 2 ** 63 - 1
+
+TOKEN_SALT = 'store.api.token'
+DEFAULT_TOKEN_MAX_AGE = 60 * 60 * 24 * 30
+
+LIST_FIELDS = ['id', 'title', 'price', 'genre', 'rating', 'release_year', 'duration', 'language', 'image']
+DETAIL_FIELDS = LIST_FIELDS + ['description', 'created_at', 'updated_at']
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def dumps(data):
+    """Serialise to JSON bytes with orjson if available"""
+    try:
+        import orjson
+    except ImportError:
+        return json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+    return orjson.dumps(data, default=_default)
+
+
+class FastJsonResponse(HttpResponse):
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(dumps(data), **kwargs)
+
+
+def _password_fingerprint(user):
+    # Part of the token, so changing the password revokes every issued token
+    return salted_hmac(TOKEN_SALT, user.password).hexdigest()[:16]
+
+
+def issue_token(user):
+    return signing.dumps([user.pk, _password_fingerprint(user)], salt=TOKEN_SALT)
+
+
+def user_from_token(token):
+    """The active user a token was issued to, or None if it is invalid, expired or revoked"""
+    max_age = getattr(settings, 'API_TOKEN_MAX_AGE', DEFAULT_TOKEN_MAX_AGE)
+    try:
+        user_id, fingerprint = signing.loads(token, salt=TOKEN_SALT, max_age=max_age)
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+    user = User.objects.filter(pk=user_id, is_active=True).first()
+    if user is None or not constant_time_compare(fingerprint, _password_fingerprint(user)):
+        return None
+    return user
+
+
+_csrf = CsrfViewMiddleware(lambda request: None)
+
+
+def token_or_session(view):
+    """Authenticate by bearer token (no CSRF needed) or else by session, with CSRF enforced"""
+    @csrf_exempt
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        authorization = request.headers.get('Authorization', '')
+        if authorization.startswith('Bearer '):
+            user = user_from_token(authorization[len('Bearer '):].strip())
+            if user is None:
+                return FastJsonResponse({'error': 'invalid or expired token'}, status=401)
+            request.user = user
+        else:
+            rejected = _csrf.process_view(request, None, (), {})
+            if rejected is not None:
+                return rejected
+        return view(request, *args, **kwargs)
+    return wrapped
+
+
+@csrf_exempt
+@require_POST
+def issue_api_token(request):
+    """Exchange {"username": ..., "password": ...} for a bearer token"""
+    try:
+        body = json.loads(request.body)
+        username, password = body['username'], body['password']
+    except (ValueError, KeyError, TypeError):
+        return FastJsonResponse({'error': 'body must be JSON: {"username": ..., "password": ...}'}, status=400)
+    if not isinstance(username, str) or not isinstance(password, str):
+        return FastJsonResponse({'error': 'username and password must be strings'}, status=400)
+
+    with login_slot() as acquired:
+        if not acquired:
+            record_rejection('api_token')
+            response = FastJsonResponse({'error': 'too many logins right now, try again shortly'}, status=429)
+            response['Retry-After'] = '5'
+            return response
+        user = authenticate(request, username=username, password=password)
+    if user is None:
+        return FastJsonResponse({'error': 'invalid username or password'}, status=401)
+    return FastJsonResponse({
+        'token': issue_token(user),
+        'expires_in': getattr(settings, 'API_TOKEN_MAX_AGE', DEFAULT_TOKEN_MAX_AGE),
+    })
+
+
+def rating_aggregates(movie_ids):
+    """{movie_id: (average, count)} across visible reviews and quick ratings, in two queries"""
+    totals = {movie_id: [0, 0] for movie_id in movie_ids}
+    grouped = [
+        Review.objects.filter(movie_id__in=movie_ids, is_reported=False),
+        Rating.objects.filter(movie_id__in=movie_ids),
+    ]
+    for queryset in grouped:
+        rows = queryset.order_by().values('movie_id').annotate(total=Sum('rating'), count=Count('id'))
+        for row in rows:
+            totals[row['movie_id']][0] += row['total'] or 0
+            totals[row['movie_id']][1] += row['count']
+    return {
+        movie_id: (round(total / count, 2) if count else 0, count)
+        for movie_id, (total, count) in totals.items()
+    }
+
+
+def serialize_movies(rows):
+    """Add rating aggregates and URLs to Movie values() rows (in place); returns the rows"""
+    aggregates = rating_aggregates([row['id'] for row in rows])
+    for row in rows:
+        row['avg_rating'], row['rating_count'] = aggregates[row['id']]
+        row['image'] = default_storage.url(row['image']) if row['image'] else None
+        row['url'] = reverse('movie_detail', args=[row['id']])
+    return rows
+
+
+def _parse_ids(raw):
+    """(unique ids in order, the values that are not ids)"""
+    ids, invalid = [], []
+    for part in raw.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if part.isdigit() and int(part) <= MAX_ID:
+            ids.append(int(part))
+        else:
+            invalid.append(part)
+    return list(dict.fromkeys(ids)), invalid
+
+
+@require_GET
+@conditional_page(lambda request: ['catalog'], anonymous_only=False)
+def movie_list(request):
+    """Paged movies, newest first, filtered by ?q= and the facet parameters"""
+    movies = Movie.objects.all()
+    query = request.GET.get('q', '').strip()
+    if query:
+        # The storefront's search: titles, plus people through the credits table
+        movies = search_movies(movies, query)
+    movies, selected = apply_facet_filters(movies, request.GET)
+
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+        page_size = min(max(int(request.GET.get('page_size', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        return FastJsonResponse({'error': 'page and page_size must be integers'}, status=400)
+    if page > MAX_PAGE:
+        return FastJsonResponse({'error': f'page must be at most {MAX_PAGE}; narrow the search instead'}, status=400)
+
+    # One extra row tells us whether there is a next page without a COUNT query
+    offset = (page - 1) * page_size
+    rows = list(movies.order_by('-created_at', '-id').values(*LIST_FIELDS)[offset:offset + page_size + 1])
+    has_next = len(rows) > page_size
+    rows = rows[:page_size]
+
+    return FastJsonResponse({
+        'page': page,
+        'page_size': page_size,
+        'has_next': has_next,
+        'filters': selected,
+        'results': serialize_movies(rows),
+    })
+
+
+@require_GET
+@conditional_page(lambda request, movie_id: [f'movie:{movie_id}'], anonymous_only=False)
+def movie_detail(request, movie_id):
+    """One movie with its rating aggregate, directors and cast"""
+    rows = list(Movie.objects.filter(id=movie_id).values(*DETAIL_FIELDS))
+    if not rows:
+        return FastJsonResponse({'error': f'movie {movie_id} not found'}, status=404)
+    movie = serialize_movies(rows)[0]
+
+    movie['directors'], movie['cast'] = [], []
+    credits = MovieCredit.objects.filter(movie_id=movie_id).order_by('role', 'order').values_list(
+        'role', 'person_id', 'person__name'
+    )
+    for role, person_id, name in credits:
+        person = {'id': person_id, 'name': name, 'url': reverse('person_detail', args=[person_id])}
+        movie['directors' if role == 'director' else 'cast'].append(person)
+    return FastJsonResponse(movie)
+
+
+@require_GET
+@conditional_page(lambda request: ['catalog'], anonymous_only=False)
+def movie_batch(request):
+    """Many movies by id in one call: ?ids=1,2,3 (results follow the requested order)"""
+    ids, invalid = _parse_ids(request.GET.get('ids', ''))
+    if invalid:
+        return FastJsonResponse({'error': 'ids must be positive integers', 'invalid': invalid}, status=400)
+    if not ids:
+        return FastJsonResponse({'error': 'ids is required, e.g. ?ids=1,2,3'}, status=400)
+    if len(ids) > MAX_BATCH_SIZE:
+        return FastJsonResponse({'error': f'at most {MAX_BATCH_SIZE} ids per request'}, status=400)
+
+    found = {row['id']: row for row in serialize_movies(list(Movie.objects.filter(id__in=ids).values(*LIST_FIELDS)))}
+    return FastJsonResponse({
+        'results': [found[movie_id] for movie_id in ids if movie_id in found],
+        'missing': [movie_id for movie_id in ids if movie_id not in found],
+    })
+
+
+@require_POST
+@token_or_session
+def bulk_rate(request):
+    """
+    Rate many movies at once for the logged-in or token-authenticated user.
+
+    Body: {"ratings": [{"movie_id": 1, "rating": 4}, ...]}. The batch is
+    validated as a whole and written in one upsert; nothing is saved if any
+    entry is invalid.
+    """
+    if not request.user.is_authenticated:
+        return FastJsonResponse({'error': 'authentication required'}, status=401)
+
+    try:
+        entries = json.loads(request.body)['ratings']
+    except (ValueError, KeyError, TypeError):
+        return FastJsonResponse({'error': 'body must be JSON: {"ratings": [{"movie_id": ..., "rating": ...}]}'}, status=400)
+    if not isinstance(entries, list) or not entries:
+        return FastJsonResponse({'error': 'ratings must be a non-empty list'}, status=400)
+    if len(entries) > MAX_BATCH_SIZE:
+        return FastJsonResponse({'error': f'at most {MAX_BATCH_SIZE} ratings per request'}, status=400)
+
+    valid, errors = [], []
+    for index, entry in enumerate(entries):
+        movie_id = entry.get('movie_id') if isinstance(entry, dict) else None
+        value = entry.get('rating') if isinstance(entry, dict) else None
+        if type(movie_id) is not int or type(value) is not int:
+            errors.append({'index': index, 'error': 'movie_id and rating must be integers'})
+        elif not 1 <= value <= 5:
+            errors.append({'index': index, 'error': 'rating must be between 1 and 5'})
+        else:
+            valid.append((index, movie_id, value))
+
+    existing = set(Movie.objects.filter(id__in={movie_id for _, movie_id, _ in valid}).values_list('id', flat=True))
+    errors += [
+        {'index': index, 'error': f'movie {movie_id} not found'}
+        for index, movie_id, _ in valid if movie_id not in existing
+    ]
+    if errors:
+        return FastJsonResponse({'success': False, 'errors': sorted(errors, key=lambda error: error['index'])}, status=400)
+
+    # A later entry for the same movie wins
+    ratings = {(movie_id, request.user.id): value for _, movie_id, value in valid}
+    # Supersedes clicks of this user still waiting in the write-behind buffer
+    saved = rating_buffer.write_through(ratings)
+    aggregates = rating_aggregates(sorted(existing))
+    return FastJsonResponse({
+        'success': True,
+        'saved': saved,
+        'movies': [
+            {'id': movie_id, 'avg_rating': average, 'rating_count': count}
+            for movie_id, (average, count) in aggregates.items()
+        ],
+    })
+
+
+@require_GET
+def sales_report(request):
+    """Staff-only sales rollups: ?period=day|week|month&metric=revenue|units|orders&by=region|genre|movie"""
+    if not request.user.is_staff:
+        return FastJsonResponse({'error': 'staff only'}, status=403)
+    try:
+        report = analytics.sales_report(**analytics.report_params(request.GET))
+    except ValueError as exc:
+        return FastJsonResponse({'error': str(exc)}, status=400)
+    return FastJsonResponse(report)
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class StoreConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'store'
+
+    def ready(self):
+        # Register signal handlers that live outside models.py
+        from . import analytics, autocomplete, conditional, credits, facets, maintenance, tasks  # noqa: F401
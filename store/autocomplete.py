@@ -0,0 +1,165 @@
+"""
+In-process prefix index for search-as-you-type.
+
+Titles (from Movie) and directors and cast (from Person, through
+MovieCredit) are normalised and stored in one sorted list, with an extra
+entry for every word start so "knight" finds "The Dark Knight". A lookup is
+two bisects plus a short scan.
+
+The index is built lazily per process. Its version is a random token in the
+shared cache that every change to movies or people replaces
+(catalog_changed); each process compares it with the token it built from at
+most every VERSION_CHECK_INTERVAL seconds and rebuilds when it differs.
+Replacing a token needs no atomic increment, and an evicted token only
+causes one extra rebuild, so the check is one cache read and never scans
+the movie table.
+"""
+import threading
+import time
+import unicodedata
+import uuid
+from bisect import bisect_left
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Movie, MovieCredit, Person
+
+
+DEFAULT_LIMIT = 10
+VERSION_CHECK_INTERVAL = 2.0  # seconds; how stale another process's edits may look
+VERSION_CACHE_KEY = 'autocomplete:version'
+
+
+def normalize(text):
+    """Lowercase and strip accents so "Amélie" matches "ame" """
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).lower().strip()
+
+
+def catalog_terms():
+    """(kind, display text, movie or person id) for every title, director and cast member"""
+    for movie_id, title in Movie.objects.values_list('id', 'title').iterator(chunk_size=5000):
+        yield 'title', title, movie_id
+    people = MovieCredit.objects.values_list('role', 'person__name', 'person_id').order_by().distinct()
+    for role, name, person_id in people.iterator(chunk_size=5000):
+        yield role, name, person_id
+
+
+def term_keys(text):
+    """The full normalised text plus one key per following word start"""
+    words = normalize(text).split()
+    return {' '.join(words[i:]) for i in range(len(words))}
+
+
+class PrefixIndex:
+    """Sorted (key, kind, text, id) entries searched by prefix"""
+
+    def __init__(self):
+        self.entries = []
+        self.version = None
+        self.checked_at = 0.0
+
+    def build(self, terms, version=None):
+        entries = sorted(
+            (key, kind, text, target_id)
+            for kind, text, target_id in terms
+            for key in term_keys(text)
+        )
+        # One assignment, so concurrent searches see the old or the new list
+        self.entries = entries
+        self.version = version
+
+    def search(self, query, limit=DEFAULT_LIMIT, kinds=None):
+        """Up to `limit` distinct suggestions whose key starts with `query` (of the given kinds)"""
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        entries = self.entries
+        position = bisect_left(entries, (prefix,))
+        results = []
+        seen = set()
+        while position < len(entries) and len(results) < limit:
+            key, kind, text, target_id = entries[position]
+            if not key.startswith(prefix):
+                break
+            position += 1
+            if kinds is not None and kind not in kinds:
+                continue
+            # A title or person matched by several word starts is suggested once
+            if (kind, target_id) in seen:
+                continue
+            seen.add((kind, target_id))
+            results.append({
+                'type': kind,
+                'label': text,
+                'movie_id': target_id if kind == 'title' else None,
+                'person_id': None if kind == 'title' else target_id,
+            })
+        return results
+
+
+index = PrefixIndex()
+_build_lock = threading.Lock()
+
+
+def catalog_version():
+    """The shared version token, created if it was never set or was evicted"""
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_CACHE_KEY)
+    return version
+
+
+def catalog_changed():
+    """Make every process rebuild its index on its next version check"""
+    cache.set(VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+    index.checked_at = 0.0
+
+
+def get_index():
+    """The process-local index, rebuilt if the catalog changed"""
+    now = time.monotonic()
+    if index.version is None or now - index.checked_at >= VERSION_CHECK_INTERVAL:
+        with _build_lock:
+            # Read before the rows: a change in between only causes another rebuild
+            version = catalog_version()
+            index.checked_at = now
+            if index.version != version:
+                index.build(catalog_terms(), version=version)
+    return index
+
+
+def suggest(query, limit=DEFAULT_LIMIT):
+    return get_index().search(query, limit=limit)
+
+
+def matching_people(query, limit=200):
+    """Ids of directors and cast members with a word starting with `query`"""
+    results = get_index().search(query, limit=limit, kinds=('director', 'cast'))
+    return {result['person_id'] for result in results}
+
+
+def search_movies(movies, query):
+    """
+    Filter `movies` to titles containing `query` or credits of a person
+    matching it: people are found by name prefix in the index, then matched
+    through the indexed credits table rather than by scanning credit text
+    """
+    credits = MovieCredit.objects.filter(person_id__in=matching_people(query))
+    return movies.filter(Q(title__icontains=query) | Q(id__in=credits.values('movie_id')))
+
+
+# Credits are rewritten after a movie is saved (store/credits.py), which
+# calls catalog_changed() again once they are in place
+
+@receiver(post_save, sender=Movie)
+@receiver(post_delete, sender=Movie)
+@receiver(post_save, sender=Person)
+@receiver(post_delete, sender=Person)
+def refresh_autocomplete(sender, instance, raw=False, **kwargs):
+    if not raw:
+        catalog_changed()
@@ -0,0 +1,77 @@
+"""
+Set-based bulk edits of the catalog (price changes, genre and language fixes).
+
+Saving movies one at a time fires the facet, autocomplete, credits and
+conditional-GET signals for every row. These helpers instead run one UPDATE
+per chunk of ids (no signals), then invalidate what depends on the changed
+columns once per chunk (page stamps) or once per operation (facet counts,
+cached feeds). updated_at is bumped in the same UPDATE, so template
+fragments keyed on it are not reused.
+
+Titles, directors and cast are never touched here, so the autocomplete index
+and the credits table stay valid.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest, Round
+from django.utils import timezone
+
+from .conditional import touch
+from .facets import rebuild_facet_counts
+from .feed import invalidate_feeds
+from .models import DailyMovieSales, Movie
+
+
+CHUNK_SIZE = 1000
+MIN_PRICE = Decimal('0.01')
+
+
+def _apply(queryset, updates, chunk_size=CHUNK_SIZE, progress=None, extra=None):
+    """UPDATE the movies in `queryset` chunk by chunk; returns the number of movies changed"""
+    ids = list(queryset.order_by('id').values_list('id', flat=True))
+    changed = 0
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        with transaction.atomic():
+            changed += Movie.objects.filter(id__in=chunk).update(updated_at=timezone.now(), **updates)
+            if extra:
+                extra(chunk)
+        touch('catalog', *(f'movie:{movie_id}' for movie_id in chunk))
+        if progress:
+            progress(min(start + chunk_size, len(ids)), len(ids))
+
+    if changed:
+        rebuild_facet_counts()
+        invalidate_feeds()
+    return changed
+
+
+def change_prices(queryset, percent, **options):
+    """Raise (or, with a negative percent, lower) prices by `percent`, rounded to cents"""
+    percent = Decimal(str(percent))
+    if percent <= -100:
+        raise ValueError('A price cut must be less than 100%')
+    factor = 1 + percent / 100
+    new_price = Greatest(Round(F('price') * Value(factor), 2), Value(MIN_PRICE))
+    return _apply(queryset, {'price': new_price}, **options)
+
+
+def reassign_genre(queryset, genre, **options):
+    """Move movies to another genre (the sales facts keep a copy of the genre, so update them too)"""
+    if genre not in dict(Movie.GENRE_CHOICES):
+        raise ValueError(f'Unknown genre: {genre}')
+
+    def update_facts(chunk):
+        DailyMovieSales.objects.filter(movie_id__in=chunk).update(genre=genre)
+
+    return _apply(queryset.exclude(genre=genre), {'genre': genre}, extra=update_facts, **options)
+
+
+def fix_language(queryset, language, **options):
+    """Set the language of the movies (e.g. to merge 'english' and 'English ' into 'English')"""
+    language = language.strip()
+    if not language:
+        raise ValueError('Language cannot be empty')
+    return _apply(queryset.exclude(language=language), {'language': language}, **options)
@@ -0,0 +1,145 @@
+"""
+HTTP conditional GET and cache headers for the public catalog pages.
+
+Each page depends on a "scope" (the whole catalog, one movie, or the
+orders behind the trending API). The last change to a scope is stamped in
+the shared cache by the signal handlers below, so computing ETag and
+Last-Modified costs one cache read and no database query. On a cold cache
+the stamp is rebuilt from the updated_at columns.
+
+Anonymous responses get validators and a short public max-age, so a front
+proxy can serve them and browsers get 304s for unchanged pages. Pages for
+logged-in users (navbar, cart badge, messages) are marked private and
+no-cache. Every response varies on Cookie.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db.models import Max
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from .models import Movie, Order, Rating, Review
+
+
+def _scope_key(scope):
+    return f'last_modified:{scope}'
+
+
+def touch(*scopes):
+    """Record that the given scopes changed now"""
+    now = timezone.now()
+    cache.set_many({_scope_key(scope): now for scope in scopes}, None)
+
+
+def _latest(*querysets):
+    stamps = [qs.aggregate(latest=Max('updated_at'))['latest'] for qs in querysets]
+    stamps = [stamp for stamp in stamps if stamp is not None]
+    return max(stamps) if stamps else timezone.now()
+
+
+def _rebuild_stamp(scope):
+    if scope == 'catalog':
+        return _latest(Movie.objects.all(), Review.objects.all(), Rating.objects.all())
+    if scope == 'orders':
+        return _latest(Order.objects.all())
+    if scope.startswith('movie:'):
+        movie_id = int(scope.split(':', 1)[1])
+        return _latest(
+            Movie.objects.filter(id=movie_id),
+            Review.objects.filter(movie_id=movie_id),
+            Rating.objects.filter(movie_id=movie_id),
+        )
+    # Scopes without a backing table (e.g. 'recommendations') start fresh
+    return timezone.now()
+
+
+def last_modified(*scopes):
+    """Latest change across scopes ('catalog', 'orders', 'recommendations' or 'movie:<id>')"""
+    keys = {scope: _scope_key(scope) for scope in scopes}
+    found = cache.get_many(keys.values())
+    stamps = []
+    for scope, key in keys.items():
+        stamp = found.get(key)
+        if stamp is None:
+            stamp = _rebuild_stamp(scope)
+            cache.add(key, stamp, None)
+        stamps.append(stamp)
+    return max(stamps)
+
+
+def _has_pending_messages(request):
+    # len() loads the stored messages without marking them as displayed
+    return len(get_messages(request)) > 0
+
+
+def conditional_page(scopes_func, anonymous_only=True):
+    """
+    Serve a view with ETag/Last-Modified validators.
+
+    `scopes_func(request, *args, **kwargs)` returns the scopes the page depends
+    on. With anonymous_only (the default) pages rendered for logged-in users
+    skip validation and are marked private; pass False for responses that
+    don't depend on the user at all.
+    """
+    def decorator(view):
+        def modified(request, *args, **kwargs):
+            return last_modified(*scopes_func(request, *args, **kwargs))
+
+        def etag(request, *args, **kwargs):
+            stamp = modified(request, *args, **kwargs)
+            version = getattr(settings, 'CONDITIONAL_PAGE_VERSION', '1')
+            token = f'{view.__name__}:{request.get_full_path()}:{stamp.isoformat()}:{version}'
+            return hashlib.md5(token.encode()).hexdigest()
+
+        conditional_view = condition(etag_func=etag, last_modified_func=modified)(view)
+
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if anonymous_only and (request.user.is_authenticated or _has_pending_messages(request)):
+                response = view(request, *args, **kwargs)
+                patch_cache_control(response, private=True, no_cache=True)
+            else:
+                response = conditional_view(request, *args, **kwargs)
+                patch_cache_control(
+                    response, public=True, max_age=getattr(settings, 'ANONYMOUS_PAGE_MAX_AGE', 60)
+                )
+            patch_vary_headers(response, ['Cookie'])
+            return response
+        return wrapped
+    return decorator
+
+
+@receiver(post_save, sender=Movie)
+@receiver(post_delete, sender=Movie)
+def touch_movie(sender, instance, raw=False, **kwargs):
+    if not raw:
+        touch('catalog', f'movie:{instance.pk}')
+
+
+@receiver(post_delete, sender=Movie)
+def touch_recommendations(sender, instance, **kwargs):
+    # The movie drops out of other movies' related lists (cascade), which no
+    # remaining movie scope records
+    touch('recommendations')
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+def touch_movie_feedback(sender, instance, raw=False, **kwargs):
+    if not raw:
+        touch('catalog', f'movie:{instance.movie_id}')
+
+
+@receiver(post_save, sender=Order)
+def touch_orders(sender, instance, raw=False, **kwargs):
+    if not raw:
+        touch('orders')
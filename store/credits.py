@@ -0,0 +1,125 @@
+"""
+Normalised cast and director credits.
+
+Movie.director and Movie.cast stay the editable source (admin, sample data),
+and are parsed once into Person/MovieCredit rows whenever a movie is saved.
+"All movies with actor X" then becomes an indexed join on MovieCredit
+instead of a LIKE scan over the cast text.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .autocomplete import catalog_changed
+from .models import Movie, MovieCredit, Person
+
+
+def split_names(text):
+    """Comma-separated names, stripped and de-duplicated in order"""
+    names = []
+    for name in (text or '').split(','):
+        name = ' '.join(name.split())
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def parse_credits(movie):
+    """(name, role, order) tuples for a movie's director and cast text"""
+    credits = [(name, 'director', i) for i, name in enumerate(split_names(movie.director))]
+    credits += [(name, 'cast', i) for i, name in enumerate(split_names(movie.cast))]
+    return credits
+
+
+def _people_by_name(names, person_model=Person):
+    """Fetch or create Person rows for every name in one round trip each way"""
+    people = dict(person_model.objects.filter(name__in=names).values_list('name', 'id'))
+    missing = [name for name in names if name not in people]
+    if missing:
+        person_model.objects.bulk_create([person_model(name=name) for name in missing], ignore_conflicts=True)
+        people.update(person_model.objects.filter(name__in=missing).values_list('name', 'id'))
+    return people
+
+
+def rebuild_movie_credits(movies, person_model=Person, credit_model=MovieCredit, batch_size=500):
+    """
+    Bring the credits of `movies` (any iterable of Movie-like objects) in line
+    with their text, in batches. Only the difference is written: removed
+    credits are deleted, reordered ones updated, new ones created, and people
+    left with no credits at all are deleted. Returns the number of rows changed.
+    """
+    total = 0
+    batch = []
+
+    def flush():
+        parsed = {movie.id: parse_credits(movie) for movie in batch}
+        names = {name for credits in parsed.values() for name, _, _ in credits}
+        with transaction.atomic():
+            people = _people_by_name(sorted(names), person_model)
+            wanted = {
+                (movie_id, people[name], role): order
+                for movie_id, credits in parsed.items()
+                for name, role, order in credits
+            }
+            stale, reordered, dropped_people = [], [], set()
+            for credit in credit_model.objects.filter(movie_id__in=list(parsed)).order_by():
+                order = wanted.pop((credit.movie_id, credit.person_id, credit.role), None)
+                if order is None:
+                    stale.append(credit.id)
+                    dropped_people.add(credit.person_id)
+                elif order != credit.order:
+                    credit.order = order
+                    reordered.append(credit)
+            if stale:
+                credit_model.objects.filter(id__in=stale).delete()
+                person_model.objects.filter(id__in=dropped_people, credits__isnull=True).delete()
+            credit_model.objects.bulk_update(reordered, ['order'])
+            credit_model.objects.bulk_create([
+                credit_model(movie_id=movie_id, person_id=person_id, role=role, order=order)
+                for (movie_id, person_id, role), order in wanted.items()
+            ])
+        return len(stale) + len(reordered) + len(wanted)
+
+    for movie in movies:
+        batch.append(movie)
+        if len(batch) >= batch_size:
+            total += flush()
+            batch = []
+    if batch:
+        total += flush()
+    return total
+
+
+def sync_movie_credits(movie):
+    return rebuild_movie_credits([movie])
+
+
+def split_credits(movie):
+    """(directors, cast) Person lists for a movie, from one query"""
+    directors, cast = [], []
+    for credit in movie.credits.select_related('person').order_by('role', 'order'):
+        (directors if credit.role == 'director' else cast).append(credit.person)
+    return directors, cast
+
+
+@receiver(post_save, sender=Movie)
+def update_movie_credits(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and not {'director', 'cast'} & set(update_fields):
+        return
+    if sync_movie_credits(instance):
+        catalog_changed()
+
+
+@receiver(pre_delete, sender=Movie)
+def remember_credited_people(sender, instance, **kwargs):
+    # The credits are gone by post_delete (cascade), so note who they were for
+    instance._credited_people = list(instance.credits.values_list('person_id', flat=True))
+
+
+@receiver(post_delete, sender=Movie)
+def delete_uncredited_people(sender, instance, **kwargs):
+    people = getattr(instance, '_credited_people', None)
+    if people:
+        Person.objects.filter(id__in=people, credits__isnull=True).delete()
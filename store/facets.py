@@ -0,0 +1,242 @@
+"""
+Faceted browsing for the movie list.
+
+Counts per facet value live in the FacetCount table and are adjusted
+incrementally by the Movie save/delete signals below, so rendering the
+facet sidebar is one small query instead of a GROUP BY per facet. Bulk
+writes (bulk_create, queryset.update) bypass signals; call
+rebuild_facet_counts() afterwards.
+
+Once the list is narrowed (a search, a person or a selected facet value),
+catalog totals no longer match what clicking an option returns, so the
+counts are computed from the filtered queryset instead: one grouped query
+per facet, each ignoring that facet's own selection, since choosing another
+value of a facet replaces the selected one. Those counts are cached per
+normalised filter set and catalog stamp (get_filtered_facet_counts), so
+only the first request for a filter combination after a catalog change
+runs the grouped queries.
+"""
+import hashlib
+import json
+from collections import Counter
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, CharField, Count, F, Q, Value, When
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .conditional import last_modified
+from .metrics import record_cache_lookup
+from .models import FacetCount, Movie
+
+
+PRICE_BUCKETS = [
+    # (value, label, minimum inclusive, maximum exclusive)
+    ('under-10', 'Under $10', None, Decimal('10')),
+    ('10-15', '$10 - $15', Decimal('10'), Decimal('15')),
+    ('15-20', '$15 - $20', Decimal('15'), Decimal('20')),
+    ('20-plus', '$20 and up', Decimal('20'), None),
+]
+
+FACETS = [
+    # (facet name, label)
+    ('genre', 'Genre'),
+    ('rating', 'Rated'),
+    ('decade', 'Release Year'),
+    ('language', 'Language'),
+    ('price', 'Price'),
+]
+FACET_NAMES = [name for name, _ in FACETS]
+FACET_FIELDS = ['genre', 'rating', 'release_year', 'language', 'price']
+FILTERED_COUNTS_TIMEOUT = 60 * 10
+
+
+def price_bucket(price):
+    for value, _, low, high in PRICE_BUCKETS:
+        if (low is None or price >= low) and (high is None or price < high):
+            return value
+    return PRICE_BUCKETS[-1][0]
+
+
+def decade_of(year):
+    return f'{year // 10 * 10}s'
+
+
+def facet_values(movie):
+    """Facet value of each facet for a single movie"""
+    return {
+        'genre': movie.genre,
+        'rating': movie.rating,
+        'decade': decade_of(movie.release_year),
+        'language': movie.language,
+        'price': price_bucket(Decimal(str(movie.price))),
+    }
+
+
+def facet_filter(facet, value):
+    """Q object selecting movies with the given facet value (None if invalid)"""
+    if facet in ('genre', 'rating', 'language'):
+        return Q(**{facet: value})
+    if facet == 'decade':
+        try:
+            start = int(value.rstrip('s'))
+        except ValueError:
+            return None
+        return Q(release_year__gte=start, release_year__lt=start + 10)
+    if facet == 'price':
+        for bucket, _, low, high in PRICE_BUCKETS:
+            if bucket == value:
+                condition = Q()
+                if low is not None:
+                    condition &= Q(price__gte=low)
+                if high is not None:
+                    condition &= Q(price__lt=high)
+                return condition
+    return None
+
+
+def apply_facet_filters(queryset, params):
+    """Filter a Movie queryset by the facet parameters in `params`; returns (queryset, selected)"""
+    selected = {}
+    for facet in FACET_NAMES:
+        value = params.get(facet)
+        if not value:
+            continue
+        condition = facet_filter(facet, value)
+        if condition is not None:
+            queryset = queryset.filter(condition)
+            selected[facet] = value
+    return queryset, selected
+
+
+def _value_label(facet, value):
+    if facet == 'genre':
+        return dict(Movie.GENRE_CHOICES).get(value, value)
+    if facet == 'price':
+        return {bucket: label for bucket, label, _, _ in PRICE_BUCKETS}.get(value, value)
+    return value
+
+
+def _group_expression(facet):
+    """Expression grouping movies by their value of `facet`"""
+    if facet == 'decade':
+        return (F('release_year') / 10) * 10
+    if facet == 'price':
+        return Case(
+            *[When(facet_filter('price', bucket), then=Value(bucket)) for bucket, _, _, _ in PRICE_BUCKETS],
+            output_field=CharField(),
+        )
+    return F(facet)
+
+
+def _filtered_counts(queryset, params):
+    """(facet, value, count) for the movies in `queryset` matching every other facet's selection"""
+    for facet in FACET_NAMES:
+        others = {name: value for name, value in params.items() if name in FACET_NAMES and name != facet}
+        narrowed, _ = apply_facet_filters(queryset, others)
+        grouped = (
+            narrowed.order_by()
+            .annotate(facet_value=_group_expression(facet))
+            .values('facet_value')
+            .annotate(count=Count('id'))
+            .values_list('facet_value', 'count')
+        )
+        for value, count in grouped:
+            if value is not None:
+                yield facet, decade_of(value) if facet == 'decade' else value, count
+
+
+def get_facet_counts(queryset=None, params=None):
+    """
+    {facet: [(value, label, count)]} for every value with at least one movie.
+
+    Without a queryset these are the precomputed catalog totals; pass the
+    (search/person filtered) queryset and the request parameters to count
+    what each option would actually return.
+    """
+    counts = {facet: [] for facet in FACET_NAMES}
+    if queryset is None:
+        rows = FacetCount.objects.filter(count__gt=0).values_list('facet', 'value', 'count')
+    else:
+        rows = _filtered_counts(queryset, params or {})
+    for facet, value, count in rows:
+        if facet in counts:
+            counts[facet].append((value, _value_label(facet, value), count))
+    counts['decade'].sort(reverse=True)
+    counts['price'].sort(key=lambda option: [bucket for bucket, _, _, _ in PRICE_BUCKETS].index(option[0]))
+    return counts
+
+
+def get_filtered_facet_counts(queryset, selected, filters):
+    """
+    get_facet_counts(queryset, selected), cached.
+
+    `selected` is the facet selection from apply_facet_filters() and
+    `filters` describes how `queryset` was narrowed before it (e.g. the
+    search text and person id). The key includes the catalog stamp, so any
+    movie change starts fresh entries instead of serving stale counts.
+    """
+    token = json.dumps(
+        [sorted(filters.items()), sorted(selected.items()), last_modified('catalog').isoformat()], default=str
+    )
+    key = f'facets:filtered:{hashlib.md5(token.encode()).hexdigest()}'
+    counts = cache.get(key)
+    record_cache_lookup('facet_counts', counts is not None)
+    if counts is None:
+        counts = get_facet_counts(queryset, selected)
+        cache.set(key, counts, FILTERED_COUNTS_TIMEOUT)
+    return counts
+
+
+def adjust_facet_counts(values, delta):
+    """Add `delta` to the count of each (facet, value) pair"""
+    for facet, value in values.items():
+        updated = FacetCount.objects.filter(facet=facet, value=value).update(count=F('count') + delta)
+        if not updated:
+            FacetCount.objects.get_or_create(facet=facet, value=value, defaults={'count': max(delta, 0)})
+
+
+def rebuild_facet_counts():
+    """Recompute every facet count from the Movie table"""
+    counter = Counter()
+    for movie in Movie.objects.only(*FACET_FIELDS).iterator(chunk_size=5000):
+        counter.update(facet_values(movie).items())
+
+    with transaction.atomic():
+        FacetCount.objects.all().delete()
+        FacetCount.objects.bulk_create(
+            FacetCount(facet=facet, value=value, count=count) for (facet, value), count in counter.items()
+        )
+    return len(counter)
+
+
+@receiver(pre_save, sender=Movie)
+def remember_facet_values(sender, instance, **kwargs):
+    """Keep the values stored before this save so post_save can move the counts"""
+    instance._previous_facet_values = None
+    if instance.pk:
+        previous = Movie.objects.filter(pk=instance.pk).only(*FACET_FIELDS).first()
+        if previous is not None:
+            instance._previous_facet_values = facet_values(previous)
+
+
+@receiver(post_save, sender=Movie)
+def update_facet_counts(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    current = facet_values(instance)
+    previous = getattr(instance, '_previous_facet_values', None)
+    if previous is None:
+        adjust_facet_counts(current, 1)
+        return
+    changed = {facet for facet in current if current[facet] != previous[facet]}
+    if changed:
+        adjust_facet_counts({facet: previous[facet] for facet in changed}, -1)
+        adjust_facet_counts({facet: current[facet] for facet in changed}, 1)
+
+
+@receiver(post_delete, sender=Movie)
+def remove_facet_counts(sender, instance, **kwargs):
+    adjust_facet_counts(facet_values(instance), -1)
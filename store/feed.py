@@ -0,0 +1,134 @@
+"""
+Personalised "for you" feed for the home page.
+
+Candidates are scored from the user's own ratings, reviews and purchases
+(via the precomputed RelatedMovie neighbours), blended with genre affinity
+and regional popularity. The ranked movie ids are cached per user with a
+TTL in their own cache (CACHES['feeds']), and the rows are loaded by primary
+key on each read, so edits show up at once and deleted movies drop out.
+build_home_feeds prewarms the cache for active users in batch.
+"""
+from collections import Counter, defaultdict
+
+from django.core.cache import cache, caches
+from django.db.models import Count
+
+from .metrics import record_cache_lookup
+from .models import Movie, Order, OrderItem, Rating, RelatedMovie, Review
+
+
+FEED_SIZE = 6
+FEED_CACHE_TIMEOUT = 60 * 60 * 6
+POPULAR_CACHE_TIMEOUT = 60 * 60
+POPULAR_POOL_SIZE = 200
+
+NEIGHBOUR_WEIGHT = 1.0
+GENRE_WEIGHT = 0.5
+POPULARITY_WEIGHT = 0.3
+PURCHASE_WEIGHT = 2
+
+
+FEED_VERSION_KEY = 'feed:version'
+
+
+def feed_cache():
+    return caches['feeds']
+
+
+def feed_cache_key(user_id):
+    # Bumping the version (invalidate_feeds) retires every user's ranking at
+    # once after bulk catalog edits that change the scores (e.g. genres)
+    version = feed_cache().get_or_set(FEED_VERSION_KEY, 1, None)
+    return f'feed:user:{user_id}:{version}'
+
+
+def invalidate_feeds():
+    try:
+        feed_cache().incr(FEED_VERSION_KEY)
+    except ValueError:
+        feed_cache().set(FEED_VERSION_KEY, 2, None)
+
+
+def popular_cache_key(region):
+    return f'feed:popular:{region or "global"}'
+
+
+def popular_movie_scores(region=None):
+    """Normalised purchase popularity ({movie_id: 0..1}), cached per region"""
+    key = popular_cache_key(region)
+    scores = cache.get(key)
+    if scores is None:
+        items = OrderItem.objects.all()
+        if region:
+            items = items.filter(order__region=region)
+        top = list(
+            items.values('movie_id')
+            .annotate(total=Count('id'))
+            .order_by('-total')[:POPULAR_POOL_SIZE]
+        )
+        best = top[0]['total'] if top else 1
+        scores = {row['movie_id']: row['total'] / best for row in top}
+        cache.set(key, scores, POPULAR_CACHE_TIMEOUT)
+    return scores
+
+
+def _user_signals(user):
+    """Return ({movie_id: like weight}, set of already-seen movie ids, home region)"""
+    weights = defaultdict(float)
+    for movie_id, stars in Rating.objects.filter(user=user).values_list('movie_id', 'rating'):
+        weights[movie_id] += stars - 3
+    for movie_id, stars in Review.objects.filter(user=user, is_reported=False).values_list('movie_id', 'rating'):
+        weights[movie_id] += stars - 3
+    for movie_id in OrderItem.objects.filter(order__user=user).values_list('movie_id', flat=True):
+        weights[movie_id] += PURCHASE_WEIGHT
+
+    region = Order.objects.filter(user=user).values_list('region', flat=True).first()
+    return weights, set(weights), region
+
+
+def build_feed(user, limit=FEED_SIZE):
+    """Score candidate movies for one user and return the top `limit` Movie objects"""
+    weights, seen, region = _user_signals(user)
+    liked = {movie_id: weight for movie_id, weight in weights.items() if weight > 0}
+    popularity = popular_movie_scores(region)
+
+    scores = defaultdict(float)
+    for movie_id, related_id, score in RelatedMovie.objects.filter(
+        movie_id__in=liked
+    ).values_list('movie_id', 'related_id', 'score'):
+        scores[related_id] += NEIGHBOUR_WEIGHT * liked[movie_id] * score
+
+    candidates = (set(scores) | set(popularity)) - seen
+    if not candidates:
+        return []
+
+    genres = dict(Movie.objects.filter(id__in=candidates | set(liked)).values_list('id', 'genre'))
+    genre_counts = Counter(genres[movie_id] for movie_id in liked if movie_id in genres)
+    total_likes = sum(genre_counts.values()) or 1
+
+    for movie_id in candidates:
+        pop = popularity.get(movie_id, 0.0)
+        affinity = genre_counts.get(genres.get(movie_id), 0) / total_likes
+        scores[movie_id] += GENRE_WEIGHT * affinity * pop + POPULARITY_WEIGHT * pop
+
+    ranked = sorted(candidates, key=lambda movie_id: (-scores[movie_id], movie_id))[:limit]
+    movies = Movie.objects.in_bulk(ranked)
+    return [movies[movie_id] for movie_id in ranked if movie_id in movies]
+
+
+def refresh_feed(user, limit=FEED_SIZE):
+    """Rebuild and cache one user's feed"""
+    movies = build_feed(user, limit=limit)
+    feed_cache().set(feed_cache_key(user.pk), [movie.id for movie in movies], FEED_CACHE_TIMEOUT)
+    return movies
+
+
+def get_home_feed(user, limit=FEED_SIZE):
+    """Cached feed for the home page; rebuilt on a miss once the TTL expires"""
+    movie_ids = feed_cache().get(feed_cache_key(user.pk))
+    record_cache_lookup('home_feed', movie_ids is not None)
+    if movie_ids is None:
+        return refresh_feed(user, limit=limit)[:limit]
+    movie_ids = movie_ids[:limit]
+    movies = Movie.objects.in_bulk(movie_ids)
+    return [movies[movie_id] for movie_id in movie_ids if movie_id in movies]
@@ -1,4 +1,7 @@
 from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.template.defaultfilters import filesizeformat
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 from .models import Review, Movie, UserProfile
@@ -39,7 +42,9 @@ class MovieSearchForm(forms.Form):
         required=False,
         widget=forms.TextInput(attrs={
             'class': 'form-control',
-            'placeholder': 'Search movies by title...'
+            'placeholder': 'Search by title, director or cast...',
+            'autocomplete': 'off',
+            'list': 'search-suggestions',
         })
     )
 
@@ -65,12 +70,38 @@ class UserProfileForm(forms.ModelForm):
             })
         }
     
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, rejected_files=(), **kwargs):
         super().__init__(*args, **kwargs)
+        # Fields whose upload was dropped mid-stream for passing the size cap (store/uploads.py)
+        self.rejected_files = rejected_files
         if self.instance and self.instance.user:
             self.fields['first_name'].initial = self.instance.user.first_name
             self.fields['last_name'].initial = self.instance.user.last_name
             self.fields['email'].initial = self.instance.user.email
+
+    def clean_profile_picture(self):
+        too_large = forms.ValidationError(
+            f'Profile pictures can be at most {filesizeformat(settings.PROFILE_PICTURE_MAX_BYTES)}.'
+        )
+        if 'profile_picture' in self.rejected_files:
+            raise too_large
+        picture = self.cleaned_data.get('profile_picture')
+        if not isinstance(picture, UploadedFile):
+            return picture
+
+        if picture.size > settings.PROFILE_PICTURE_MAX_BYTES:
+            raise too_large
+        # forms.ImageField has already opened and verified the file; only the header has been read
+        image = picture.image
+        if image.format not in settings.PROFILE_PICTURE_FORMATS:
+            raise forms.ValidationError(
+                f"Upload a {', '.join(settings.PROFILE_PICTURE_FORMATS)} image."
+            )
+        if max(image.size) > settings.PROFILE_PICTURE_MAX_DIMENSION:
+            raise forms.ValidationError(
+                f'Profile pictures can be at most {settings.PROFILE_PICTURE_MAX_DIMENSION} pixels on a side.'
+            )
+        return picture
     
     def save(self, commit=True):
         profile = super().save(commit=False)
@@ -0,0 +1,208 @@
+"""
+Garbage collection for data that otherwise accumulates forever.
+
+Each prune_* function deletes in chunks of primary keys, one short
+transaction per chunk, so the single SQLite writer is only held briefly and
+live requests can interleave (pass `pause` to sleep between chunks). They
+return how many rows or files were (or, with dry_run, would be) removed,
+and report (done, total) to `progress` after each chunk.
+
+Run them all with `manage.py prune_stale_data`.
+"""
+import os
+import time
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Cart, Movie, Task, UserProfile
+
+
+CHUNK_SIZE = 500
+MEDIA_DIRS = ['movie_images', 'profile_pictures']
+
+# Files younger than this are kept even if unreferenced: an upload is written
+# to storage before the row pointing at it is saved
+MEDIA_GRACE_PERIOD = timedelta(hours=1)
+
+
+def _delete_in_chunks(model, ids, chunk_size, progress, pause, dry_run):
+    if dry_run:
+        return len(ids)
+    deleted = 0
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        with transaction.atomic():
+            deleted += model.objects.filter(pk__in=chunk).delete()[0]
+        if progress:
+            progress(min(start + chunk_size, len(ids)), len(ids))
+        if pause:
+            time.sleep(pause)
+    return deleted
+
+
+def prune_sessions(chunk_size=CHUNK_SIZE, progress=None, pause=0, dry_run=False):
+    """Delete expired rows from django_session (cached copies expire on their own)"""
+    keys = list(Session.objects.filter(expire_date__lt=timezone.now()).values_list('session_key', flat=True))
+    return _delete_in_chunks(Session, keys, chunk_size, progress, pause, dry_run)
+
+
+def idle_carts(days):
+    """Carts with movies that neither changed nor had their owner log in for `days` days"""
+    cutoff = timezone.now() - timedelta(days=days)
+    active_users = User.objects.filter(last_login__gte=cutoff)
+    return Cart.objects.filter(updated_at__lt=cutoff, movies__isnull=False).exclude(
+        user__in=active_users
+    ).distinct()
+
+
+def empty_idle_carts(days, chunk_size=CHUNK_SIZE, progress=None, pause=0, dry_run=False):
+    """Remove the movies from idle carts (the carts themselves are kept); returns carts emptied"""
+    cart_ids = list(idle_carts(days).values_list('id', flat=True))
+    if dry_run:
+        return len(cart_ids)
+    through = Cart.movies.through
+    for start in range(0, len(cart_ids), chunk_size):
+        chunk = cart_ids[start:start + chunk_size]
+        with transaction.atomic():
+            through.objects.filter(cart_id__in=chunk).delete()
+        if progress:
+            progress(min(start + chunk_size, len(cart_ids)), len(cart_ids))
+        if pause:
+            time.sleep(pause)
+    return len(cart_ids)
+
+
+def prune_tasks(days, chunk_size=CHUNK_SIZE, progress=None, pause=0, dry_run=False):
+    """Delete finished background tasks older than `days` days (failed ones are kept for inspection)"""
+    cutoff = timezone.now() - timedelta(days=days)
+    ids = list(Task.objects.filter(status='done', finished_at__lt=cutoff).values_list('id', flat=True))
+    return _delete_in_chunks(Task, ids, chunk_size, progress, pause, dry_run)
+
+
+def referenced_media():
+    """Every media file name a Movie or UserProfile (picture or avatar) points at"""
+    names = set()
+    querysets = [
+        Movie.objects.exclude(Q(image='') | Q(image__isnull=True)).values_list('image', flat=True),
+    ]
+    for field in ['profile_picture', 'avatar_small', 'avatar_large']:
+        querysets.append(
+            UserProfile.objects.exclude(Q(**{field: ''}) | Q(**{f'{field}__isnull': True})).values_list(field, flat=True)
+        )
+    for queryset in querysets:
+        names.update(queryset.iterator(chunk_size=2000))
+    return names
+
+
+def _delete_unless_fresh(names):
+    """
+    Delete the given files unless they were saved within MEDIA_GRACE_PERIOD;
+    returns how many were deleted. The mtime is checked under the storage's
+    exclusive lock, so a save cannot reuse a file between check and delete
+    (store/mediastorage.py).
+    """
+    lock = getattr(default_storage, 'lock', None)
+    cutoff = timezone.now() - MEDIA_GRACE_PERIOD
+    deleted = 0
+    with lock(exclusive=True) if lock else nullcontext():
+        for name in names:
+            try:
+                if default_storage.get_modified_time(name) >= cutoff:
+                    continue
+            except FileNotFoundError:
+                continue
+            default_storage.delete(name)
+            deleted += 1
+    return deleted
+
+
+def delete_unreferenced(names):
+    """
+    Delete those of the given media files that no row references (content-addressed
+    files can be shared); returns how many were deleted. Files saved within
+    MEDIA_GRACE_PERIOD are left for remove_orphaned_media(), as an upload that
+    reused one may not have saved its row yet.
+    """
+    names = {name for name in names if name}
+    if not names:
+        return 0
+    still_used = set(Movie.objects.filter(image__in=names).values_list('image', flat=True))
+    for field in ['profile_picture', 'avatar_small', 'avatar_large']:
+        still_used.update(UserProfile.objects.filter(**{f'{field}__in': names}).values_list(field, flat=True))
+    return _delete_unless_fresh(sorted(names - still_used))
+
+
+def _media_files(directory):
+    """Every file name under `directory`, including the content-addressed shard directories"""
+    directories, files = default_storage.listdir(directory)
+    for filename in files:
+        yield f'{directory}/{filename}'
+    for subdirectory in directories:
+        yield from _media_files(f'{directory}/{subdirectory}')
+
+
+def orphaned_media():
+    """Names of files under MEDIA_DIRS that nothing references and are past the grace period"""
+    referenced = referenced_media()
+    cutoff = timezone.now() - MEDIA_GRACE_PERIOD
+    orphans = []
+    for directory in MEDIA_DIRS:
+        if not default_storage.exists(directory):
+            continue
+        for name in _media_files(directory):
+            if name not in referenced and default_storage.get_modified_time(name) < cutoff:
+                orphans.append(name)
+    return orphans
+
+
+def remove_orphaned_media(chunk_size=CHUNK_SIZE, progress=None, pause=0, dry_run=False):
+    orphans = orphaned_media()
+    if dry_run:
+        return len(orphans)
+    deleted = 0
+    for start in range(0, len(orphans), chunk_size):
+        # Uploads wait for the lock, so it is taken per chunk; files reused since the scan are kept
+        deleted += _delete_unless_fresh(orphans[start:start + chunk_size])
+        if progress:
+            progress(min(start + chunk_size, len(orphans)), len(orphans))
+        if pause:
+            time.sleep(pause)
+    return deleted
+
+
+def compact_database():
+    """ANALYZE and VACUUM the database; returns the bytes reclaimed (SQLite only, else 0)"""
+    if connection.vendor == 'sqlite':
+        path = settings.DATABASES['default']['NAME']
+        before = os.path.getsize(path)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+            # VACUUM rewrites the whole file and blocks writers while it runs
+            cursor.execute('VACUUM')
+        return before - os.path.getsize(path)
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('VACUUM ANALYZE')
+    return 0
+
+
+@receiver(m2m_changed, sender=Cart.movies.through)
+def touch_cart(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep Cart.updated_at current when movies are added or removed, so idle carts can be found"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        if pk_set:
+            Cart.objects.filter(pk__in=pk_set).update(updated_at=timezone.now())
+    else:
+        Cart.objects.filter(pk=instance.pk).update(updated_at=timezone.now())
@@ -1,8 +1,9 @@
+from io import BytesIO
+
+from django.core.files.base import ContentFile
 from django.core.management.base import BaseCommand
 from store.models import Movie
 from django.db import models
-import os
-from django.conf import settings
 
 
 class Command(BaseCommand):
@@ -15,10 +16,6 @@ class Command(BaseCommand):
         try:
             from PIL import Image, ImageDraw, ImageFont
             
-            # Create media directory if it doesn't exist
-            media_dir = os.path.join(settings.MEDIA_ROOT, 'movie_images')
-            os.makedirs(media_dir, exist_ok=True)
-            
             # Get all movies without images (null or empty)
             movies_without_images = Movie.objects.filter(models.Q(image__isnull=True) | models.Q(image=''))
             
@@ -66,14 +63,11 @@ class Command(BaseCommand):
                 x = (300 - text_width) // 2
                 draw.text((x, 350), no_image_text, fill='#95a5a6', font=font)
                 
-                # Save the image
+                # Save through the media storage, so an identical placeholder is stored only once
                 filename = f"{movie.id}_{movie.title.replace(' ', '_').replace(':', '').lower()}.png"
-                image_path = os.path.join(media_dir, filename)
-                img.save(image_path)
-                
-                # Update the movie with the image
-                movie.image = f'movie_images/{filename}'
-                movie.save()
+                buffer = BytesIO()
+                img.save(buffer, format='PNG')
+                movie.image.save(filename, ContentFile(buffer.getvalue()))
                 
                 self.stdout.write(f'Created placeholder image for: {movie.title}')
             
@@ -0,0 +1,48 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+
+class Command(BaseCommand):
+    help = 'Measure the CPU cost of hashing and checking a password with each hasher profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=10, help='Password checks per profile')
+        parser.add_argument('--password', default='correct horse battery staple')
+
+    def handle(self, *args, **options):
+        password = options['password']
+        current = settings.PASSWORD_HASHER_PROFILE
+
+        for profile, hashers in settings.PASSWORD_HASHER_PROFILES.items():
+            hasher = import_string(hashers[0])()
+            label = f'{profile}{" (current)" if profile == current else ""}'
+            if hasher.library:
+                try:
+                    hasher._load_library()
+                except ValueError:
+                    self.stdout.write(f'{label:<18} skipped: {hasher.library} is not installed')
+                    continue
+
+            started = time.process_time()
+            encoded = hasher.encode(password, hasher.salt())
+            hash_cpu = (time.process_time() - started) * 1000
+
+            timings = []
+            for _ in range(options['iterations']):
+                started = time.process_time()
+                if not hasher.verify(password, encoded):
+                    self.stderr.write(self.style.ERROR(f'{profile}: password did not verify'))
+                    break
+                timings.append((time.process_time() - started) * 1000)
+            if not timings:
+                continue
+
+            mean = statistics.mean(timings)
+            self.stdout.write(
+                f'{label:<18} hash {hash_cpu:7.1f}ms  check {mean:7.1f}ms CPU  '
+                f'~{1000 / mean:6.1f} logins/s per core  ({hasher.algorithm})'
+            )
@@ -0,0 +1,79 @@
+import statistics
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from store.models import Movie
+
+
+SESSION_MESSAGES = 'django.contrib.messages.storage.fallback.FallbackStorage'
+
+
+class Command(BaseCommand):
+    help = 'Count database round trips per request for each session profile, logged in'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20, help='Browsing rounds per profile')
+        parser.add_argument('--host', default='localhost', help='Host header (must be in ALLOWED_HOSTS)')
+
+    def handle(self, *args, **options):
+        movie = Movie.objects.order_by('id').first()
+        if movie is None:
+            raise CommandError('Need a movie. Run populate_sample_data or generate_dataset first.')
+
+        # The requests fill a cart and create sessions, so they run as a
+        # throwaway user inside a transaction that is rolled back at the end
+        with transaction.atomic():
+            user = User.objects.create_user(f'benchmark-{uuid.uuid4().hex[:12]}')
+            try:
+                self.benchmark(user, movie, options)
+            finally:
+                transaction.set_rollback(True)
+
+    def benchmark(self, user, movie, options):
+        detail = reverse('movie_detail', args=[movie.id])
+        # One round: view a movie, add it to the cart (sets a flash message),
+        # follow the redirect (shows the message), then open the cart
+        steps = [
+            ('get', detail),
+            ('post', reverse('add_to_cart', args=[movie.id])),
+            ('get', detail),
+            ('get', reverse('cart')),
+        ]
+        profiles = [('db (before)', settings.SESSION_ENGINES['db'], SESSION_MESSAGES)] + [
+            (profile, engine, settings.MESSAGE_STORAGE)
+            for profile, engine in settings.SESSION_ENGINES.items()
+        ]
+
+        for label, engine, message_storage in profiles:
+            with override_settings(SESSION_ENGINE=engine, MESSAGE_STORAGE=message_storage, RATE_LIMITS={}):
+                client = Client(HTTP_HOST=options['host'])
+                client.force_login(user)
+                queries = session_queries = 0
+                timings = []
+                for _ in range(options['iterations']):
+                    for method, path in steps:
+                        with CaptureQueriesContext(connection) as captured:
+                            started = time.perf_counter()
+                            response = getattr(client, method)(path)
+                            timings.append((time.perf_counter() - started) * 1000)
+                        if response.status_code >= 400:
+                            raise CommandError(f'{method.upper()} {path} returned {response.status_code}')
+                        queries += len(captured)
+                        session_queries += sum('django_session' in query['sql'] for query in captured)
+                # Also drops the session from the cache-backed engines
+                client.logout()
+
+            requests = len(timings)
+            self.stdout.write(
+                f'{label:<16} {queries / requests:5.1f} queries/request  '
+                f'{session_queries / requests:4.2f} session queries/request  '
+                f'mean {statistics.mean(timings):6.2f}ms'
+            )
@@ -0,0 +1,78 @@
+import statistics
+import time
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.template import engines
+from django.test import Client
+from django.urls import reverse
+
+from store.models import Movie
+
+
+MODES = [
+    ('uncached', 'templates recompiled, no fragment cache'),
+    ('loader', 'cached loader, no fragment cache'),
+    ('fragments', 'cached loader and warm fragment cache'),
+]
+
+
+def reset_template_loaders():
+    for backend in engines.all():
+        for loader in backend.engine.template_loaders:
+            if hasattr(loader, 'reset'):
+                loader.reset()
+
+
+class Command(BaseCommand):
+    help = 'Measure page render time with and without the cached template loader and fragment cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50, help='Requests per page and mode')
+        parser.add_argument('--movie', type=int, help='Movie id for the detail page (default: most reviewed)')
+        parser.add_argument('--host', default='localhost', help='Host header (must be in ALLOWED_HOSTS)')
+
+    def handle(self, *args, **options):
+        movie_id = options['movie']
+        if movie_id is None:
+            movie = Movie.objects.annotate(review_count=Count('reviews')).order_by('-review_count', 'id').first()
+            if movie is None:
+                raise CommandError('No movies found. Run populate_sample_data or generate_dataset first.')
+            movie_id = movie.id
+
+        pages = [
+            ('home', reverse('home')),
+            ('movie_list', reverse('movie_list')),
+            ('movie_detail', reverse('movie_detail', args=[movie_id])),
+        ]
+        client = Client(HTTP_HOST=options['host'])
+        fragments = caches['templates']
+
+        for name, path in pages:
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{name} ({path})'))
+            baseline = None
+            for mode, description in MODES:
+                timings = []
+                for _ in range(options['iterations']):
+                    if mode == 'uncached':
+                        reset_template_loaders()
+                    if mode != 'fragments':
+                        fragments.clear()
+                    started = time.perf_counter()
+                    response = client.get(path)
+                    timings.append((time.perf_counter() - started) * 1000)
+                    if response.status_code != 200:
+                        raise CommandError(f'{path} returned {response.status_code}')
+
+                # The first fragment run fills the cache; report the warm requests
+                if mode == 'fragments' and len(timings) > 1:
+                    timings = timings[1:]
+                mean = statistics.mean(timings)
+                p95 = sorted(timings)[int(len(timings) * 0.95) - 1] if len(timings) > 1 else timings[0]
+                if baseline is None:
+                    baseline = mean
+                saved = (1 - mean / baseline) * 100 if baseline else 0
+                self.stdout.write(
+                    f'  {mode:<10} mean {mean:7.2f}ms  p95 {p95:7.2f}ms  {saved:5.1f}% faster  ({description})'
+                )
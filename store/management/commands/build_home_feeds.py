@@ -0,0 +1,34 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from store.feed import FEED_SIZE, popular_cache_key, refresh_feed
+from store.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Precompute and cache the personalised home page feed for recently active users'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='Only users who logged in within this many days')
+        parser.add_argument('--limit', type=int, default=FEED_SIZE, help='Movies per feed')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Users loaded per query')
+
+    def handle(self, *args, **options):
+        # Start from fresh popularity so every feed in this run sees the same numbers
+        cache.delete_many([popular_cache_key(None)] + [popular_cache_key(key) for key, _ in Order.REGION_CHOICES])
+
+        since = timezone.now() - timedelta(days=options['days'])
+        users = User.objects.filter(is_active=True, last_login__gte=since).only('id').order_by('id')
+
+        built = 0
+        for user in users.iterator(chunk_size=options['chunk_size']):
+            refresh_feed(user, limit=options['limit'])
+            built += 1
+            if built % options['chunk_size'] == 0:
+                self.stdout.write(f'  feeds: {built}')
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully cached feeds for {built} user(s)'))
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store.analytics import rebuild_all_sales_facts, update_sales_facts
+
+
+class Command(BaseCommand):
+    help = 'Build the daily sales fact tables used by the analytics dashboard'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rebuild every day instead of only changed days')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['full']:
+            days = rebuild_all_sales_facts(
+                progress=lambda start, end: self.stdout.write(f'  {start:%Y-%m}: rebuilt')
+            )
+        else:
+            days = update_sales_facts()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt sales facts for {days} day(s) in {elapsed:.2f}s'))
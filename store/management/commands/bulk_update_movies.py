@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from store import bulk
+from store.models import Movie
+
+
+class Command(BaseCommand):
+    help = 'Bulk-edit movies with chunked UPDATEs: change prices by percent, reassign genre or fix language'
+
+    def add_arguments(self, parser):
+        operation = parser.add_mutually_exclusive_group(required=True)
+        operation.add_argument('--price-percent', type=float, help='Change prices by this percent (negative lowers them)')
+        operation.add_argument('--set-genre', help='Move the selected movies to this genre')
+        operation.add_argument('--set-language', help='Set the language of the selected movies')
+
+        parser.add_argument('--ids', help='Comma-separated movie ids')
+        parser.add_argument('--genre', help='Only movies currently in this genre')
+        parser.add_argument('--language', help='Only movies with this language (case-insensitive)')
+        parser.add_argument('--release-year', type=int, help='Only movies released this year')
+        parser.add_argument('--chunk-size', type=int, default=bulk.CHUNK_SIZE, help='Movies per UPDATE')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many movies match')
+
+    def handle(self, *args, **options):
+        movies = Movie.objects.all()
+        if options['ids']:
+            movies = movies.filter(id__in=[int(pk) for pk in options['ids'].split(',') if pk.strip().isdigit()])
+        if options['genre']:
+            movies = movies.filter(genre=options['genre'])
+        if options['language']:
+            movies = movies.filter(language__iexact=options['language'].strip())
+        if options['release_year']:
+            movies = movies.filter(release_year=options['release_year'])
+
+        matched = movies.count()
+        if options['dry_run']:
+            self.stdout.write(f'{matched} movie(s) match')
+            return
+
+        def progress(done, total):
+            self.stdout.write(f'  movies: {done}/{total}')
+
+        kwargs = {'chunk_size': options['chunk_size'], 'progress': progress}
+        try:
+            if options['price_percent'] is not None:
+                changed = bulk.change_prices(movies, options['price_percent'], **kwargs)
+            elif options['set_genre']:
+                changed = bulk.reassign_genre(movies, options['set_genre'], **kwargs)
+            else:
+                changed = bulk.fix_language(movies, options['set_language'], **kwargs)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully updated {changed} of {matched} matching movie(s)'))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store.conditional import touch
+from store.recommendations import DEFAULT_TOP_K, build_related_movies, store_related_movies
+
+
+class Command(BaseCommand):
+    help = 'Precompute "customers who bought/rated this also liked" recommendations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K, help='Neighbours stored per movie')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            related = build_related_movies(top_k=options['top_k'])
+        except ImportError:
+            self.stdout.write(
+                self.style.WARNING('NumPy/SciPy not available. Install them with: pip install numpy scipy')
+            )
+            return
+
+        stored = store_related_movies(related)
+        touch('recommendations')
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Stored {stored} recommendations for {len(related)} movies in {elapsed:.2f}s'
+            )
+        )
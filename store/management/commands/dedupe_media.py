@@ -0,0 +1,65 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from store.conditional import touch
+from store.maintenance import delete_unreferenced
+from store.mediastorage import is_content_addressed, store_content_addressed
+from store.models import Movie, UserProfile
+
+
+PROFILE_FIELDS = ['profile_picture', 'avatar_small', 'avatar_large']
+
+
+class Command(BaseCommand):
+    help = 'Move media files saved under their upload names to content-addressed names, merging duplicates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be moved')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        renamed = {}  # legacy name -> content-addressed name, so shared files are copied once
+
+        def migrate(name):
+            if name not in renamed:
+                if not default_storage.exists(name):
+                    self.stdout.write(self.style.WARNING(f'  missing: {name}'))
+                    renamed[name] = None
+                elif dry_run:
+                    with default_storage.open(name, 'rb') as source:
+                        renamed[name] = default_storage.hashed_name(name, source)
+                else:
+                    renamed[name] = store_content_addressed(name)
+            return renamed[name]
+
+        movies = Movie.objects.exclude(Q(image='') | Q(image__isnull=True)).values_list('id', 'image')
+        moved_movies = []
+        for movie_id, name in movies.iterator():
+            if is_content_addressed(name) or migrate(name) is None:
+                continue
+            if not dry_run:
+                # updated_at changes so cached fragments pick up the new image URL
+                Movie.objects.filter(id=movie_id).update(image=renamed[name], updated_at=timezone.now())
+            moved_movies.append(movie_id)
+        if moved_movies and not dry_run:
+            touch('catalog', *(f'movie:{movie_id}' for movie_id in moved_movies))
+
+        moved_profiles = 0
+        for profile_id, *names in UserProfile.objects.values_list('id', *PROFILE_FIELDS).iterator():
+            updates = {}
+            for field, name in zip(PROFILE_FIELDS, names):
+                if name and not is_content_addressed(name) and migrate(name) is not None:
+                    updates[field] = renamed[name]
+            if updates:
+                moved_profiles += 1
+                if not dry_run:
+                    UserProfile.objects.filter(id=profile_id).update(**updates)
+
+        stored = {new for new in renamed.values() if new}
+        removed = 0 if dry_run else delete_unreferenced([old for old, new in renamed.items() if new])
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Would move" if dry_run else "Moved"} {len(moved_movies)} movie image(s) and {moved_profiles} '
+            f'profile(s): {len(renamed)} file(s) -> {len(stored)} content-addressed file(s), {removed} removed'
+        ))
@@ -0,0 +1,329 @@
+import random
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from store.analytics import rebuild_all_sales_facts
+from store.conditional import touch
+from store.credits import rebuild_movie_credits
+from store.facets import rebuild_facet_counts
+from store.models import Cart, Movie, Order, OrderItem, Rating, Review, UserProfile
+
+
+USERNAME_PREFIX = 'loaduser_'
+GENERATED_MARKER = '[generated]'
+
+TITLE_ADJECTIVES = [
+    'Silent', 'Broken', 'Golden', 'Last', 'Hidden', 'Crimson', 'Endless', 'Frozen',
+    'Wild', 'Dark', 'Electric', 'Lonely', 'Savage', 'Secret', 'Burning', 'Distant',
+]
+TITLE_NOUNS = [
+    'Horizon', 'Empire', 'River', 'Kingdom', 'Signal', 'Harbor', 'Witness', 'Orbit',
+    'Frontier', 'Promise', 'Machine', 'Garden', 'Shadow', 'Voyage', 'Storm', 'Code',
+]
+FIRST_NAMES = [
+    'Alex', 'Maria', 'James', 'Priya', 'Chen', 'Fatima', 'Lucas', 'Emma', 'Omar', 'Sofia',
+    'Daniel', 'Aisha', 'Noah', 'Yuki', 'Mateo', 'Grace', 'Ivan', 'Leila', 'Samuel', 'Nora',
+]
+LAST_NAMES = [
+    'Smith', 'Garcia', 'Nguyen', 'Patel', 'Kim', 'Okafor', 'Rossi', 'Muller', 'Silva', 'Cohen',
+    'Haddad', 'Tanaka', 'Novak', 'Larsen', 'Moreau', 'Ibrahim', 'Walsh', 'Reyes', 'Singh', 'Berg',
+]
+LANGUAGES = [('English', 70), ('Spanish', 10), ('French', 6), ('Japanese', 5), ('Korean', 5), ('Hindi', 4)]
+REGION_WEIGHTS = {'northeast': 30, 'southeast': 25, 'midwest': 20, 'west': 25}
+REVIEW_SNIPPETS = [
+    'Loved every minute of it.', 'Solid performances all around.', 'The pacing dragged in the middle.',
+    'Great soundtrack and visuals.', 'Not what I expected, in a good way.', 'Would watch again.',
+    'The ending felt rushed.', 'A must-see for fans of the genre.', 'Overrated, honestly.',
+]
+
+
+def zipf_cum_weights(n, exponent):
+    """Return cumulative Zipf weights (1 / rank^exponent) for ranks 1..n"""
+    return list(accumulate(1.0 / (rank ** exponent) for rank in range(1, n + 1)))
+
+
+@contextmanager
+def backdating(*models):
+    """Temporarily disable auto_now/auto_now_add so generated timestamps are kept"""
+    saved = []
+    for model in models:
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                saved.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = 'Generate a large synthetic dataset (users, ratings, reviews, orders) with realistic skew'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--movies', type=int, default=2000, help='Number of generated movies')
+        parser.add_argument('--users', type=int, default=10000, help='Number of generated users')
+        parser.add_argument('--ratings', type=int, default=200000, help='Number of quick ratings')
+        parser.add_argument('--reviews', type=int, default=20000, help='Number of reviews')
+        parser.add_argument('--orders', type=int, default=50000, help='Number of orders')
+        parser.add_argument('--days', type=int, default=730, help='Spread timestamps over this many days')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed (same seed, same data)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk_create batch')
+        parser.add_argument('--movie-skew', type=float, default=1.1, help='Zipf exponent for movie popularity')
+        parser.add_argument('--user-skew', type=float, default=0.9, help='Power-law exponent for user activity')
+        parser.add_argument('--clear', action='store_true', help='Delete previously generated data first')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        # Anchor timestamps to midnight so a seed always produces the same offsets
+        self.end = timezone.make_aware(datetime.combine(timezone.now().date(), time.min))
+        self.days = options['days']
+
+        if options['clear']:
+            self.clear()
+
+        movies = self.create_movies(options['movies'])
+        if not movies:
+            self.stdout.write(self.style.ERROR('No movies available to generate activity for.'))
+            return
+        users = self.create_users(options['users'])
+        if not users:
+            self.stdout.write(self.style.ERROR('No users available to generate activity for.'))
+            return
+
+        # Popularity: every region ranks the catalog differently, then follows Zipf
+        movie_ids = [movie.id for movie in movies]
+        self.movie_prices = {movie.id: movie.price for movie in movies}
+        self.movie_quality = {movie_id: self.rng.uniform(2.0, 4.8) for movie_id in movie_ids}
+        movie_cum_weights = zipf_cum_weights(len(movie_ids), options['movie_skew'])
+        self.region_rankings = {}
+        for region in REGION_WEIGHTS:
+            ranking = movie_ids[:]
+            self.rng.shuffle(ranking)
+            self.region_rankings[region] = ranking
+        self.movie_cum_weights = movie_cum_weights
+
+        # Activity: a few heavy users, a long tail of occasional ones
+        self.user_ids = [user_id for user_id, _ in users]
+        self.user_regions = dict(users)
+        self.user_cum_weights = zipf_cum_weights(len(self.user_ids), options['user_skew'])
+
+        self.create_ratings(options['ratings'])
+        self.create_reviews(options['reviews'])
+        self.create_orders(options['orders'])
+        # bulk_create sends no signals, so mark every cached page stale
+        touch('catalog', 'orders')
+        # Orders were backdated across the whole range, so rebuild every day
+        days = rebuild_all_sales_facts()
+        self.stdout.write(f'  sales facts: {days} days')
+
+        self.stdout.write(self.style.SUCCESS('Successfully generated synthetic dataset!'))
+
+    def clear(self):
+        users_deleted, _ = User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+        movies_deleted, _ = Movie.objects.filter(description__startswith=GENERATED_MARKER).delete()
+        self.stdout.write(f'Deleted {users_deleted + movies_deleted} previously generated rows')
+
+    def random_timestamp(self):
+        return self.end - timedelta(seconds=self.rng.randrange(self.days * 86400))
+
+    def pick_user(self):
+        return self.rng.choices(self.user_ids, cum_weights=self.user_cum_weights)[0]
+
+    def pick_movie(self, region):
+        return self.rng.choices(self.region_rankings[region], cum_weights=self.movie_cum_weights)[0]
+
+    def pick_star(self, movie_id):
+        return min(5, max(1, round(self.rng.gauss(self.movie_quality[movie_id], 1.0))))
+
+    def bulk_insert(self, model, objs):
+        with transaction.atomic():
+            return model.objects.bulk_create(objs, batch_size=self.batch_size)
+
+    def create_movies(self, count):
+        existing = list(
+            Movie.objects.filter(description__startswith=GENERATED_MARKER).order_by('id').only('id', 'price')
+        )
+        missing = count - len(existing)
+        if missing <= 0:
+            self.stdout.write(f'Reusing {len(existing)} generated movies')
+            return existing[:count]
+
+        genres = [key for key, _ in Movie.GENRE_CHOICES]
+        ratings = [key for key, _ in Movie.RATING_CHOICES]
+        languages = [name for name, _ in LANGUAGES]
+        language_weights = [weight for _, weight in LANGUAGES]
+        created = []
+        batch = []
+        for i in range(len(existing), count):
+            title = f'The {self.rng.choice(TITLE_ADJECTIVES)} {self.rng.choice(TITLE_NOUNS)} {i + 1}'
+            cast = ', '.join(self.person_name() for _ in range(self.rng.randint(2, 5)))
+            batch.append(Movie(
+                title=title,
+                price=Decimal(self.rng.randrange(499, 1999)) / 100,
+                description=f'{GENERATED_MARKER} Synthetic movie used for load testing.',
+                genre=self.rng.choice(genres),
+                rating=self.rng.choice(ratings),
+                director=self.person_name(),
+                cast=cast,
+                release_year=self.rng.randint(1960, 2025),
+                duration=self.rng.randint(80, 190),
+                language=self.rng.choices(languages, weights=language_weights)[0],
+            ))
+            if len(batch) >= self.batch_size:
+                created.extend(self.bulk_insert(Movie, batch))
+                batch = []
+        if batch:
+            created.extend(self.bulk_insert(Movie, batch))
+        # bulk_create skips the signals that maintain facet counts and credits
+        rebuild_facet_counts()
+        rebuild_movie_credits(created)
+        self.stdout.write(f'Created {len(created)} movies')
+        return existing + created
+
+    def person_name(self):
+        return f'{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}'
+
+    def create_users(self, count):
+        """Create users with profiles and carts; returns (user_id, home_region) pairs"""
+        regions = list(REGION_WEIGHTS)
+        region_weights = list(REGION_WEIGHTS.values())
+        existing = User.objects.filter(username__startswith=USERNAME_PREFIX).count()
+        # Hash once: generated accounts all share the same throwaway password
+        password = make_password('loadtest123')
+
+        created = 0
+        batch = []
+        for i in range(existing, count):
+            batch.append(User(
+                username=f'{USERNAME_PREFIX}{i:07d}',
+                email=f'{USERNAME_PREFIX}{i:07d}@example.com',
+                first_name=self.rng.choice(FIRST_NAMES),
+                last_name=self.rng.choice(LAST_NAMES),
+                password=password,
+                date_joined=self.random_timestamp(),
+            ))
+            if len(batch) >= self.batch_size or i == count - 1:
+                # bulk_create skips post_save, so profiles and carts are created explicitly
+                users = self.bulk_insert(User, batch)
+                self.bulk_insert(UserProfile, [UserProfile(user=user) for user in users])
+                self.bulk_insert(Cart, [Cart(user=user) for user in users])
+                created += len(users)
+                batch = []
+                self.stdout.write(f'  users: {existing + created}/{count}')
+
+        user_ids = User.objects.filter(
+            username__startswith=USERNAME_PREFIX
+        ).order_by('id').values_list('id', flat=True)[:count]
+        # Region is derived from a seeded stream, so it is stable across runs
+        region_rng = random.Random(self.rng.random())
+        return [(user_id, region_rng.choices(regions, weights=region_weights)[0]) for user_id in user_ids]
+
+    def unique_pairs(self, count, model):
+        """Yield (user_id, movie_id) pairs not already present for a unique_together model"""
+        seen = set(model.objects.filter(
+            user__username__startswith=USERNAME_PREFIX
+        ).values_list('user_id', 'movie_id'))
+        attempts = 0
+        produced = 0
+        while produced < count and attempts < count * 5:
+            attempts += 1
+            user_id = self.pick_user()
+            movie_id = self.pick_movie(self.user_regions[user_id])
+            if (user_id, movie_id) in seen:
+                continue
+            seen.add((user_id, movie_id))
+            produced += 1
+            yield user_id, movie_id
+
+    def create_ratings(self, count):
+        created = 0
+        batch = []
+        with backdating(Rating):
+            for user_id, movie_id in self.unique_pairs(count, Rating):
+                timestamp = self.random_timestamp()
+                batch.append(Rating(
+                    user_id=user_id,
+                    movie_id=movie_id,
+                    rating=self.pick_star(movie_id),
+                    created_at=timestamp,
+                    updated_at=timestamp,
+                ))
+                if len(batch) >= self.batch_size:
+                    created += len(self.bulk_insert(Rating, batch))
+                    batch = []
+                    self.stdout.write(f'  ratings: {created}/{count}')
+            if batch:
+                created += len(self.bulk_insert(Rating, batch))
+        self.stdout.write(f'Created {created} ratings')
+
+    def create_reviews(self, count):
+        created = 0
+        batch = []
+        with backdating(Review):
+            for user_id, movie_id in self.unique_pairs(count, Review):
+                timestamp = self.random_timestamp()
+                content = ' '.join(self.rng.sample(REVIEW_SNIPPETS, self.rng.randint(1, 3)))
+                batch.append(Review(
+                    user_id=user_id,
+                    movie_id=movie_id,
+                    rating=self.pick_star(movie_id),
+                    content=content,
+                    is_reported=self.rng.random() < 0.01,
+                    created_at=timestamp,
+                    updated_at=timestamp,
+                ))
+                if len(batch) >= self.batch_size:
+                    created += len(self.bulk_insert(Review, batch))
+                    batch = []
+                    self.stdout.write(f'  reviews: {created}/{count}')
+            if batch:
+                created += len(self.bulk_insert(Review, batch))
+        self.stdout.write(f'Created {created} reviews')
+
+    def create_orders(self, count):
+        statuses = [key for key, _ in Order.STATUS_CHOICES]
+        status_weights = [5, 5, 10, 75, 5]
+        created = 0
+        with backdating(Order):
+            while created < count:
+                size = min(self.batch_size, count - created)
+                orders = []
+                baskets = []
+                for _ in range(size):
+                    user_id = self.pick_user()
+                    region = self.user_regions[user_id]
+                    timestamp = self.random_timestamp()
+                    orders.append(Order(
+                        user_id=user_id,
+                        region=region,
+                        status=self.rng.choices(statuses, weights=status_weights)[0],
+                        created_at=timestamp,
+                        updated_at=timestamp,
+                    ))
+                    # Geometric basket size: most orders hold a single movie
+                    basket_size = 1
+                    while basket_size < 5 and self.rng.random() < 0.35:
+                        basket_size += 1
+                    baskets.append({self.pick_movie(region) for _ in range(basket_size)})
+
+                orders = self.bulk_insert(Order, orders)
+                items = [
+                    OrderItem(order=order, movie_id=movie_id, quantity=1, price=self.movie_prices[movie_id])
+                    for order, basket in zip(orders, baskets)
+                    for movie_id in basket
+                ]
+                self.bulk_insert(OrderItem, items)
+                created += len(orders)
+                self.stdout.write(f'  orders: {created}/{count}')
+        self.stdout.write(f'Created {created} orders')
@@ -0,0 +1,140 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Runs in a fresh interpreter under -X importtime and prints the phase
+# timings as JSON on its last stdout line
+PROBE = '''
+import io, json, sys, time
+
+warm, path, host = sys.argv[1] == '1', sys.argv[2], sys.argv[3]
+phases = []
+started = time.perf_counter()
+
+def phase(name):
+    global started
+    now = time.perf_counter()
+    phases.append([name, now - started])
+    started = now
+
+import django
+django.setup(set_prefix=False)
+phase('django.setup (settings, apps, models)')
+
+from django.core.handlers.wsgi import WSGIHandler
+application = WSGIHandler()
+phase('WSGI handler (middleware)')
+
+if warm:
+    from store.warmup import STEPS
+    for name, step in STEPS:
+        step()
+        phase(f'warm-up: {name}')
+
+def request():
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SCRIPT_NAME': '',
+        'SERVER_NAME': host, 'SERVER_PORT': '80', 'HTTP_HOST': host, 'REMOTE_ADDR': '127.0.0.1',
+        'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr, 'wsgi.url_scheme': 'http',
+        'wsgi.version': (1, 0), 'wsgi.multithread': True, 'wsgi.multiprocess': True, 'wsgi.run_once': False,
+    }
+    status = []
+    response = application(environ, lambda code, headers, exc_info=None: status.append(code))
+    b''.join(response)
+    response.close()
+    return status[0]
+
+first = request()
+phase(f'first request GET {path}')
+request()
+phase(f'second request GET {path}')
+print(json.dumps({'status': first, 'phases': phases}))
+'''
+
+
+def parse_importtime(stderr):
+    """[(module, self seconds, cumulative seconds)] from `python -X importtime` output"""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # the header line
+        modules.append((fields[2].strip(), int(fields[0]) / 1e6, int(fields[1]) / 1e6))
+    return modules
+
+
+class Command(BaseCommand):
+    help = (
+        'Profile how long a fresh web worker takes to become ready: import time per module and '
+        'time per startup phase, with and without warm-up (store/warmup.py)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/', help='Page requested after startup')
+        parser.add_argument('--host', default='localhost', help='Host header (must be in ALLOWED_HOSTS)')
+        parser.add_argument('--limit', type=int, default=25, help='Number of modules to list')
+        parser.add_argument('--sort', choices=['cumulative', 'self'], default='cumulative')
+        parser.add_argument('--package', help='Only list modules of this package (e.g. store)')
+
+    def probe(self, warm, options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', PROBE, '1' if warm else '0', options['path'], options['host']],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if completed.returncode != 0:
+            raise CommandError(f'Startup probe failed:\n{completed.stderr[-2000:]}')
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        # An error page would be timed instead of the real one
+        if not result['status'].startswith('200 '):
+            logged = '\n'.join(line for line in completed.stderr.splitlines() if not line.startswith('import time:'))
+            raise CommandError(f'{options["path"]} returned {result["status"]}\n{logged[-2000:]}'.rstrip())
+        return result, parse_importtime(completed.stderr)
+
+    def handle(self, *args, **options):
+        if sys.dont_write_bytecode:
+            self.stdout.write(self.style.WARNING(
+                'Bytecode caching is off (PYTHONDONTWRITEBYTECODE), so import times include compiling'
+            ))
+
+        # A first, discarded probe compiles bytecode and fills the shared caches,
+        # so both measured probes start from the state a restarted worker sees
+        self.probe(True, options)
+        results = {warm: self.probe(warm, options) for warm in (False, True)}
+
+        for warm, (result, _modules) in results.items():
+            label = 'with warm-up' if warm else 'without warm-up'
+            self.stdout.write(self.style.MIGRATE_HEADING(f'Startup phases {label} (status {result["status"]})'))
+            total = 0.0
+            for name, seconds in result['phases']:
+                total += seconds
+                self.stdout.write(f'  {name:<42} {seconds * 1000:8.1f}ms')
+            self.stdout.write(f'  {"ready and first page served":<42} {total * 1000:8.1f}ms')
+
+        # Imports from the warm-up run: everything a worker loads by its first response
+        modules = results[True][1]
+        if options['package']:
+            prefix = options['package']
+            modules = [m for m in modules if m[0] == prefix or m[0].startswith(prefix + '.')]
+        key = 2 if options['sort'] == 'cumulative' else 1
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'Slowest imports by {options["sort"]} time ({len(modules)} modules)'
+        ))
+        self.stdout.write(f'  {"self":>9} {"cumulative":>11}  module')
+        for name, own, cumulative in sorted(modules, key=lambda m: m[key], reverse=True)[:options['limit']]:
+            self.stdout.write(f'  {own * 1000:7.1f}ms {cumulative * 1000:9.1f}ms  {name}')
+
+        packages = defaultdict(float)
+        for name, own, _cumulative in results[True][1]:
+            packages[name.split('.')[0]] += own
+        self.stdout.write(self.style.MIGRATE_HEADING('Import time by top-level package'))
+        for package, own in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:options['limit']]:
+            self.stdout.write(f'  {own * 1000:7.1f}ms  {package}')
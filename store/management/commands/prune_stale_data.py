@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store import maintenance
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete expired sessions, empty idle carts, prune old finished tasks, remove unreferenced '
+        'media files and compact the database, in small batches safe to run alongside live traffic'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cart-days', type=int, default=30, help='Empty carts idle for this many days')
+        parser.add_argument('--task-days', type=int, default=7, help='Delete finished tasks older than this')
+        parser.add_argument('--chunk-size', type=int, default=maintenance.CHUNK_SIZE)
+        parser.add_argument('--pause', type=float, default=0.05, help='Seconds to sleep between batches')
+        parser.add_argument('--skip-media', action='store_true', help='Leave the media directory alone')
+        parser.add_argument('--skip-vacuum', action='store_true', help='Do not run ANALYZE/VACUUM')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be removed')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        batch = {
+            'chunk_size': options['chunk_size'],
+            'pause': options['pause'],
+            'dry_run': dry_run,
+            'progress': lambda done, total: self.stdout.write(f'    {done}/{total}'),
+        }
+        steps = [
+            ('Expired sessions', lambda: maintenance.prune_sessions(**batch)),
+            (f"Carts idle for {options['cart_days']}+ days", lambda: maintenance.empty_idle_carts(options['cart_days'], **batch)),
+            (f"Finished tasks older than {options['task_days']} days", lambda: maintenance.prune_tasks(options['task_days'], **batch)),
+        ]
+        if not options['skip_media']:
+            steps.append(('Unreferenced media files', lambda: maintenance.remove_orphaned_media(**batch)))
+
+        verb = 'would remove' if dry_run else 'removed'
+        for label, step in steps:
+            self.stdout.write(f'{label}...')
+            started = time.perf_counter()
+            count = step()
+            self.stdout.write(f'  {verb} {count} in {time.perf_counter() - started:.2f}s')
+
+        if not options['skip_vacuum'] and not dry_run:
+            self.stdout.write('ANALYZE / VACUUM...')
+            reclaimed = maintenance.compact_database()
+            self.stdout.write(f'  reclaimed {reclaimed / 1024:.0f} KiB')
+
+        self.stdout.write(self.style.SUCCESS('Done' if not dry_run else 'Dry run: nothing was changed'))
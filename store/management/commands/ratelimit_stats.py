@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from store.ratelimit import rejection_counts
+
+
+class Command(BaseCommand):
+    help = 'Show the configured rate limits and how many requests each has rejected'
+
+    def handle(self, *args, **options):
+        limits = getattr(settings, 'RATE_LIMITS', {})
+        if not limits:
+            self.stdout.write(self.style.WARNING('No rate limits configured (settings.RATE_LIMITS)'))
+            return
+        if not getattr(settings, 'METRICS_DIR', None):
+            self.stdout.write(self.style.WARNING(
+                'METRICS_DIR is not set, so rejections counted by the web workers cannot be read here'
+            ))
+        for name, rejected in rejection_counts().items():
+            capacity, period = limits[name]
+            self.stdout.write(f'{name:<20} {capacity:>4} per {period:>4}s  rejected: {rejected}')
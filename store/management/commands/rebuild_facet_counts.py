@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from store.facets import rebuild_facet_counts
+
+
+class Command(BaseCommand):
+    help = 'Recompute the movie facet counts (run after bulk imports or bulk updates)'
+
+    def handle(self, *args, **options):
+        values = rebuild_facet_counts()
+        self.stdout.write(self.style.SUCCESS(f'Successfully rebuilt counts for {values} facet values'))
@@ -0,0 +1,68 @@
+import os
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from store import taskqueue
+
+
+class Command(BaseCommand):
+    help = 'Run queued background tasks on a thread pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help='Worker threads')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--burst', action='store_true', help='Exit once no due tasks are left')
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency']
+        worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self.stdout.write(f'Worker {worker_id} started with {concurrency} thread(s)')
+
+        running = {}  # future: task row
+        last_heartbeat = 0.0
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='task') as pool:
+            while True:
+                close_old_connections()
+                if time.monotonic() - last_heartbeat >= taskqueue.HEARTBEAT_INTERVAL:
+                    taskqueue.heartbeat(worker_id, [task_row.id for task_row in running.values()])
+                    released = taskqueue.release_stale()
+                    if released:
+                        self.stdout.write(self.style.WARNING(f'Requeued {released} stale task(s)'))
+                    last_heartbeat = time.monotonic()
+
+                # Claim only as many tasks as there are idle threads, so a slow
+                # task never holds back others claimed alongside it
+                free = concurrency - len(running)
+                if free:
+                    for task_row in taskqueue.claim(worker_id, free):
+                        running[pool.submit(self.run_task, task_row)] = task_row
+
+                if not running:
+                    if options['burst']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                done, _ = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                for future in done:
+                    del running[future]
+                    self.report(future.result())
+
+        self.stdout.write(self.style.SUCCESS('Queue drained, worker exiting'))
+
+    def report(self, task_row):
+        style = self.style.SUCCESS if task_row.status == 'done' else self.style.WARNING
+        self.stdout.write(style(
+            f'{task_row.name} #{task_row.id}: {task_row.status} '
+            f'in {task_row.duration_ms:.1f}ms (attempt {task_row.attempts})'
+        ))
+
+    def run_task(self, task_row):
+        try:
+            return taskqueue.run(task_row)
+        finally:
+            connection.close()
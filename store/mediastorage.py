@@ -0,0 +1,136 @@
+"""
+Content-addressed media storage.
+
+Uploaded files are stored under a name derived from a hash of their
+content, sharded two directory levels deep:
+
+    movie_images/3f/a2/3fa2c41b9e0d5f6a7b8c9d0e1f2a3b4c.png
+
+Saving a file whose content is already stored writes nothing and returns
+the existing name, so identical uploads (the same poster twice, a user
+re-uploading their picture) share one file. Sharding keeps every directory
+small (at most 256 entries per level), so listings and the orphan scan in
+store/maintenance.py stay fast as media grows. Because a name always refers
+to the same bytes, serve_media() can mark such files immutable.
+
+Files saved before this storage existed keep their old names and still work;
+`manage.py dedupe_media` moves them to content-addressed names.
+
+As files can be shared, never delete a media file that another row might
+still reference; use maintenance.delete_unreferenced(). A save that reuses
+a stored file refreshes its mtime under a shared lock on the media
+directory, and the deletions in store/maintenance.py re-check the mtime
+under the exclusive lock, so a file is never deleted between being reused
+and being referenced by the row that is about to be saved.
+"""
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+
+HASH_LENGTH = 32  # hex digits of SHA-256 kept in the name (128 bits)
+CONTENT_ADDRESSED_NAME = re.compile(r'(?:^|/)([0-9a-f]{2})/([0-9a-f]{2})/(\1\2[0-9a-f]{%d})\.\w+$' % (HASH_LENGTH - 4))
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def is_content_addressed(name):
+    return CONTENT_ADDRESSED_NAME.search(name) is not None
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that names files by content hash and stores identical content once"""
+
+    def hashed_name(self, name, content):
+        """'movie_images/poster.PNG' -> 'movie_images/3f/a2/3fa2....png'"""
+        directory, filename = posixpath.split(name)
+        if is_content_addressed(name):
+            # Re-saving derived content under a stored name: drop the old shard directories
+            directory = posixpath.dirname(posixpath.dirname(directory))
+        extension = posixpath.splitext(filename)[1].lower()
+        digest = content_hash(content)
+        return posixpath.join(directory, digest[:2], digest[2:4], digest + extension)
+
+    @contextmanager
+    def lock(self, exclusive=False):
+        """Shared while a save reuses a file, exclusive while unreferenced files are deleted"""
+        try:
+            import fcntl
+        except ImportError:  # Windows: no locking
+            yield
+            return
+        os.makedirs(self.location, exist_ok=True)
+        with open(os.path.join(self.location, '.lock'), 'a') as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _save(self, name, content):
+        hashed = self.hashed_name(name, content)
+        with self.lock():
+            if self.exists(hashed):
+                # Refresh the mtime so the deletions in store/maintenance.py treat it as a fresh upload
+                os.utime(self.path(hashed))
+                return hashed
+            return super()._save(hashed, content)
+
+
+def serve_media(request, path):
+    """Serve an uploaded file; content-addressed names are cached forever"""
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('Invalid media path')
+    if not os.path.isfile(fullpath):
+        raise Http404('Media file not found')
+
+    stat = os.stat(fullpath)
+    match = CONTENT_ADDRESSED_NAME.search(path)
+    etag = f'"{match.group(3)}"' if match else None
+    if (etag and etag in request.headers.get('If-None-Match', '')) or not was_modified_since(
+        request.headers.get('If-Modified-Since'), stat.st_mtime
+    ):
+        response = HttpResponseNotModified()
+    else:
+        content_type, _ = mimetypes.guess_type(fullpath)
+        response = FileResponse(open(fullpath, 'rb'), content_type=content_type or 'application/octet-stream')
+        del response['Content-Disposition']
+    response['Last-Modified'] = http_date(stat.st_mtime)
+
+    if match:
+        response['ETag'] = etag
+        max_age = getattr(settings, 'MEDIA_MAX_AGE', 60 * 60 * 24 * 365)
+        patch_cache_control(response, public=True, max_age=max_age, immutable=True)
+    else:
+        # Legacy names can be overwritten in place
+        patch_cache_control(response, public=True, max_age=60 * 60)
+    return response
+
+
+def store_content_addressed(name):
+    """Copy a file stored under a legacy name to its content-addressed name; returns the new name"""
+    with default_storage.open(name, 'rb') as source:
+        return default_storage.save(name, source)
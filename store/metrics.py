@@ -0,0 +1,383 @@
+"""
+In-process metrics (counters and histograms) exposed in the Prometheus
+text format at /metrics.
+
+Metrics are declared once at import time:
+
+    ORDERS_PLACED = Counter('store_orders_placed_total', 'Orders placed', ['region'])
+    ORDERS_PLACED.labels(region='west').inc()
+
+Each worker process keeps its own values in memory. With METRICS_DIR set,
+a background thread in every process also writes a snapshot of its values
+to METRICS_DIR/<pid>-<start time>.json (every METRICS_FLUSH_INTERVAL when
+they have changed, and when the process exits), and /metrics sums the
+snapshots of all processes, so whichever worker answers the scrape reports
+totals for the whole deployment. The workers must share one host,
+as a snapshot's process is looked up by pid.
+
+A scrape folds the snapshots of processes that have exited into
+METRICS_DIR/retired.json, so the directory does not grow as workers are
+recycled and their counts stay in the totals. Counts a worker made after
+its last flush are lost if it is killed rather than exiting cleanly, so a
+counter can occasionally go backwards; Prometheus treats that as a reset.
+
+MetricsMiddleware counts requests and observes their latency per view.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import require_GET
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+RETIRED = 'retired.json'
+
+# Anything else is counted as 'other', so clients cannot add label values at will
+HTTP_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+_lock = threading.Lock()
+_registry = {}
+_changes = 0  # bumped by every update, so the flusher can skip unchanged snapshots
+_flushed_changes = None
+_flusher = None
+_process = None  # (pid, start time) naming this process's snapshot
+
+
+class _Child:
+    def __init__(self, metric, key):
+        self.metric = metric
+        self.key = key
+
+    def inc(self, amount=1):
+        global _changes
+        with _lock:
+            _changes += 1
+            values = self.metric.values
+            values[self.key] = values.get(self.key, 0) + amount
+
+    def observe(self, value):
+        global _changes
+        buckets = self.metric.buckets
+        with _lock:
+            _changes += 1
+            # [count per bucket..., +Inf count, sum]
+            series = self.metric.values.setdefault(self.key, [0] * (len(buckets) + 1) + [0.0])
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    series[index] += 1
+                    break
+            else:
+                series[len(buckets)] += 1
+            series[-1] += value
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        _registry[name] = self
+
+    def labels(self, **labels):
+        return _Child(self, tuple(str(labels[name]) for name in self.labelnames))
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+
+HTTP_REQUESTS = Counter('http_requests_total', 'HTTP requests by view, method and status', ['view', 'method', 'status'])
+HTTP_LATENCY = Histogram('http_request_duration_seconds', 'HTTP request latency by view', ['view'])
+ORDERS_PLACED = Counter('store_orders_placed_total', 'Orders placed', ['region'])
+ORDER_ITEMS = Counter('store_order_items_total', 'Movies sold in placed orders', ['region'])
+RATINGS_SUBMITTED = Counter('store_ratings_submitted_total', 'Quick ratings submitted', ['result'])
+CART_ADDS = Counter('store_cart_adds_total', 'Add-to-cart requests', ['result'])
+RATELIMIT_REJECTED = Counter('store_ratelimit_rejected_total', 'Requests rejected by the rate limiter', ['view'])
+CACHE_LOOKUPS = Counter('store_cache_lookups_total', 'Application cache lookups', ['cache', 'result'])
+
+
+def record_cache_lookup(cache_name, hit):
+    CACHE_LOOKUPS.labels(cache=cache_name, result='hit' if hit else 'miss').inc()
+
+
+def _snapshot():
+    with _lock:
+        return {
+            name: [[list(key), value] for key, value in metric.values.items()]
+            for name, metric in _registry.items()
+        }
+
+
+def _metrics_dir():
+    return getattr(settings, 'METRICS_DIR', None)
+
+
+def _snapshot_name():
+    # The start time tells a reused pid's snapshot from the exited process's;
+    # taken per pid so workers forked from a preloaded master each get their own
+    global _process
+    pid = os.getpid()
+    if _process is None or _process[0] != pid:
+        _process = (pid, time.time_ns() // 1000)
+    return f'{pid}-{_process[1]}.json'
+
+
+def _has_flock():
+    try:
+        import fcntl  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+@contextmanager
+def _directory_lock(directory, exclusive):
+    """Shared while snapshots are read, exclusive while dead ones are retired"""
+    import fcntl
+    with open(os.path.join(directory, '.lock'), 'a') as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def flush():
+    """Write this process's snapshot for other workers to aggregate"""
+    global _flushed_changes
+    directory = _metrics_dir()
+    if not directory:
+        return
+    with _lock:
+        changes = _changes
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, _snapshot_name())
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w') as target:
+        json.dump(_snapshot(), target)
+    os.replace(temporary, path)
+    _flushed_changes = changes
+
+
+def _run_flusher():
+    while True:
+        time.sleep(getattr(settings, 'METRICS_FLUSH_INTERVAL', 1.0))
+        if _changes == _flushed_changes:
+            continue
+        try:
+            flush()
+        except Exception:
+            logger.exception('Failed to write the metrics snapshot')
+
+
+def ensure_flusher():
+    """Start this process's flush thread; per pid, as threads do not survive a fork"""
+    global _flusher
+    if not _metrics_dir() or (_flusher is not None and _flusher.is_alive()):
+        return
+    with _lock:
+        if _flusher is not None and _flusher.is_alive():
+            return
+        _flusher = threading.Thread(target=_run_flusher, name='metrics-flush', daemon=True)
+        _flusher.start()
+
+
+@atexit.register
+def _flush_at_exit():
+    """Keep what was counted since the last flush when a worker exits cleanly"""
+    if _changes and _changes != _flushed_changes:
+        flush()
+
+
+def _merge(totals, snapshot, registered_only=True):
+    for name, series in snapshot.items():
+        if registered_only and name not in _registry:
+            continue
+        merged = totals.setdefault(name, {})
+        for key, value in series:
+            key = tuple(key)
+            if isinstance(value, list):
+                current = merged.get(key)
+                merged[key] = value[:] if current is None else [a + b for a, b in zip(current, value)]
+            else:
+                merged[key] = merged.get(key, 0) + value
+
+
+def _load(directory, filename):
+    """A snapshot file's contents, or None if it is gone or unreadable"""
+    try:
+        with open(os.path.join(directory, filename)) as source:
+            return json.load(source)
+    except (OSError, ValueError):
+        return None
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # someone else's process
+    return True
+
+
+def _dead_snapshots(directory):
+    """Snapshot files of processes that have exited (or whose pid a newer process has taken)"""
+    newest = {}
+    for filename in os.listdir(directory):
+        if not filename.endswith('.json') or filename == RETIRED:
+            continue
+        pid, _, started = filename[:-len('.json')].partition('-')
+        if not pid.isdigit():
+            continue
+        newest.setdefault(int(pid), []).append((int(started or 0), filename))
+    dead = []
+    for pid, snapshots in newest.items():
+        snapshots.sort()
+        dead += [filename for _started, filename in (snapshots if not _alive(pid) else snapshots[:-1])]
+    return dead
+
+
+def retire_dead_snapshots(directory):
+    """Fold snapshots of exited processes into RETIRED; returns how many were retired"""
+    # Without file locking (Windows) every snapshot is kept
+    if not _has_flock() or not _dead_snapshots(directory):
+        return 0
+    with _directory_lock(directory, exclusive=True):
+        retired = _load(directory, RETIRED) or {'sources': [], 'metrics': {}}
+        already = set(retired['sources'])
+        totals = {}
+        _merge(totals, retired['metrics'], registered_only=False)
+        sources = []
+        for filename in _dead_snapshots(directory):
+            if filename not in already:
+                snapshot = _load(directory, filename)
+                if snapshot is None:
+                    continue
+                _merge(totals, snapshot, registered_only=False)
+            sources.append(filename)
+
+        # Merged files are listed in RETIRED until they are deleted, so a crash
+        # between the two steps cannot count them twice
+        path = os.path.join(directory, RETIRED)
+        with open(f'{path}.tmp', 'w') as target:
+            json.dump({
+                'sources': sources,
+                'metrics': {name: [[list(key), value] for key, value in series.items()] for name, series in totals.items()},
+            }, target)
+        os.replace(f'{path}.tmp', path)
+        for filename in sources:
+            try:
+                os.remove(os.path.join(directory, filename))
+            except FileNotFoundError:
+                pass
+    return len(sources)
+
+
+def collect():
+    """{metric name: {label values: value}} summed over every process, live or retired"""
+    totals = {}
+    directory = _metrics_dir()
+    if directory and os.path.isdir(directory):
+        retire_dead_snapshots(directory)
+        with _directory_lock(directory, exclusive=False) if _has_flock() else nullcontext():
+            retired = _load(directory, RETIRED) or {'sources': [], 'metrics': {}}
+            _merge(totals, retired['metrics'])
+            skip = {RETIRED, _snapshot_name(), *retired['sources']}
+            for filename in os.listdir(directory):
+                if not filename.endswith('.json') or filename in skip:
+                    continue
+                snapshot = _load(directory, filename)
+                if snapshot is not None:  # else being replaced right now; picked up on the next scrape
+                    _merge(totals, snapshot)
+    _merge(totals, _snapshot())
+    return totals
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in [*zip(names, values), *extra]]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    totals = collect()
+    lines = []
+    for name, metric in _registry.items():
+        lines.append(f'# HELP {name} {metric.documentation}')
+        lines.append(f'# TYPE {name} {metric.kind}')
+        for key, value in sorted(totals.get(name, {}).items()):
+            if metric.kind == 'histogram':
+                cumulative = 0
+                for bound, count in zip([*metric.buckets, '+Inf'], value[:-1]):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_labels(metric.labelnames, key, [("le", bound)])} {cumulative}')
+                lines.append(f'{name}_sum{_labels(metric.labelnames, key)} {_number(value[-1])}')
+                lines.append(f'{name}_count{_labels(metric.labelnames, key)} {cumulative}')
+            else:
+                lines.append(f'{name}{_labels(metric.labelnames, key)} {_number(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+@require_GET
+def metrics_view(request):
+    """Prometheus scrape endpoint, limited to METRICS_ALLOWED_IPS"""
+    if request.META.get('REMOTE_ADDR') not in getattr(settings, 'METRICS_ALLOWED_IPS', ['127.0.0.1']):
+        return HttpResponseForbidden('Forbidden')
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class MetricsMiddleware:
+    """Count requests and observe latency per view; snapshots are written by a background thread"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unmatched'
+        method = request.method if request.method in HTTP_METHODS else 'other'
+        HTTP_REQUESTS.labels(view=view, method=method, status=response.status_code).inc()
+        HTTP_LATENCY.labels(view=view).observe(duration)
+        ensure_flusher()
+        return response
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0008_userprofile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedMovie',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_entries', to='store.movie')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='store.movie')),
+            ],
+            options={
+                'ordering': ['movie', 'rank'],
+                'unique_together': {('movie', 'rank')},
+            },
+        ),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:02
+
+from collections import Counter
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+# Frozen copy of store.facets as of this migration, so later changes there
+# cannot change what the migration computes
+PRICE_BUCKETS = [
+    ('under-10', None, Decimal('10')),
+    ('10-15', Decimal('10'), Decimal('15')),
+    ('15-20', Decimal('15'), Decimal('20')),
+    ('20-plus', Decimal('20'), None),
+]
+
+
+def facet_values(movie):
+    price = Decimal(str(movie.price))
+    bucket = next(
+        (value for value, low, high in PRICE_BUCKETS
+         if (low is None or price >= low) and (high is None or price < high)),
+        PRICE_BUCKETS[-1][0],
+    )
+    return {
+        'genre': movie.genre,
+        'rating': movie.rating,
+        'decade': f'{movie.release_year // 10 * 10}s',
+        'language': movie.language,
+        'price': bucket,
+    }
+
+
+def populate_facet_counts(apps, schema_editor):
+    Movie = apps.get_model('store', 'Movie')
+    FacetCount = apps.get_model('store', 'FacetCount')
+    counter = Counter()
+    for movie in Movie.objects.only('genre', 'rating', 'release_year', 'language', 'price').iterator():
+        counter.update(facet_values(movie).items())
+    FacetCount.objects.bulk_create(
+        FacetCount(facet=facet, value=value, count=count) for (facet, value), count in counter.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0009_relatedmovie'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('facet', models.CharField(max_length=20)),
+                ('value', models.CharField(max_length=50)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['facet', 'value'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['genre', '-created_at'], name='store_movie_genre_1fb665_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['rating', '-created_at'], name='store_movie_rating_e3b880_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['release_year'], name='store_movie_release_ee67f1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['language'], name='store_movie_languag_062e46_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['price'], name='store_movie_price_5002ed_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='facetcount',
+            unique_together={('facet', 'value')},
+        ),
+        migrations.RunPython(populate_facet_counts, migrations.RunPython.noop),
+    ]
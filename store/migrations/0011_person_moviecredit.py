@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Frozen copy of the parsing in store.credits as of this migration, so later
+# changes there cannot change what the migration computes
+
+def split_names(text):
+    names = []
+    for name in (text or '').split(','):
+        name = ' '.join(name.split())
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def populate_credits(apps, schema_editor):
+    Movie = apps.get_model('store', 'Movie')
+    Person = apps.get_model('store', 'Person')
+    MovieCredit = apps.get_model('store', 'MovieCredit')
+
+    credits = []
+    for movie in Movie.objects.only('id', 'director', 'cast').iterator():
+        credits += [(movie.id, name, 'director', i) for i, name in enumerate(split_names(movie.director))]
+        credits += [(movie.id, name, 'cast', i) for i, name in enumerate(split_names(movie.cast))]
+
+    names = sorted({name for _, name, _, _ in credits})
+    Person.objects.bulk_create([Person(name=name) for name in names], batch_size=500, ignore_conflicts=True)
+    people = dict(Person.objects.values_list('name', 'id'))
+    MovieCredit.objects.bulk_create(
+        [MovieCredit(movie_id=movie_id, person_id=people[name], role=role, order=order)
+         for movie_id, name, role, order in credits],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0010_facetcount_movie_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Person',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MovieCredit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(choices=[('director', 'Director'), ('cast', 'Cast')], max_length=10)),
+                ('order', models.PositiveSmallIntegerField(default=0, help_text='Billing order within the role')),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='credits', to='store.movie')),
+                ('person', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='credits', to='store.person')),
+            ],
+            options={
+                'ordering': ['movie', 'role', 'order'],
+                'indexes': [models.Index(fields=['person', 'role'], name='store_movie_person__95091e_idx')],
+                'unique_together': {('movie', 'person', 'role')},
+            },
+        ),
+        migrations.RunPython(populate_credits, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:09
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_reported_at(apps, schema_editor):
+    Review = apps.get_model('store', 'Review')
+    Review.objects.filter(is_reported=True, reported_at__isnull=True).update(reported_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0012_task'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='reported_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(condition=models.Q(('is_reported', False)), fields=['movie', '-created_at'], name='review_visible_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(condition=models.Q(('is_reported', True)), fields=['reported_at'], name='review_reported_idx'),
+        ),
+        migrations.RunPython(backfill_reported_at, migrations.RunPython.noop),
+    ]
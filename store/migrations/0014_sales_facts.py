@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0013_review_moderation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyMovieSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('region', models.CharField(choices=[('northeast', 'Northeast'), ('southeast', 'Southeast'), ('midwest', 'Midwest'), ('west', 'West')], max_length=20)),
+                ('genre', models.CharField(choices=[('action', 'Action'), ('adventure', 'Adventure'), ('animation', 'Animation'), ('comedy', 'Comedy'), ('crime', 'Crime'), ('documentary', 'Documentary'), ('drama', 'Drama'), ('family', 'Family'), ('fantasy', 'Fantasy'), ('horror', 'Horror'), ('mystery', 'Mystery'), ('romance', 'Romance'), ('sci-fi', 'Science Fiction'), ('thriller', 'Thriller'), ('western', 'Western')], max_length=20)),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'verbose_name_plural': 'daily movie sales',
+                'ordering': ['date', 'region', 'movie'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('region', models.CharField(choices=[('northeast', 'Northeast'), ('southeast', 'Southeast'), ('midwest', 'Midwest'), ('west', 'West')], max_length=20)),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'daily sales',
+                'ordering': ['date', 'region'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['created_at'], name='store_order_created_4ba192_idx'),
+        ),
+        migrations.AddField(
+            model_name='dailymoviesales',
+            name='movie',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='store.movie'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='dailysales',
+            unique_together={('date', 'region')},
+        ),
+        migrations.AddIndex(
+            model_name='dailymoviesales',
+            index=models.Index(fields=['movie', 'date'], name='store_daily_movie_i_310785_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailymoviesales',
+            index=models.Index(fields=['genre', 'date'], name='store_daily_genre_a1c6f1_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='dailymoviesales',
+            unique_together={('date', 'region', 'movie')},
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0014_sales_facts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='avatar_large',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='profile_pictures/avatars/'),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='avatar_small',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='profile_pictures/avatars/'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0015_userprofile_avatars'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='approved_at',
+            field=models.DateTimeField(blank=True, help_text='When a moderator last approved the review', null=True),
+        ),
+    ]
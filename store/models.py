@@ -51,6 +51,14 @@ class Movie(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Storefront facet filters
+            models.Index(fields=['genre', '-created_at']),
+            models.Index(fields=['rating', '-created_at']),
+            models.Index(fields=['release_year']),
+            models.Index(fields=['language']),
+            models.Index(fields=['price']),
+        ]
 
     def __str__(self):
         return self.title
@@ -108,16 +116,36 @@ class Review(models.Model):
     rating = models.IntegerField(choices=RATING_CHOICES, validators=[MinValueValidator(1), MaxValueValidator(5)])
     content = models.TextField()
     is_reported = models.BooleanField(default=False, help_text="Mark as True when review is reported for inappropriate content")
+    reported_at = models.DateTimeField(null=True, blank=True)
+    approved_at = models.DateTimeField(null=True, blank=True, help_text="When a moderator last approved the review")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
         unique_together = ['movie', 'user']  # One review per user per movie
+        indexes = [
+            # Partial indexes: visible reviews per movie, and the (small) moderation queue
+            models.Index(
+                fields=['movie', '-created_at'],
+                condition=models.Q(is_reported=False),
+                name='review_visible_idx',
+            ),
+            models.Index(
+                fields=['reported_at'],
+                condition=models.Q(is_reported=True),
+                name='review_reported_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user.username}'s review of {self.movie.title}"
 
+    @property
+    def is_approved(self):
+        """Approved by a moderator and not edited since (approval sets updated_at to approved_at)"""
+        return self.approved_at is not None and self.updated_at <= self.approved_at
+
 
 class Cart(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='cart')
@@ -162,6 +190,10 @@ class Order(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Date-range scans for the sales facts (store/analytics.py)
+            models.Index(fields=['created_at']),
+        ]
 
     def __str__(self):
         return f"Order #{self.id} by {self.user.username}"
@@ -187,6 +219,9 @@ class UserProfile(models.Model):
     """Extended user profile with additional fields"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     profile_picture = models.ImageField(upload_to='profile_pictures/', blank=True, null=True)
+    # Square thumbnails rendered from profile_picture by the process_profile_picture task
+    avatar_small = models.ImageField(upload_to='profile_pictures/avatars/', blank=True, null=True, editable=False)
+    avatar_large = models.ImageField(upload_to='profile_pictures/avatars/', blank=True, null=True, editable=False)
     bio = models.TextField(max_length=500, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -194,6 +229,21 @@ class UserProfile(models.Model):
     def __str__(self):
         return f"{self.user.username}'s profile"
 
+    def picture_files(self):
+        """Storage names of the picture and its avatars"""
+        return [f.name for f in (self.profile_picture, self.avatar_small, self.avatar_large) if f]
+
+    @property
+    def small_avatar_url(self):
+        """Navbar-sized avatar, or the full picture until the avatars have been rendered"""
+        picture = self.avatar_small or self.profile_picture
+        return picture.url if picture else ''
+
+    @property
+    def large_avatar_url(self):
+        picture = self.avatar_large or self.profile_picture
+        return picture.url if picture else ''
+
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -207,3 +257,141 @@ def save_user_profile(sender, instance, **kwargs):
     """Save the UserProfile when the User is saved"""
     if hasattr(instance, 'profile'):
         instance.profile.save()
+
+
+class RelatedMovie(models.Model):
+    """Precomputed item-to-item recommendation ("customers who liked this also liked")"""
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='related_entries')
+    related = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['movie', 'rank']
+        unique_together = ['movie', 'rank']
+
+    def __str__(self):
+        return f"{self.related.title} (#{self.rank}) for {self.movie.title}"
+
+
+class FacetCount(models.Model):
+    """Maintained number of movies per facet value (kept current by store.facets signals)"""
+    facet = models.CharField(max_length=20)
+    value = models.CharField(max_length=50)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['facet', 'value']
+        unique_together = ['facet', 'value']
+
+    def __str__(self):
+        return f"{self.facet}={self.value}: {self.count}"
+
+
+class Person(models.Model):
+    """A director or cast member, shared across movies"""
+    name = models.CharField(max_length=200, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
+class MovieCredit(models.Model):
+    """Links a Person to a Movie as director or cast (synced from Movie.director/Movie.cast)"""
+    ROLE_CHOICES = [
+        ('director', 'Director'),
+        ('cast', 'Cast'),
+    ]
+
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='credits')
+    person = models.ForeignKey(Person, on_delete=models.CASCADE, related_name='credits')
+    role = models.CharField(max_length=10, choices=ROLE_CHOICES)
+    order = models.PositiveSmallIntegerField(default=0, help_text="Billing order within the role")
+
+    class Meta:
+        ordering = ['movie', 'role', 'order']
+        unique_together = ['movie', 'person', 'role']
+        indexes = [
+            models.Index(fields=['person', 'role']),
+        ]
+
+    def __str__(self):
+        return f"{self.person.name} ({self.get_role_display()}) in {self.movie.title}"
+
+
+class Task(models.Model):
+    """A unit of background work, queued by store.taskqueue and run by the run_worker command"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_at = models.DateTimeField(help_text="Not picked up before this time")
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    duration_ms = models.FloatField(null=True, blank=True, help_text="Run time of the last attempt")
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.id} ({self.status})"
+
+
+class DailySales(models.Model):
+    """Sales fact per day and region (built by store.analytics from Order/OrderItem)"""
+    date = models.DateField()
+    region = models.CharField(max_length=20, choices=Order.REGION_CHOICES)
+    orders = models.PositiveIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['date', 'region']
+        unique_together = ['date', 'region']
+        verbose_name_plural = 'daily sales'
+
+    def __str__(self):
+        return f"{self.date} {self.region}: {self.orders} orders"
+
+
+class DailyMovieSales(models.Model):
+    """Sales fact per day, region and movie (genre copied from the movie for grouping)"""
+    date = models.DateField()
+    region = models.CharField(max_length=20, choices=Order.REGION_CHOICES)
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='daily_sales')
+    genre = models.CharField(max_length=20, choices=Movie.GENRE_CHOICES)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['date', 'region', 'movie']
+        unique_together = ['date', 'region', 'movie']
+        indexes = [
+            models.Index(fields=['movie', 'date']),
+            models.Index(fields=['genre', 'date']),
+        ]
+        verbose_name_plural = 'daily movie sales'
+
+    def __str__(self):
+        return f"{self.date} {self.region}: {self.units}x {self.movie.title}"
@@ -0,0 +1,61 @@
+"""
+Review moderation.
+
+Reported reviews are hidden from movie_detail and wait in the staff queue,
+which reads them through the partial review_reported_idx index. Approving
+makes a review visible again and records approved_at, after which further
+reports are ignored until the review is edited; removing deletes it. Both
+are set-based updates, and cached rating stats are refreshed once per
+affected movie.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .conditional import touch
+from .models import Review
+from .tasks import refresh_rating_stats
+
+
+def reported_reviews():
+    """The moderation queue, oldest report first"""
+    return Review.objects.filter(is_reported=True).select_related('user', 'movie').order_by('reported_at', 'id')
+
+
+def _refresh_stats(movie_ids):
+    movie_ids = sorted(set(movie_ids))
+    for movie_id in movie_ids:
+        refresh_rating_stats.delay(movie_id)
+    if movie_ids:
+        touch('catalog', *(f'movie:{movie_id}' for movie_id in movie_ids))
+
+
+def report_review(review):
+    """Hide a review until a moderator looks at it; returns False if a moderator already approved it"""
+    if review.is_approved:
+        return False
+    review.is_reported = True
+    review.reported_at = timezone.now()
+    review.save(update_fields=['is_reported', 'reported_at', 'updated_at'])
+    _refresh_stats([review.movie_id])
+    return True
+
+
+def approve_reviews(review_ids):
+    """Clear the report flag on the given reviews and mark them approved; returns how many were approved"""
+    with transaction.atomic():
+        queue = Review.objects.filter(id__in=review_ids, is_reported=True)
+        movie_ids = list(queue.values_list('movie_id', flat=True))
+        now = timezone.now()
+        approved = queue.update(is_reported=False, reported_at=None, approved_at=now, updated_at=now)
+    _refresh_stats(movie_ids)
+    return approved
+
+
+def remove_reviews(review_ids):
+    """Delete the given reported reviews; returns how many were removed"""
+    with transaction.atomic():
+        queue = Review.objects.filter(id__in=review_ids, is_reported=True)
+        movie_ids = list(queue.values_list('movie_id', flat=True))
+        removed, _ = queue.delete()
+    _refresh_stats(movie_ids)
+    return removed
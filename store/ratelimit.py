@@ -0,0 +1,137 @@
+"""
+Per-client rate limiting for write endpoints (settings.RATE_LIMITS).
+
+Each limited URL name gets a token bucket per client (the user id, or the
+IP address for anonymous requests) stored in the shared cache: `capacity`
+requests may be made in a burst, and tokens refill at capacity/period per
+second. A request that finds the bucket empty gets a 429 with Retry-After
+instead of reaching the view, so one client hammering the star buttons
+cannot queue up writes on the single SQLite writer.
+
+Buckets are read and written without a cross-process lock, so concurrent
+requests from the same client in different worker processes can slip a
+few extra requests through; that is fine for throttling. Within a process,
+threads updating the same bucket take one of a fixed set of striped locks,
+so clients never wait on each other's cache round trips.
+
+Only unsafe methods are limited, so e.g. showing the login form is free
+while submitting it takes a token.
+
+Logins are also capped per process by login_slot(): password hashing is
+deliberately slow, and a burst of logins must not occupy every worker
+thread while catalog pages wait.
+
+Rejections are logged and counted per URL name in the metrics registry
+(store_ratelimit_rejected_total in store/metrics.py), so they are summed
+across workers like every other counter; see rejection_counts() and the
+ratelimit_stats command.
+"""
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+
+from .metrics import RATELIMIT_REJECTED, collect
+
+
+logger = logging.getLogger(__name__)
+
+# Bucket keys hash onto these, so one client's requests are serialised per
+# process without a global lock around the cache I/O
+_bucket_locks = tuple(threading.Lock() for _ in range(64))
+_slots_lock = threading.Lock()
+_login_slots = None
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def _bucket_key(name, ident):
+    return f'ratelimit:{name}:{ident}'
+
+
+def client_id(request):
+    if request.user.is_authenticated:
+        return f'user:{request.user.id}'
+    return f"ip:{request.META.get('REMOTE_ADDR', 'unknown')}"
+
+
+def take_token(name, ident, capacity, period):
+    """Consume one token; returns 0 if allowed, otherwise seconds until a token is available"""
+    rate = capacity / period
+    key = _bucket_key(name, ident)
+    with _bucket_locks[hash(key) % len(_bucket_locks)]:
+        now = time.time()
+        tokens, updated = cache.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * rate)
+        if tokens < 1:
+            cache.set(key, (tokens, now), math.ceil(period))
+            return math.ceil((1 - tokens) / rate)
+        cache.set(key, (tokens - 1, now), math.ceil(period))
+    return 0
+
+
+def record_rejection(name):
+    RATELIMIT_REJECTED.labels(view=name).inc()
+
+
+def rejection_counts():
+    """{url name: requests rejected} for every limited URL name, summed over worker processes"""
+    rejected = collect().get(RATELIMIT_REJECTED.name, {})
+    return {name: rejected.get((name,), 0) for name in getattr(settings, 'RATE_LIMITS', {})}
+
+
+@contextmanager
+def login_slot():
+    """Wait up to LOGIN_QUEUE_TIMEOUT for one of LOGIN_MAX_CONCURRENT login slots; yields whether one was acquired"""
+    global _login_slots
+    with _slots_lock:
+        if _login_slots is None:
+            _login_slots = threading.BoundedSemaphore(getattr(settings, 'LOGIN_MAX_CONCURRENT', 2))
+    acquired = _login_slots.acquire(timeout=getattr(settings, 'LOGIN_QUEUE_TIMEOUT', 2.0))
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            _login_slots.release()
+
+
+def too_many_requests(request, retry_after):
+    message = 'Too many requests. Please wait a moment and try again.'
+    if 'text/html' in request.headers.get('Accept', ''):
+        response = HttpResponse(message, status=429, content_type='text/plain')
+    else:
+        response = JsonResponse({'success': False, 'message': message}, status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+class RateLimitMiddleware:
+    """Apply settings.RATE_LIMITS = {url name: (capacity, period in seconds)} before the view runs"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method in SAFE_METHODS:
+            return None
+        name = request.resolver_match.url_name if request.resolver_match else None
+        limit = getattr(settings, 'RATE_LIMITS', {}).get(name)
+        if limit is None:
+            return None
+
+        ident = client_id(request)
+        retry_after = take_token(name, ident, *limit)
+        if not retry_after:
+            return None
+
+        record_rejection(name)
+        logger.warning('Rate limited %s for %s (retry after %ss)', name, ident, retry_after)
+        return too_many_requests(request, retry_after)
@@ -0,0 +1,192 @@
+"""
+Optional write-behind buffering for quick ratings (settings.RATING_WRITE_BEHIND).
+
+Instead of one update_or_create per star click, accepted ratings are kept in
+a per-process dict keyed by (movie_id, user_id), so repeated clicks by the
+same user coalesce into one row. A background thread upserts the buffer in
+a single bulk statement every RATING_BUFFER_FLUSH_INTERVAL seconds, or
+sooner once RATING_BUFFER_MAX_SIZE entries are pending. The response uses an
+optimistic average from cached per-movie sums. Ratings written directly
+(the bulk rating API) go through write_through(), which drops older pending
+clicks for the same movie and user so a later flush cannot overwrite them.
+
+Durability: a rating is acknowledged before it is written. A graceful
+shutdown flushes the buffer (atexit), but if the worker process is killed
+or crashes, ratings accepted in the last flush interval are lost. Reviews,
+orders and everything else are still written synchronously. Leave the
+setting off when every click must survive a crash.
+"""
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .conditional import touch
+from .metrics import record_cache_lookup
+from .models import Rating, Review
+
+
+logger = logging.getLogger(__name__)
+
+STATS_CACHE_TIMEOUT = 60
+
+
+def stats_cache_key(movie_id):
+    return f'rating_stats:{movie_id}'
+
+
+def rating_stats(movie_id):
+    """Cached sums and counts of visible review ratings and quick ratings for a movie"""
+    key = stats_cache_key(movie_id)
+    stats = cache.get(key)
+    record_cache_lookup('rating_stats', stats is not None)
+    if stats is None:
+        reviews = Review.objects.filter(movie_id=movie_id, is_reported=False).aggregate(
+            total=Sum('rating'), count=Count('id')
+        )
+        ratings = Rating.objects.filter(movie_id=movie_id).aggregate(total=Sum('rating'), count=Count('id'))
+        stats = {
+            'review_sum': reviews['total'] or 0,
+            'review_count': reviews['count'],
+            'rating_sum': ratings['total'] or 0,
+            'rating_count': ratings['count'],
+        }
+        cache.set(key, stats, STATS_CACHE_TIMEOUT)
+    return stats
+
+
+def combined_average(stats):
+    """(average, count) across reviews and quick ratings, as shown on the detail page"""
+    count = stats['review_count'] + stats['rating_count']
+    if not count:
+        return 0, 0
+    return (stats['review_sum'] + stats['rating_sum']) / count, count
+
+
+def write_ratings(ratings):
+    """Upsert {(movie_id, user_id): rating} in one statement; returns the number of rows written"""
+    now = timezone.now()
+    rows = [
+        Rating(movie_id=movie_id, user_id=user_id, rating=rating, created_at=now, updated_at=now)
+        for (movie_id, user_id), rating in ratings.items()
+    ]
+    Rating.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['movie', 'user'],
+        update_fields=['rating', 'updated_at'],
+    )
+
+    # Drop the cached sums so the next read reflects the database again
+    movie_ids = {movie_id for movie_id, _ in ratings}
+    cache.delete_many([stats_cache_key(movie_id) for movie_id in movie_ids])
+    # bulk_create sends no signals, so mark the pages stale here
+    touch('catalog', *(f'movie:{movie_id}' for movie_id in movie_ids))
+    return len(rows)
+
+
+class RatingBuffer:
+    """Coalescing in-memory buffer of pending quick ratings, flushed by a daemon thread"""
+
+    def __init__(self, flush_interval=None, max_size=None):
+        self.flush_interval = flush_interval or getattr(settings, 'RATING_BUFFER_FLUSH_INTERVAL', 2.0)
+        self.max_size = max_size or getattr(settings, 'RATING_BUFFER_MAX_SIZE', 1000)
+        self.pending = {}
+        self.lock = threading.Lock()
+        # Held while writing, so a direct write cannot land before an older batch
+        self.write_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = None
+
+    def __len__(self):
+        return len(self.pending)
+
+    def add(self, movie_id, user_id, rating):
+        """Buffer a rating; returns the previously pending value for this user/movie (or None)"""
+        with self.lock:
+            previous = self.pending.get((movie_id, user_id))
+            self.pending[(movie_id, user_id)] = rating
+            size = len(self.pending)
+        self._ensure_flusher()
+        if size >= self.max_size:
+            self.wake.set()
+        return previous
+
+    def flush(self):
+        """Write every pending rating in one upsert; returns the number of rows written"""
+        with self.write_lock:
+            with self.lock:
+                pending, self.pending = self.pending, {}
+            if not pending:
+                return 0
+
+            try:
+                return write_ratings(pending)
+            except Exception:
+                # Put the batch back (newer clicks win) so the next flush retries it
+                with self.lock:
+                    for key, rating in pending.items():
+                        self.pending.setdefault(key, rating)
+                raise
+
+    def write_through(self, ratings):
+        """Write {(movie_id, user_id): rating} now, dropping older pending clicks for the same keys"""
+        with self.write_lock:
+            with self.lock:
+                for key in ratings:
+                    self.pending.pop(key, None)
+            return write_ratings(ratings)
+
+    def _ensure_flusher(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.thread = threading.Thread(target=self._run, name='rating-buffer-flush', daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        while True:
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Failed to flush %d buffered ratings', len(self.pending))
+            finally:
+                connection.close()
+
+
+buffer = RatingBuffer()
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        buffer.flush()
+    except Exception:
+        logger.exception('Lost %d buffered ratings at shutdown', len(buffer.pending))
+
+
+def submit_buffered_rating(movie_id, user_id, rating):
+    """Accept a rating into the buffer; returns (created, optimistic average, total count)"""
+    previous = buffer.add(movie_id, user_id, rating)
+    if previous is None:
+        previous = Rating.objects.filter(movie_id=movie_id, user_id=user_id).values_list('rating', flat=True).first()
+
+    stats = dict(rating_stats(movie_id))
+    if previous is None:
+        stats['rating_sum'] += rating
+        stats['rating_count'] += 1
+    else:
+        stats['rating_sum'] += rating - previous
+    cache.set(stats_cache_key(movie_id), stats, STATS_CACHE_TIMEOUT)
+
+    average, count = combined_average(stats)
+    return previous is None, average, count
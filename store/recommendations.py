@@ -0,0 +1,107 @@
+"""
+Offline item-to-item recommendations.
+
+Purchases (OrderItem) and positive quick ratings (Rating >= LIKED_RATING) are
+treated as implicit "likes". The user x movie matrix is built as a sparse
+matrix, multiplied by its transpose to get movie co-occurrence counts, and
+cosine-normalised (co-likes / sqrt(likes_i * likes_j)) so blockbusters don't
+dominate every list. The top-K
+neighbours per movie are written to RelatedMovie so the detail page only
+needs one indexed lookup.
+"""
+from itertools import chain
+
+from django.db import transaction
+
+from .models import OrderItem, Rating, RelatedMovie
+
+
+DEFAULT_TOP_K = 6
+LIKED_RATING = 4
+CHUNK_SIZE = 20000
+
+
+def _interaction_arrays(np):
+    """Return (user_ids, movie_ids) arrays for every implicit like"""
+    purchases = OrderItem.objects.values_list('order__user_id', 'movie_id').iterator(chunk_size=CHUNK_SIZE)
+    likes = Rating.objects.filter(
+        rating__gte=LIKED_RATING
+    ).values_list('user_id', 'movie_id').iterator(chunk_size=CHUNK_SIZE)
+
+    flat = chain.from_iterable(chain(purchases, likes))
+    pairs = np.fromiter(flat, dtype=np.int64).reshape(-1, 2)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def build_related_movies(top_k=DEFAULT_TOP_K):
+    """Compute top-K related movies for the whole catalog; returns {movie_id: [(related_id, score)]}"""
+    import numpy as np
+    from scipy import sparse
+
+    user_ids, movie_ids = _interaction_arrays(np)
+    if not len(user_ids):
+        return {}
+
+    # Compact ids into dense row/column indexes
+    users, user_index = np.unique(user_ids, return_inverse=True)
+    movies, movie_index = np.unique(movie_ids, return_inverse=True)
+
+    interactions = sparse.csr_matrix(
+        (np.ones(len(user_index), dtype=np.float32), (user_index, movie_index)),
+        shape=(len(users), len(movies)),
+    )
+    # Buying and rating the same movie still counts as a single like
+    interactions.data[:] = 1.0
+
+    cooccurrence = (interactions.T @ interactions).tocsr()
+    cooccurrence.setdiag(0)
+    cooccurrence.eliminate_zeros()
+
+    # Users who liked each movie; every movie here has at least one
+    likes = np.asarray(interactions.sum(axis=0)).ravel()
+    norms = sparse.diags(1.0 / np.sqrt(likes))
+    similarity = (norms @ cooccurrence @ norms).tocsr()
+
+    related = {}
+    for row in range(similarity.shape[0]):
+        start, end = similarity.indptr[row], similarity.indptr[row + 1]
+        if start == end:
+            continue
+        columns = similarity.indices[start:end]
+        scores = similarity.data[start:end]
+        if len(scores) > top_k:
+            best = np.argpartition(-scores, top_k)[:top_k]
+            columns, scores = columns[best], scores[best]
+        order = np.argsort(-scores, kind='stable')
+        related[int(movies[row])] = [
+            (int(movies[columns[i]]), float(scores[i])) for i in order
+        ]
+    return related
+
+
+def store_related_movies(related, batch_size=5000):
+    """Replace the RelatedMovie table with freshly computed neighbours"""
+    rows = [
+        RelatedMovie(movie_id=movie_id, related_id=related_id, score=score, rank=rank)
+        for movie_id, neighbours in related.items()
+        for rank, (related_id, score) in enumerate(neighbours, start=1)
+    ]
+    with transaction.atomic():
+        RelatedMovie.objects.all().delete()
+        RelatedMovie.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def related_movie_ids(movie_id, limit=DEFAULT_TOP_K):
+    """Ids of the movies get_related_movies() shows, without loading them"""
+    return list(
+        RelatedMovie.objects.filter(movie_id=movie_id).order_by('rank').values_list('related_id', flat=True)[:limit]
+    )
+
+
+def get_related_movies(movie, limit=DEFAULT_TOP_K):
+    """Precomputed neighbours for the detail page (single indexed query)"""
+    return [
+        entry.related for entry in
+        RelatedMovie.objects.filter(movie=movie).select_related('related').order_by('rank')[:limit]
+    ]
@@ -0,0 +1,162 @@
+"""
+Structured (JSON) logging with per-request correlation ids.
+
+RequestLogMiddleware gives every request an id (the client's X-Request-ID
+if it sent a sane one, otherwise a new one), echoes it in the response
+header and attaches it to every log record emitted while the request is
+handled, so the access line, slow queries and any warnings of one request
+can be grouped. Background tasks get `task-<id>` the same way.
+
+Each request writes one access line to the `store.requests` logger. Queries
+slower than SLOW_QUERY_THRESHOLD_MS are logged to `store.db.slow` with their
+SQL and view name, for a SLOW_QUERY_SAMPLE_RATE fraction of them.
+
+QueuedStreamHandler formats records on the calling thread but hands the
+write to a background thread through a bounded queue, so a slow stdout or
+log pipe never blocks a request; if the queue is full, records are dropped
+and counted rather than waited on.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import connection
+
+
+_correlation_id = ContextVar('correlation_id', default=None)
+_view_name = ContextVar('view_name', default=None)
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+VALID_REQUEST_ID = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+access_logger = logging.getLogger('store.requests')
+slow_query_logger = logging.getLogger('store.db.slow')
+
+# LogRecord attributes that are not "extra" fields
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def get_correlation_id():
+    return _correlation_id.get()
+
+
+@contextmanager
+def correlation_id(value):
+    """Attach `value` as the correlation id of every record logged inside the block"""
+    token = _correlation_id.set(value)
+    try:
+        yield value
+    finally:
+        _correlation_id.reset(token)
+
+
+class CorrelationIdFilter(logging.Filter):
+    def filter(self, record):
+        record.correlation_id = _correlation_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, correlation id and any `extra` fields"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class QueuedStreamHandler(logging.handlers.QueueHandler):
+    """Write formatted records to `stream` from a background thread (see module docstring)"""
+
+    def __init__(self, stream=None, maxsize=10000):
+        super().__init__(queue.Queue(maxsize))
+        target = logging.StreamHandler(stream or sys.stderr)
+        target.setFormatter(logging.Formatter('%(message)s'))
+        self.dropped = 0
+        self.listener = logging.handlers.QueueListener(self.queue, target)
+        self.listener.start()
+        atexit.register(self.listener.stop)
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _slow_query_wrapper(threshold, sample_rate):
+    def wrapper(execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            if duration_ms >= threshold and random.random() < sample_rate:
+                slow_query_logger.warning(
+                    'Slow query (%.1fms) in %s', duration_ms, _view_name.get(),
+                    extra={'duration_ms': round(duration_ms, 1), 'sql': sql, 'view': _view_name.get()},
+                )
+    return wrapper
+
+
+class RequestLogMiddleware:
+    """Correlation ids, one access log line per request and sampled slow-query logging"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.threshold = getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', 100)
+        self.sample_rate = getattr(settings, 'SLOW_QUERY_SAMPLE_RATE', 1.0)
+
+    def __call__(self, request):
+        request_id = request.headers.get(REQUEST_ID_HEADER, '')
+        if not VALID_REQUEST_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+        request.request_id = request_id
+
+        view_token = _view_name.set(None)
+        started = time.perf_counter()
+        with correlation_id(request_id):
+            with connection.execute_wrapper(_slow_query_wrapper(self.threshold, self.sample_rate)):
+                response = self.get_response(request)
+            duration_ms = (time.perf_counter() - started) * 1000
+            # Only report a user already loaded by the view; loading it here would cost a query
+            user = getattr(request, '_cached_user', None)
+            access_logger.info(
+                '%s %s %s', request.method, request.path, response.status_code,
+                extra={
+                    'method': request.method,
+                    'path': request.path,
+                    'status': response.status_code,
+                    'duration_ms': round(duration_ms, 1),
+                    'view': _view_name.get(),
+                    'user_id': user.id if user is not None and user.is_authenticated else None,
+                },
+            )
+        _view_name.reset(view_token)
+        response[REQUEST_ID_HEADER] = request_id
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        _view_name.set(match.view_name if match else getattr(view_func, '__name__', None))
+        return None
@@ -0,0 +1,160 @@
+"""
+Static file storage and serving with content-hashed names and precompression.
+
+collectstatic writes every file under a name containing its content hash
+(css/base.3f1c...css), so a changed file gets a new URL and old URLs can be
+cached forever. Text assets also get .gz and .br siblings written at
+collectstatic time, so nothing is compressed per request. Brotli output needs
+the optional `brotli` package; without it only gzip variants are written.
+
+serve_static() serves STATIC_ROOT when Django itself answers /static/ (no
+front server mapping): it picks the best precompressed variant for the
+client's Accept-Encoding and marks hashed files immutable for a year.
+"""
+import gzip
+import logging
+import mimetypes
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.map', '.svg', '.json', '.txt', '.html', '.xml')
+MIN_COMPRESS_SIZE = 256
+
+# (encoding token, file suffix), most preferred first
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+def _has_brotli():
+    try:
+        import brotli  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _brotli_compress(data):
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli.compress(data, quality=11)
+
+
+def _gzip_compress(data):
+    # mtime=0 keeps the output identical between runs for unchanged files
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage that also writes .gz and .br copies of hashed text files"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        hashed_names = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                hashed_names.add(hashed_name)
+            yield name, hashed_name, processed
+
+        if dry_run:
+            return
+
+        if not _has_brotli():
+            logger.warning('brotli is not installed; writing gzip variants only. Install it with: pip install brotli')
+
+        written = 0
+        for hashed_name in sorted(hashed_names):
+            if hashed_name.endswith(COMPRESSIBLE_EXTENSIONS):
+                written += self._write_compressed(hashed_name)
+        logger.info('Wrote %d precompressed static files', written)
+
+    def _write_compressed(self, name):
+        with self.open(name) as source:
+            data = source.read()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return 0
+
+        written = 0
+        for suffix, compress in (('.gz', _gzip_compress), ('.br', _brotli_compress)):
+            compressed = compress(data)
+            if compressed is None or len(compressed) >= len(data):
+                continue
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            self._save(name + suffix, ContentFile(compressed))
+            written += 1
+        return written
+
+
+_hashed_names = None
+
+
+def _is_hashed(path):
+    """True if path is a content-hashed name from the collectstatic manifest"""
+    global _hashed_names
+    if _hashed_names is None:
+        _hashed_names = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+    return path in _hashed_names
+
+
+def _accepted_encodings(request):
+    accepted = set()
+    for part in request.headers.get('Accept-Encoding', '').split(','):
+        token, _, params = part.partition(';')
+        params = params.strip()
+        try:
+            quality = float(params[2:]) if params.startswith('q=') else 1.0
+        except ValueError:
+            quality = 0
+        if quality > 0:
+            accepted.add(token.strip().lower())
+    return accepted
+
+
+def serve_static(request, path):
+    """Serve a collected static file, precompressed where possible, with long-lived caching for hashed names"""
+    try:
+        fullpath = safe_join(settings.STATIC_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('Invalid static path')
+    if not os.path.isfile(fullpath):
+        raise Http404('Static file not found')
+
+    content_type, _ = mimetypes.guess_type(fullpath)
+    accepted = _accepted_encodings(request)
+    encoding = None
+    for token, suffix in ENCODINGS:
+        if token in accepted and os.path.isfile(fullpath + suffix):
+            encoding = token
+            fullpath += suffix
+            break
+
+    stat = os.stat(fullpath)
+    if not was_modified_since(request.headers.get('If-Modified-Since'), stat.st_mtime):
+        response = HttpResponseNotModified()
+    else:
+        response = FileResponse(open(fullpath, 'rb'), content_type=content_type or 'application/octet-stream')
+        # FileResponse names the (possibly .gz/.br) file on disk; browsers don't need it
+        del response['Content-Disposition']
+        if encoding:
+            response['Content-Encoding'] = encoding
+    response['Last-Modified'] = http_date(stat.st_mtime)
+
+    if _is_hashed(path):
+        max_age = getattr(settings, 'STATIC_MAX_AGE', 60 * 60 * 24 * 365)
+        patch_cache_control(response, public=True, max_age=max_age, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=60 * 60)
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
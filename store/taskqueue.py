@@ -0,0 +1,154 @@
+"""
+Small database-backed task queue.
+
+Functions decorated with @task can be queued from a view with
+``func.delay(*args)`` (or ``func.schedule(countdown, *args)``) and return
+immediately; the run_worker management command claims due tasks and runs
+them on a thread pool. Failed tasks are retried with exponential backoff up
+to ``max_attempts``, unless they raise PermanentError (retrying cannot help).
+A worker renews the lease (locked_at) of its running tasks every
+HEARTBEAT_INTERVAL; a task whose lease lapses is taken to have lost its
+worker and is requeued, which also counts as an attempt. Arguments must be
+JSON-serialisable (pass ids, not model instances). With settings.TASK_QUEUE_EAGER = True tasks run inline,
+which is handy when no worker is running.
+"""
+import logging
+import time
+import traceback
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Task
+from .requestlog import correlation_id
+
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+RETRY_BASE_DELAY = 10  # seconds, doubled per attempt
+HEARTBEAT_INTERVAL = 30  # seconds between lease renewals by a worker
+STALE_LOCK_TIMEOUT = timedelta(minutes=5)
+
+
+class PermanentError(Exception):
+    """Raised by a task whose failure would repeat on every attempt, so it is not retried"""
+
+
+def task(name=None, max_attempts=3):
+    """Register a function as a background task"""
+    def decorator(func):
+        task_name = name or f'{func.__module__}.{func.__name__}'
+        registry[task_name] = func
+
+        @wraps(func)
+        def delay(*args, **kwargs):
+            return enqueue(task_name, args, kwargs, max_attempts=max_attempts)
+
+        def schedule(countdown, *args, **kwargs):
+            return enqueue(task_name, args, kwargs, max_attempts=max_attempts, countdown=countdown)
+
+        func.task_name = task_name
+        func.delay = delay
+        func.schedule = schedule
+        return func
+    return decorator
+
+
+def enqueue(name, args=(), kwargs=None, max_attempts=3, countdown=0):
+    """Queue a registered task; it is only visible to workers once the transaction commits"""
+    if name not in registry:
+        raise KeyError(f'Unknown task: {name}')
+    if getattr(settings, 'TASK_QUEUE_EAGER', False):
+        registry[name](*args, **(kwargs or {}))
+        return None
+    return Task.objects.create(
+        name=name,
+        args=list(args),
+        kwargs=kwargs or {},
+        max_attempts=max_attempts,
+        run_at=timezone.now() + timedelta(seconds=countdown),
+    )
+
+
+def claim(worker_id, limit):
+    """Atomically mark up to `limit` due tasks as running for this worker"""
+    now = timezone.now()
+    with transaction.atomic():
+        due = list(
+            Task.objects.filter(status='queued', run_at__lte=now)
+            .order_by('run_at', 'id')
+            .values_list('id', flat=True)[:limit]
+        )
+        if not due:
+            return []
+        # The status guard makes the claim safe against other workers
+        Task.objects.filter(id__in=due, status='queued').update(
+            status='running', locked_by=worker_id, locked_at=now
+        )
+    return list(Task.objects.filter(id__in=due, status='running', locked_by=worker_id).order_by('run_at', 'id'))
+
+
+def heartbeat(worker_id, task_ids):
+    """Renew the lease on tasks this worker is still running"""
+    if not task_ids:
+        return 0
+    return Task.objects.filter(id__in=task_ids, status='running', locked_by=worker_id).update(
+        locked_at=timezone.now()
+    )
+
+
+def release_stale(timeout=STALE_LOCK_TIMEOUT):
+    """
+    Requeue tasks whose worker stopped renewing their lease (it died or hung).
+
+    The lost run counts as an attempt, so a task that keeps killing its
+    worker fails after max_attempts instead of being retried forever.
+    """
+    now = timezone.now()
+    stale = Task.objects.filter(status='running', locked_at__lt=now - timeout)
+    failed = stale.filter(attempts__gte=F('max_attempts') - 1).update(
+        status='failed', attempts=F('attempts') + 1, finished_at=now, locked_by='', locked_at=None,
+        last_error='The worker stopped while running this task',
+    )
+    requeued = stale.update(status='queued', attempts=F('attempts') + 1, locked_by='', locked_at=None)
+    return failed + requeued
+
+
+def run(task_row):
+    """Execute one claimed task and record its outcome and timing"""
+    func = registry.get(task_row.name)
+    task_row.attempts += 1
+    started = time.perf_counter()
+    try:
+        if func is None:
+            raise KeyError(f'Unknown task: {task_row.name}')
+        with correlation_id(f'task-{task_row.id}'):
+            func(*task_row.args, **task_row.kwargs)
+    except Exception as exc:
+        task_row.duration_ms = (time.perf_counter() - started) * 1000
+        task_row.last_error = traceback.format_exc()
+        if task_row.attempts < task_row.max_attempts and not isinstance(exc, PermanentError):
+            delay = RETRY_BASE_DELAY * 2 ** (task_row.attempts - 1)
+            task_row.status = 'queued'
+            task_row.run_at = timezone.now() + timedelta(seconds=delay)
+        else:
+            task_row.status = 'failed'
+            task_row.finished_at = timezone.now()
+        logger.warning('Task %s #%s failed (attempt %d)', task_row.name, task_row.id, task_row.attempts)
+    else:
+        task_row.duration_ms = (time.perf_counter() - started) * 1000
+        task_row.status = 'done'
+        task_row.last_error = ''
+        task_row.finished_at = timezone.now()
+    task_row.locked_by = ''
+    task_row.locked_at = None
+    task_row.save(update_fields=[
+        'attempts', 'status', 'run_at', 'last_error', 'duration_ms', 'finished_at', 'locked_by', 'locked_at',
+    ])
+    return task_row
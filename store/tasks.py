@@ -0,0 +1,129 @@
+"""Background tasks for slow side effects (run by the run_worker command)"""
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Sum
+
+from . import analytics
+from .conditional import touch
+from .maintenance import delete_unreferenced
+from .models import OrderItem, Task, UserProfile
+from .rating_buffer import rating_stats, stats_cache_key
+from .taskqueue import PermanentError, task
+
+
+TRENDING_CACHE_TIMEOUT = 60 * 5
+SALES_FACTS_DELAY = 60  # seconds; orders placed meanwhile share one rebuild
+TRENDING_DELAY = 10  # seconds; orders placed meanwhile share one refresh per region
+AVATAR_MAX_SIZE = (512, 512)
+# Square avatars, twice the size they are displayed at (navbar, profile pages)
+AVATAR_SIZES = {'avatar_small': 64, 'avatar_large': 400}
+
+
+def trending_cache_key(region):
+    return f'trending:{region}'
+
+
+def compute_trending(region, limit=10):
+    """Top movies by units sold, for one region or 'global'"""
+    items = OrderItem.objects.all()
+    if region != 'global':
+        items = items.filter(order__region=region)
+    qs = items.values('movie__title').annotate(total=Sum('quantity')).order_by('-total')[:limit]
+    return [{'title': row['movie__title'], 'count': row['total']} for row in qs]
+
+
+def _schedule_once(func, countdown, *args):
+    """Queue `func(*args)` unless a run with the same arguments is already waiting"""
+    if not Task.objects.filter(name=func.task_name, status='queued', args=list(args)).exists():
+        func.schedule(countdown, *args)
+
+
+@task()
+def refresh_trending(region):
+    data = compute_trending(region)
+    cache.set(trending_cache_key(region), data, TRENDING_CACHE_TIMEOUT)
+    touch('orders')
+    return data
+
+
+def schedule_trending_refresh(region):
+    """Queue refresh_trending for a region unless one is already waiting"""
+    _schedule_once(refresh_trending, TRENDING_DELAY, region)
+
+
+@task()
+def refresh_sales_facts():
+    """Rebuild the daily sales facts for days with new or changed orders"""
+    return analytics.update_sales_facts()
+
+
+def schedule_sales_facts_refresh():
+    """Queue refresh_sales_facts unless a run is already waiting"""
+    _schedule_once(refresh_sales_facts, SALES_FACTS_DELAY)
+
+
+@task()
+def refresh_rating_stats(movie_id):
+    """Recompute a movie's cached rating sums after its reviews changed"""
+    cache.delete(stats_cache_key(movie_id))
+    rating_stats(movie_id)
+
+
+@task(max_attempts=2)
+def process_profile_picture(profile_id, replaced=()):
+    """
+    Normalise orientation and shrink an uploaded profile picture, render the
+    fixed-size avatars, then delete the files it replaced.
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    profile = UserProfile.objects.filter(id=profile_id).first()
+    if profile is None or not profile.profile_picture:
+        return
+    name = profile.profile_picture.name
+
+    with profile.profile_picture.open('rb') as source:
+        try:
+            image = Image.open(source)
+        except UnidentifiedImageError as exc:
+            raise PermanentError(f'{name} is not an image Pillow can read') from exc
+        # The form checked this too, but the file may predate the limit
+        if max(image.size) > settings.PROFILE_PICTURE_MAX_DIMENSION:
+            raise PermanentError(f'{name} is {image.width}x{image.height}, too large to decode')
+        # JPEGs can be decoded at 1/2, 1/4 or 1/8 scale, much cheaper for phone photos
+        image.draft('RGB', AVATAR_MAX_SIZE)
+        image.load()
+    image_format = image.format or 'JPEG'
+    image = ImageOps.exif_transpose(image)
+    shrunk_name = name
+    if image.width > AVATAR_MAX_SIZE[0] or image.height > AVATAR_MAX_SIZE[1]:
+        image.thumbnail(AVATAR_MAX_SIZE)
+        if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        # Media is content-addressed (and may be shared), so write a new file rather than overwrite
+        buffer = BytesIO()
+        image.save(buffer, format=image_format)
+        shrunk_name = default_storage.save(name, ContentFile(buffer.getvalue()))
+
+    avatars = {}
+    for field, size in AVATAR_SIZES.items():
+        avatar = ImageOps.fit(image, (size, size), Image.LANCZOS)
+        if avatar.mode not in ('RGB', 'L'):
+            avatar = avatar.convert('RGB')
+        buffer = BytesIO()
+        avatar.save(buffer, format='JPEG', quality=85, optimize=True)
+        avatars[field] = default_storage.save(f'profile_pictures/avatars/{size}.jpg', ContentFile(buffer.getvalue()))
+
+    updated = UserProfile.objects.filter(id=profile_id, profile_picture=name).update(
+        profile_picture=shrunk_name, **avatars
+    )
+    # Another upload may have replaced the picture meanwhile; its own task renders those avatars
+    if not updated:
+        replaced = [*replaced, shrunk_name, *avatars.values()]
+    elif shrunk_name != name:
+        replaced = [*replaced, name]
+    delete_unreferenced(replaced)
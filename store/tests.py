@@ -0,0 +1,1133 @@
+import json
+import logging
+import os
+import queue
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import MemoryFileUploadHandler
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from store import (
+    analytics, autocomplete, credits, feed, maintenance, metrics, moderation, rating_buffer, ratelimit,
+    recommendations, requestlog, taskqueue, tasks,
+)
+from store.admin import EstimatedCountPaginator
+from store.mediastorage import is_content_addressed
+from store.ratelimit import rejection_counts
+from store.models import (
+    Cart, MovieCredit, Person, Task, DailyMovieSales, DailySales, Movie, Order, OrderItem, Rating, RelatedMovie,
+    Review, UserProfile,
+)
+from store.rating_buffer import RatingBuffer, submit_buffered_rating
+
+
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'},
+    'feeds': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-feeds'},
+    'templates': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+
+# Pages render without a collectstatic manifest
+PLAIN_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+def make_movie(title='Movie', **fields):
+    fields.setdefault('price', '9.99')
+    fields.setdefault('description', 'A movie')
+    return Movie.objects.create(title=title, **fields)
+
+
+def make_users(count, prefix='user'):
+    return [User.objects.create_user(f'{prefix}{i}', password='pw') for i in range(count)]
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RatingBufferTests(TestCase):
+    """Write-behind quick ratings (store/rating_buffer.py)"""
+
+    def setUp(self):
+        # Flushes are driven by the tests, not by the background thread
+        patcher = mock.patch.object(RatingBuffer, '_ensure_flusher')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.buffer = RatingBuffer()
+        self.movie = make_movie()
+        self.other_movie = make_movie('Other')
+        self.alice, self.bob = make_users(2)
+
+    def test_repeated_clicks_coalesce(self):
+        self.assertIsNone(self.buffer.add(self.movie.id, self.alice.id, 2))
+        self.assertEqual(self.buffer.add(self.movie.id, self.alice.id, 4), 2)
+        self.assertEqual(self.buffer.add(self.movie.id, self.alice.id, 5), 4)
+        self.buffer.add(self.movie.id, self.bob.id, 3)
+
+        self.assertEqual(len(self.buffer), 2)
+        self.assertEqual(self.buffer.pending[(self.movie.id, self.alice.id)], 5)
+
+    def test_flush_writes_final_values_in_one_statement(self):
+        Rating.objects.create(movie=self.movie, user=self.bob, rating=1)
+        self.buffer.add(self.movie.id, self.alice.id, 2)
+        self.buffer.add(self.movie.id, self.alice.id, 4)
+        self.buffer.add(self.movie.id, self.bob.id, 5)
+        self.buffer.add(self.other_movie.id, self.alice.id, 3)
+
+        with self.assertNumQueries(1):
+            written = self.buffer.flush()
+
+        self.assertEqual(written, 3)
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(
+            set(Rating.objects.values_list('movie_id', 'user_id', 'rating')),
+            {
+                (self.movie.id, self.alice.id, 4),
+                (self.movie.id, self.bob.id, 5),
+                (self.other_movie.id, self.alice.id, 3),
+            },
+        )
+
+    def test_flush_of_empty_buffer_does_nothing(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self.buffer.flush(), 0)
+
+    def test_failed_flush_requeues_batch_and_newer_clicks_win(self):
+        self.buffer.add(self.movie.id, self.alice.id, 2)
+        self.buffer.add(self.movie.id, self.bob.id, 3)
+
+        def fail(pending):
+            # Alice clicks again while the failing write is in flight
+            self.buffer.add(self.movie.id, self.alice.id, 5)
+            raise RuntimeError('database is locked')
+
+        with mock.patch.object(rating_buffer, 'write_ratings', side_effect=fail):
+            with self.assertRaises(RuntimeError):
+                self.buffer.flush()
+
+        self.assertEqual(self.buffer.pending, {(self.movie.id, self.alice.id): 5, (self.movie.id, self.bob.id): 3})
+        self.assertFalse(Rating.objects.exists())
+
+        self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(
+            dict(Rating.objects.values_list('user_id', 'rating')),
+            {self.alice.id: 5, self.bob.id: 3},
+        )
+
+    def test_shutdown_flushes_pending_ratings(self):
+        with mock.patch.object(rating_buffer, 'buffer', self.buffer):
+            self.buffer.add(self.movie.id, self.alice.id, 4)
+            rating_buffer._flush_on_exit()
+        self.assertEqual(Rating.objects.get(movie=self.movie, user=self.alice).rating, 4)
+
+    def test_optimistic_average(self):
+        carol, dave = make_users(2, prefix='rater')
+        Review.objects.create(movie=self.movie, user=carol, rating=4, content='Good')
+        Review.objects.create(movie=self.movie, user=dave, rating=1, content='Hidden', is_reported=True)
+        Rating.objects.create(movie=self.movie, user=self.bob, rating=2)
+
+        with mock.patch.object(rating_buffer, 'buffer', self.buffer):
+            # New rating: counted once
+            created, average, count = submit_buffered_rating(self.movie.id, self.alice.id, 5)
+            self.assertEqual((created, count), (True, 3))
+            self.assertAlmostEqual(average, (4 + 2 + 5) / 3)
+
+            # Clicking again replaces the pending value instead of adding to it
+            created, average, count = submit_buffered_rating(self.movie.id, self.alice.id, 1)
+            self.assertEqual((created, count), (False, 3))
+            self.assertAlmostEqual(average, (4 + 2 + 1) / 3)
+
+            # A rating already in the database is replaced as well
+            created, average, count = submit_buffered_rating(self.movie.id, self.bob.id, 5)
+            self.assertEqual((created, count), (False, 3))
+            self.assertAlmostEqual(average, (4 + 5 + 1) / 3)
+
+            self.buffer.flush()
+
+        # After the flush the cached sums are dropped and recomputed from the database
+        stats = rating_buffer.rating_stats(self.movie.id)
+        self.assertEqual(rating_buffer.combined_average(stats), ((4 + 5 + 1) / 3, 3))
+
+    @override_settings(RATING_WRITE_BEHIND=True, RATE_LIMITS={})
+    def test_submit_rating_view_buffers(self):
+        self.client.force_login(self.alice)
+        with mock.patch.object(rating_buffer, 'buffer', self.buffer):
+            response = self.client.post(
+                reverse('submit_rating', args=[self.movie.id]), {'rating': 4}, HTTP_HOST='localhost'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['buffered'], True)
+        self.assertEqual(response.json()['avg_rating'], 4.0)
+        self.assertEqual(self.buffer.pending, {(self.movie.id, self.alice.id): 4})
+        self.assertFalse(Rating.objects.exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHES, STORAGES=PLAIN_STORAGES)
+class MovieDetailValidatorTests(TestCase):
+    """Conditional GET on the detail page (store/conditional.py)"""
+
+    def setUp(self):
+        self.movie = make_movie()
+        self.related = make_movie('Related', price='5.00')
+        RelatedMovie.objects.create(movie=self.movie, related=self.related, score=1.0, rank=1)
+        self.url = reverse('movie_detail', args=[self.movie.id])
+
+    def get(self, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(self.url, HTTP_HOST='localhost', **headers)
+
+    def test_unchanged_page_is_not_modified(self):
+        etag = self.get()['ETag']
+        self.assertEqual(self.get(etag).status_code, 304)
+
+    def test_related_movie_change_invalidates_page(self):
+        etag = self.get()['ETag']
+        self.related.price = '7.50'
+        self.related.save()
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '7.50')
+
+    def test_deleted_related_movie_invalidates_page(self):
+        etag = self.get()['ETag']
+        self.related.delete()
+        self.assertEqual(self.get(etag).status_code, 200)
+
+    @override_settings(CACHES={
+        **LOCMEM_CACHES,
+        'templates': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-templates'},
+    })
+    def test_review_fragment_follows_reviewer_name(self):
+        user = make_users(1, prefix='critic')[0]
+        Review.objects.create(movie=self.movie, user=user, rating=4, content='Solid')
+        self.assertContains(self.get(), 'critic0')
+        user.first_name, user.last_name = 'Pauline', 'Kael'
+        user.save()
+        self.assertContains(self.get(), 'Pauline Kael')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RelatedMovieTests(TestCase):
+    """Item-to-item cosine similarity (store/recommendations.py)"""
+
+    def like(self, users, movie):
+        Rating.objects.bulk_create([Rating(user=user, movie=movie, rating=5) for user in users])
+
+    def test_neighbours_ranked_by_cosine_similarity(self):
+        users = make_users(5)
+        heat, insider, blockbuster, niche = (make_movie(title) for title in ('Heat', 'Insider', 'Blockbuster', 'Niche'))
+        self.like(users[:2], heat)
+        self.like(users[:2], insider)
+        self.like(users, blockbuster)
+        self.like(users[1:2], niche)
+        Rating.objects.create(user=users[4], movie=niche, rating=2)  # not a like
+
+        related = recommendations.build_related_movies()
+
+        # Co-likes / sqrt(likes of each): 2/sqrt(2*2), 2/sqrt(2*5), 1/sqrt(2*1)
+        self.assertEqual([movie_id for movie_id, _ in related[heat.id]], [insider.id, niche.id, blockbuster.id])
+        scores = dict(related[heat.id])
+        self.assertAlmostEqual(scores[insider.id], 1.0, places=5)
+        self.assertAlmostEqual(scores[niche.id], 1 / 2 ** 0.5, places=5)
+        self.assertAlmostEqual(scores[blockbuster.id], 2 / 10 ** 0.5, places=5)
+        # Similarity is symmetric
+        self.assertAlmostEqual(dict(related[blockbuster.id])[heat.id], scores[blockbuster.id], places=5)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class GenerateDatasetTests(TestCase):
+    """Synthetic data is reproducible from its seed (generate_dataset)"""
+
+    def generate(self, seed):
+        call_command(
+            'generate_dataset', movies=20, users=15, ratings=60, reviews=20, orders=25, days=30,
+            seed=seed, clear=True, stdout=StringIO(),
+        )
+        # Ids change between runs, so compare by title and username
+        return {
+            'movies': sorted(Movie.objects.values_list('title', 'price', 'genre', 'cast')),
+            'ratings': sorted(Rating.objects.values_list('user__username', 'movie__title', 'rating', 'created_at')),
+            'reviews': sorted(Review.objects.values_list('user__username', 'movie__title', 'rating', 'content')),
+            'orders': sorted(OrderItem.objects.values_list(
+                'order__user__username', 'order__region', 'order__status', 'order__created_at', 'movie__title',
+            )),
+        }
+
+    def test_same_seed_same_data(self):
+        first = self.generate(7)
+        self.assertEqual(
+            {name: len(rows) for name, rows in first.items()},
+            {'movies': 20, 'ratings': 60, 'reviews': 20, 'orders': len(first['orders'])},
+        )
+        self.assertGreaterEqual(len(first['orders']), 25)
+        self.assertEqual(self.generate(7), first)
+        self.assertNotEqual(self.generate(8), first)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, RATE_LIMITS={})
+class BulkRateAuthTests(TestCase):
+    """Bearer tokens and session auth on the bulk rating API (store/api.py)"""
+
+    def setUp(self):
+        self.movie = make_movie()
+        self.user = User.objects.create_user('mobile', password='secret')
+        self.client = Client(enforce_csrf_checks=True, HTTP_HOST='localhost')
+        self.body = json.dumps({'ratings': [{'movie_id': self.movie.id, 'rating': 4}]})
+
+    def token(self, password='secret'):
+        return self.client.post(
+            reverse('api_token'), json.dumps({'username': 'mobile', 'password': password}),
+            content_type='application/json',
+        )
+
+    def rate(self, token=None):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if token else {}
+        return self.client.post(reverse('api_bulk_rate'), self.body, content_type='application/json', **headers)
+
+    def test_token_client_needs_no_csrf_token(self):
+        response = self.token()
+        self.assertEqual(response.status_code, 200)
+        response = self.rate(response.json()['token'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Rating.objects.get(movie=self.movie, user=self.user).rating, 4)
+
+    def test_wrong_password_gets_no_token(self):
+        self.assertEqual(self.token('wrong').status_code, 401)
+
+    def test_invalid_token_is_rejected(self):
+        self.assertEqual(self.rate('not-a-token').status_code, 401)
+        self.assertFalse(Rating.objects.exists())
+
+    def test_password_change_revokes_tokens(self):
+        token = self.token().json()['token']
+        self.user.set_password('changed')
+        self.user.save()
+        self.assertEqual(self.rate(token).status_code, 401)
+
+    def test_session_still_requires_csrf_token(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.rate().status_code, 403)
+        self.assertFalse(Rating.objects.exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHES, METRICS_DIR=None, RATE_LIMITS={'submit_rating': (1, 60)})
+class RateLimitTests(TestCase):
+    """Token buckets and rejection counting (store/ratelimit.py)"""
+
+    def test_rejection_is_counted_in_metrics(self):
+        movie = make_movie()
+        self.client.force_login(make_users(1)[0])
+        url = reverse('submit_rating', args=[movie.id])
+        before = rejection_counts()['submit_rating']
+
+        self.assertEqual(self.client.post(url, {'rating': 4}, HTTP_HOST='localhost').status_code, 200)
+        response = self.client.post(url, {'rating': 5}, HTTP_HOST='localhost')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(rejection_counts()['submit_rating'], before + 1)
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES, STORAGES=PLAIN_STORAGES, RATE_LIMITS={'login': (2, 60)},
+    PASSWORD_HASHERS=settings.PASSWORD_HASHER_PROFILES['scrypt'],
+)
+class LoginThrottleTests(TestCase):
+    """Hasher profiles, the login slot semaphore and the login rate limit (store/ratelimit.py)"""
+
+    def setUp(self):
+        cache.clear()  # token buckets
+        self.client = Client(HTTP_HOST='localhost')
+
+    def login(self, password='pw'):
+        return self.client.post(reverse('login'), {'username': 'ann', 'password': password})
+
+    def test_old_hash_is_upgraded_on_login(self):
+        user = User.objects.create(username='ann', password=make_password('pw', hasher='pbkdf2_sha256'))
+        self.assertRedirects(self.login(), reverse('home'), fetch_redirect_response=False)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('scrypt$'))
+
+    @override_settings(LOGIN_QUEUE_TIMEOUT=0.01)
+    def test_login_without_a_free_slot_is_turned_away(self):
+        with mock.patch.object(ratelimit, '_login_slots', threading.Semaphore(0)):
+            response = self.login()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '5')
+
+    def test_only_login_attempts_are_rate_limited(self):
+        for _ in range(3):
+            self.assertEqual(self.client.get(reverse('login')).status_code, 200)
+        self.assertEqual([self.login('wrong').status_code for _ in range(3)], [200, 200, 429])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SalesFactsRebuildTests(TestCase):
+    """Full rebuild of the daily sales facts (store/analytics.py)"""
+
+    def setUp(self):
+        movie = make_movie()
+        user = make_users(1)[0]
+        for region in ('west', 'west', 'midwest'):
+            order = Order.objects.create(user=user, region=region)
+            OrderItem.objects.create(order=order, movie=movie, quantity=2, price='5.00')
+        self.today = timezone.localdate()
+
+    def test_rebuild_replaces_facts_and_drops_stale_days(self):
+        stale = self.today - timedelta(days=400)
+        DailySales.objects.create(date=stale, region='west', orders=1, units=1, revenue=1)
+        DailySales.objects.create(date=self.today, region='west', orders=9, units=9, revenue=9)
+
+        self.assertEqual(analytics.rebuild_all_sales_facts(), 1)
+        self.assertEqual(
+            set(DailySales.objects.values_list('date', 'region', 'orders', 'units')),
+            {(self.today, 'west', 2, 4), (self.today, 'midwest', 1, 2)},
+        )
+
+    def test_failed_month_keeps_existing_facts(self):
+        analytics.rebuild_all_sales_facts()
+        before = set(DailySales.objects.values_list('date', 'region', 'orders', 'units', 'revenue'))
+
+        with mock.patch.object(analytics.DailyMovieSales.objects, 'bulk_create', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                analytics.rebuild_all_sales_facts()
+
+        self.assertEqual(set(DailySales.objects.values_list('date', 'region', 'orders', 'units', 'revenue')), before)
+
+    def test_genre_change_regroups_past_sales(self):
+        analytics.rebuild_all_sales_facts()
+        movie = Movie.objects.get()
+        movie.genre = 'comedy' if movie.genre != 'comedy' else 'drama'
+        movie.save()
+
+        self.assertEqual(set(DailyMovieSales.objects.values_list('genre', flat=True)), {movie.genre})
+        report = analytics.sales_report(period='day', metric='units', by='genre')
+        self.assertEqual([row['label'] for row in report['series']], [movie.get_genre_display()])
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES, STORAGES=PLAIN_STORAGES,
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+)
+class AdminChangelistQueryTests(TestCase):
+    """Changelist queries do not grow with the rows on the page (store/admin.py)"""
+
+    # The page's own queries plus session, user and the paginator's count
+    MAX_QUERIES = 10
+
+    def setUp(self):
+        self.movies = [make_movie(f'Movie {i}', price=f'{i + 1}.00') for i in range(3)]
+        self.client.force_login(User.objects.create_superuser('admin', password='pw'))
+        self.created = 0
+
+    def add_rows(self, count):
+        for user in make_users(count, prefix=f'buyer{self.created}-'):
+            cart = Cart.objects.create(user=user)
+            cart.movies.add(*self.movies)
+            order = Order.objects.create(user=user)
+            for movie in self.movies:
+                OrderItem.objects.create(order=order, movie=movie, price=movie.price, quantity=2)
+        self.created += count
+
+    def changelist_queries(self, model):
+        url = reverse(f'admin:store_{model}_changelist')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_HOST='localhost')
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assert_constant_queries(self, model):
+        self.add_rows(3)
+        few = self.changelist_queries(model)
+        self.add_rows(30)
+        many = self.changelist_queries(model)
+        self.assertEqual(many, few, f'{model} changelist runs a query per row')
+        self.assertLessEqual(many, self.MAX_QUERIES)
+
+    def test_order_changelist(self):
+        self.assert_constant_queries('order')
+
+    def test_orderitem_changelist(self):
+        self.assert_constant_queries('orderitem')
+
+    def test_cart_changelist(self):
+        self.assert_constant_queries('cart')
+
+    def test_userprofile_changelist(self):
+        self.assert_constant_queries('userprofile')
+
+    def test_cart_totals(self):
+        self.add_rows(2)
+        Cart.objects.create(user=make_users(1, prefix='empty')[0])
+        response = self.client.get(reverse('admin:store_cart_changelist'), HTTP_HOST='localhost')
+        self.assertContains(response, '$6.00', count=2)
+        self.assertContains(response, '$0.00', count=1)
+
+    def test_paginator_uses_exact_count_without_statistics(self):
+        self.add_rows(5)
+        Order.objects.filter(pk__in=Order.objects.order_by('pk').values('pk')[1:4]).delete()
+        paginator = EstimatedCountPaginator(Order.objects.order_by('pk'), 10)
+        paginator.exact_count_limit = 1
+        # A primary key range would say 5 here
+        self.assertEqual(paginator.count, 2)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, STORAGES=PLAIN_STORAGES)
+class MovieBulkActionTests(TestCase):
+    """Bulk edit actions read their inputs through MovieBulkActionForm (store/admin.py)"""
+
+    def setUp(self):
+        self.movie = make_movie(price='10.00', genre='comedy', language='English')
+        self.client.force_login(User.objects.create_superuser('admin', password='pw'))
+
+    def run_action(self, action, **inputs):
+        data = {'action': action, '_selected_action': [self.movie.id], 'index': 0, **inputs}
+        response = self.client.post(reverse('admin:store_movie_changelist'), data, HTTP_HOST='localhost', follow=True)
+        self.movie.refresh_from_db()
+        return [str(message) for message in response.context['messages']]
+
+    def test_valid_inputs_are_applied(self):
+        self.assertEqual(self.run_action('change_prices', percent='10'), ['1 movie(s) repriced by 10%.'])
+        self.assertEqual(str(self.movie.price), '11.00')
+        self.run_action('reassign_genre', genre='drama')
+        self.assertEqual(self.movie.genre, 'drama')
+        self.run_action('fix_language', language='  French ')
+        self.assertEqual(self.movie.language, 'French')
+
+    def test_invalid_inputs_are_rejected_by_the_form(self):
+        messages = self.run_action('change_prices', percent='abc')
+        self.assertEqual(messages, ['Price change %: Enter a number.'])
+        messages = self.run_action('change_prices', percent='-150')
+        self.assertIn('greater than or equal to -99.99', messages[0])
+        messages = self.run_action('reassign_genre', genre='polka')
+        self.assertIn('Select a valid choice', messages[0])
+        self.assertEqual(self.run_action('fix_language', language='x' * 60)[0][:10], 'Language: ')
+        self.assertEqual((str(self.movie.price), self.movie.genre, self.movie.language), ('10.00', 'comedy', 'English'))
+
+    def test_missing_input_is_asked_for(self):
+        self.assertEqual(self.run_action('fix_language', language='   '), ['Enter the language to set.'])
+        self.assertEqual(self.movie.language, 'English')
+
+
+class MetricsSnapshotTests(TestCase):
+    """Per-process snapshots and their retirement (store/metrics.py)"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings_override = override_settings(METRICS_DIR=self.directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.label = f'test-{self.id()}'
+        # A pid that is certainly no longer running
+        self.dead_pid = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'],
+                                       capture_output=True, text=True).stdout.strip()
+
+    def write_snapshot(self, filename, orders):
+        with open(os.path.join(self.directory, filename), 'w') as target:
+            json.dump({metrics.ORDERS_PLACED.name: [[[self.label], orders]]}, target)
+
+    def total(self):
+        return metrics.collect().get(metrics.ORDERS_PLACED.name, {}).get((self.label,), 0)
+
+    def test_dead_snapshots_are_retired_and_still_counted(self):
+        self.write_snapshot(f'{self.dead_pid}-1.json', 3)
+        self.write_snapshot(f'{self.dead_pid}.json', 2)  # named before start times were added
+        metrics.ORDERS_PLACED.labels(region=self.label).inc(1)
+
+        self.assertEqual(self.total(), 6)
+        self.assertEqual(sorted(os.listdir(self.directory)), ['.lock', metrics.RETIRED])
+        self.assertEqual(self.total(), 6)
+
+        self.write_snapshot(f'{self.dead_pid}-2.json', 4)
+        self.assertEqual(self.total(), 10)
+
+    def test_older_snapshot_of_a_reused_pid_is_retired(self):
+        metrics.flush()
+        self.write_snapshot(f'{os.getpid()}-1.json', 5)
+        before = self.total()
+        self.assertNotIn(f'{os.getpid()}-1.json', os.listdir(self.directory))
+        self.assertIn(metrics._snapshot_name(), os.listdir(self.directory))
+        self.assertEqual(self.total(), before)
+
+    def test_interrupted_retirement_does_not_count_twice(self):
+        self.write_snapshot(f'{self.dead_pid}-1.json', 3)
+        self.total()
+        # As if the process died after writing the retired file but before deleting the snapshot
+        self.write_snapshot(f'{self.dead_pid}-1.json', 3)
+        self.assertEqual(self.total(), 3)
+        self.assertNotIn(f'{self.dead_pid}-1.json', os.listdir(self.directory))
+
+    @override_settings(CACHES=LOCMEM_CACHES, STORAGES=PLAIN_STORAGES, METRICS_FLUSH_INTERVAL=0.01)
+    def test_middleware_labels_and_background_flush(self):
+        client = Client(HTTP_HOST='localhost')
+        client.generic('BREW', reverse('home'))
+        client.get(reverse('home'))
+
+        counted = metrics.collect()[metrics.HTTP_REQUESTS.name]
+        self.assertTrue(any(key[:2] == ('home', 'other') for key in counted))
+        self.assertFalse(any(key[1] == 'BREW' for key in counted))
+
+        snapshot = os.path.join(self.directory, metrics._snapshot_name())
+        for _ in range(200):
+            if os.path.exists(snapshot):
+                break
+            time.sleep(0.01)
+        self.assertTrue(os.path.exists(snapshot))
+
+
+@override_settings(CACHES=LOCMEM_CACHES, STORAGES=PLAIN_STORAGES)
+class ModerationQueueTests(TestCase):
+    """Reporting, approving and removing reviews (store/moderation.py)"""
+
+    def setUp(self):
+        self.author, self.reader = make_users(2)
+        self.staff = User.objects.create_user('moderator', password='pw', is_staff=True)
+        self.movie = make_movie()
+        self.review = Review.objects.create(movie=self.movie, user=self.author, rating=2, content='Dull')
+        self.client = Client(HTTP_HOST='localhost')
+
+    def report(self):
+        self.client.force_login(self.reader)
+        return self.client.post(reverse('report_review', args=[self.review.id])).json()
+
+    def moderate(self, action):
+        self.client.force_login(self.staff)
+        return self.client.post(reverse('moderation_queue'), {'action': action, 'review_ids': [self.review.id]})
+
+    def queue(self):
+        return list(moderation.reported_reviews())
+
+    def test_reported_review_is_hidden_until_approved(self):
+        self.assertTrue(self.report()['success'])
+        self.assertEqual(self.queue(), [self.review])
+        self.assertNotContains(self.client.get(reverse('movie_detail', args=[self.movie.id])), 'Dull')
+
+        self.moderate('approve')
+        self.assertEqual(self.queue(), [])
+        self.assertContains(self.client.get(reverse('movie_detail', args=[self.movie.id])), 'Dull')
+
+    def test_approved_review_cannot_be_reported_again_until_edited(self):
+        self.report()
+        self.moderate('approve')
+        self.assertFalse(self.report()['success'])
+        self.assertEqual(self.queue(), [])
+
+        self.review.refresh_from_db()
+        self.review.content = 'Dull, and worse'
+        self.review.save()
+        self.assertTrue(self.report()['success'])
+        self.assertEqual(self.queue(), [self.review])
+
+    def test_removed_review_is_deleted(self):
+        self.report()
+        self.moderate('remove')
+        self.assertFalse(Review.objects.exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PruneStaleDataTests(TestCase):
+    """Chunked garbage collection (store/maintenance.py)"""
+
+    def test_expired_sessions_are_deleted_in_chunks(self):
+        now = timezone.now()
+        for i in range(5):
+            Session.objects.create(session_key=f'expired{i}', session_data='', expire_date=now - timedelta(days=1))
+        Session.objects.create(session_key='live', session_data='', expire_date=now + timedelta(days=1))
+
+        self.assertEqual(maintenance.prune_sessions(chunk_size=2, dry_run=True), 5)
+        self.assertEqual(Session.objects.count(), 6)
+
+        progress = []
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(maintenance.prune_sessions(chunk_size=2, progress=lambda *p: progress.append(p)), 5)
+        self.assertEqual(progress, [(2, 5), (4, 5), (5, 5)])
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('DELETE')]), 3)
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['live'])
+
+    def test_only_idle_carts_are_emptied(self):
+        movie = make_movie()
+        idle, active, recent = make_users(3)
+        for user in (idle, active, recent):
+            Cart.objects.get_or_create(user=user)[0].movies.add(movie)
+        long_ago = timezone.now() - timedelta(days=60)
+        Cart.objects.exclude(user=recent).update(updated_at=long_ago)
+        User.objects.filter(id=idle.id).update(last_login=long_ago)
+        User.objects.filter(id=active.id).update(last_login=timezone.now())
+
+        self.assertEqual(maintenance.empty_idle_carts(30, chunk_size=1), 1)
+        self.assertEqual(
+            {user.username: user.cart.movies.count() for user in User.objects.select_related('cart')},
+            {idle.username: 0, active.username: 1, recent.username: 1},
+        )
+
+    def test_old_finished_tasks_are_deleted_failed_ones_kept(self):
+        long_ago = timezone.now() - timedelta(days=30)
+        for status, finished_at in [('done', long_ago), ('done', long_ago), ('failed', long_ago), ('done', timezone.now())]:
+            Task.objects.create(name='tests.record', status=status, run_at=long_ago, finished_at=finished_at)
+
+        self.assertEqual(maintenance.prune_tasks(7, chunk_size=1), 2)
+        self.assertEqual(sorted(Task.objects.values_list('status', flat=True)), ['done', 'failed'])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ContentAddressedMediaTests(TestCase):
+    """Deduplicated uploads (store/mediastorage.py) and the unreferenced-media sweep (store/maintenance.py)"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(STORAGES={
+            **PLAIN_STORAGES,
+            'default': {'BACKEND': 'store.mediastorage.ContentAddressedStorage', 'OPTIONS': {'location': directory.name}},
+        })
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def save(self, name, content):
+        return default_storage.save(name, ContentFile(content))
+
+    def age(self, name):
+        old = time.time() - maintenance.MEDIA_GRACE_PERIOD.total_seconds() * 2
+        os.utime(default_storage.path(name), (old, old))
+
+    def test_identical_content_is_stored_once(self):
+        first = self.save('movie_images/poster.PNG', b'poster')
+        self.assertTrue(is_content_addressed(first))
+        self.assertTrue(first.endswith('.png'))
+        self.assertEqual(self.save('movie_images/copy.png', b'poster'), first)
+        self.assertNotEqual(self.save('movie_images/other.png', b'other'), first)
+        self.assertEqual(len(list(maintenance._media_files('movie_images'))), 2)
+
+    def test_sweep_keeps_referenced_and_fresh_files(self):
+        referenced = self.save('movie_images/used.png', b'used')
+        make_movie(image=referenced)
+        orphan = self.save('movie_images/orphan.png', b'orphan')
+        fresh = self.save('movie_images/fresh.png', b'fresh')
+        for name in (referenced, orphan, fresh):
+            self.age(name)
+        # Uploaded again since: it may be about to be referenced
+        self.assertEqual(self.save('movie_images/again.png', b'fresh'), fresh)
+
+        self.assertEqual(maintenance.remove_orphaned_media(), 1)
+        self.assertEqual(
+            [default_storage.exists(name) for name in (referenced, orphan, fresh)], [True, False, True],
+        )
+
+    def test_reused_file_is_not_deleted_as_replaced(self):
+        name = self.save('profile_pictures/old.png', b'picture')
+        self.age(name)
+        self.save('profile_pictures/new.png', b'picture')  # another user uploads the same picture
+        self.assertEqual(maintenance.delete_unreferenced([name]), 0)
+        self.assertTrue(default_storage.exists(name))
+
+        self.age(name)
+        self.assertEqual(maintenance.delete_unreferenced([name]), 1)
+        self.assertFalse(default_storage.exists(name))
+
+
+@override_settings(CACHES=LOCMEM_CACHES, STORAGES=PLAIN_STORAGES)
+class RequestLogTests(TestCase):
+    """JSON access lines with correlation ids, written through the queued handler (store/requestlog.py)"""
+
+    def setUp(self):
+        self.stream = StringIO()
+        self.handler = requestlog.QueuedStreamHandler(self.stream)
+        self.handler.setFormatter(requestlog.JsonFormatter())
+        self.handler.addFilter(requestlog.CorrelationIdFilter())
+        logger = requestlog.access_logger
+        logger.addHandler(self.handler)
+        self.addCleanup(logger.removeHandler, self.handler)
+        # The test settings keep `store` at WARNING; only this handler sees the lines
+        logger.setLevel(logging.INFO)
+        self.addCleanup(logger.setLevel, logging.NOTSET)
+        logger.propagate = False
+        self.addCleanup(setattr, logger, 'propagate', True)
+
+    def logged(self):
+        for _ in range(200):
+            if self.stream.getvalue():
+                break
+            time.sleep(0.01)
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+
+    def test_access_line_fields(self):
+        user = make_users(1)[0]
+        self.client.force_login(user)
+        response = self.client.get(reverse('cart'), HTTP_HOST='localhost', HTTP_X_REQUEST_ID='trace-42')
+
+        self.assertEqual(response['X-Request-ID'], 'trace-42')
+        [entry] = self.logged()
+        self.assertEqual(
+            {key: entry[key] for key in ('level', 'logger', 'method', 'path', 'status', 'view', 'user_id', 'correlation_id')},
+            {
+                'level': 'INFO', 'logger': 'store.requests', 'method': 'GET', 'path': reverse('cart'),
+                'status': 200, 'view': 'cart', 'user_id': user.id, 'correlation_id': 'trace-42',
+            },
+        )
+        self.assertIsInstance(entry['duration_ms'], float)
+
+    def test_unusable_request_id_is_replaced(self):
+        response = self.client.get(reverse('home'), HTTP_HOST='localhost', HTTP_X_REQUEST_ID='bad id\n')
+        self.assertRegex(response['X-Request-ID'], r'^[0-9a-f]{32}$')
+        self.assertEqual(self.logged()[0]['correlation_id'], response['X-Request-ID'])
+
+    def test_full_queue_drops_records(self):
+        self.handler.queue = queue.Queue(maxsize=1)  # not drained by the listener
+        for _ in range(3):
+            requestlog.access_logger.info('line')
+        self.assertEqual(self.handler.dropped, 2)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, RATE_LIMITS={})
+class ApiTests(TestCase):
+    """Parameter validation and search on the JSON API (store/api.py)"""
+
+    def setUp(self):
+        self.nolan = make_movie('Inception', director='Christopher Nolan', cast='Leonardo DiCaprio, Elliot Page')
+        self.other = make_movie('Amelie', director='Jean-Pierre Jeunet', description='Features Nolan in the text')
+
+    def get(self, name, **params):
+        return self.client.get(reverse(name), params, HTTP_HOST='localhost')
+
+    def test_batch_rejects_ids_that_are_not_ids(self):
+        response = self.get('api_movie_batch', ids=f'{self.nolan.id},abc,-3,99999999999999999999')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['invalid'], ['abc', '-3', '99999999999999999999'])
+
+    def test_batch_keeps_order_and_reports_missing(self):
+        response = self.get('api_movie_batch', ids=f'{self.other.id},{self.nolan.id},{2 ** 63 - 1}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.json()['results']], [self.other.id, self.nolan.id])
+        self.assertEqual(response.json()['missing'], [2 ** 63 - 1])
+
+    def test_page_beyond_limit_is_rejected(self):
+        self.assertEqual(self.get('api_movie_list', page='99999999999999999999').status_code, 400)
+        self.assertEqual(self.get('api_movie_list', page='3').json()['results'], [])
+
+    def test_search_matches_people_through_credits(self):
+        titles = [row['title'] for row in self.get('api_movie_list', q='nolan').json()['results']]
+        self.assertEqual(titles, ['Inception'])
+        titles = [row['title'] for row in self.get('api_movie_list', q='elliot').json()['results']]
+        self.assertEqual(titles, ['Inception'])
+
+    def test_bulk_rate_supersedes_pending_buffered_click(self):
+        user = make_users(1)[0]
+        self.client.force_login(user)
+        buffer = RatingBuffer()
+        with mock.patch.object(RatingBuffer, '_ensure_flusher'), mock.patch('store.api.rating_buffer', buffer):
+            buffer.add(self.nolan.id, user.id, 2)
+            response = self.client.post(
+                reverse('api_bulk_rate'), json.dumps({'ratings': [{'movie_id': self.nolan.id, 'rating': 5}]}),
+                content_type='application/json', HTTP_HOST='localhost',
+            )
+            self.assertEqual(response.status_code, 200)
+            buffer.flush()
+        self.assertEqual(Rating.objects.get(movie=self.nolan, user=user).rating, 5)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class HomeFeedTests(TestCase):
+    """Cached home feeds (store/feed.py)"""
+
+    def setUp(self):
+        self.popular = make_movie('Popular', price='4.00')
+        self.runner_up = make_movie('Runner-up')
+        buyer, self.user = make_users(2)
+        order = Order.objects.create(user=buyer)
+        for movie, quantity in ((self.popular, 2), (self.runner_up, 1)):
+            for _ in range(quantity):
+                OrderItem.objects.create(order=order, movie=movie, price=movie.price)
+
+    def test_cached_feed_shows_current_rows(self):
+        self.assertEqual(feed.get_home_feed(self.user), [self.popular, self.runner_up])
+        self.popular.price = '7.00'
+        self.popular.save()
+        self.runner_up.delete()
+
+        with self.assertNumQueries(1):
+            movies = feed.get_home_feed(self.user)
+        self.assertEqual(movies, [self.popular])
+        self.assertEqual(str(movies[0].price), '7.00')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AutocompleteTests(TestCase):
+    """Search-as-you-type index (store/autocomplete.py)"""
+
+    def setUp(self):
+        self.movie = make_movie('The Dark Knight', director='Christopher  Nolan', cast='Christian Bale')
+
+    def suggest(self, query):
+        return self.client.get(reverse('api_autocomplete'), {'q': query}, HTTP_HOST='localhost').json()['results']
+
+    def test_people_come_from_credits(self):
+        nolan = Person.objects.get(name='Christopher Nolan')
+        results = self.suggest('nol')
+        self.assertEqual([(r['type'], r['label'], r['url']) for r in results], [
+            ('director', 'Christopher Nolan', reverse('person_detail', args=[nolan.id])),
+        ])
+        self.assertEqual({r['type'] for r in self.suggest('chris')}, {'director', 'cast'})
+        self.assertEqual(self.suggest('knight')[0]['url'], reverse('movie_detail', args=[self.movie.id]))
+
+    def test_version_check_does_not_query_the_database(self):
+        autocomplete.get_index()
+        autocomplete.index.checked_at = 0.0
+        with self.assertNumQueries(0):
+            autocomplete.get_index()
+
+    def test_changes_rebuild_the_index(self):
+        self.assertEqual(self.suggest('batman'), [])
+        self.movie.title = 'Batman Begins'
+        self.movie.save()
+        self.assertEqual([r['label'] for r in self.suggest('batman')], ['Batman Begins'])
+
+        self.movie.delete()
+        self.assertEqual(self.suggest('batman'), [])
+
+    def test_evicted_version_rebuilds_once(self):
+        autocomplete.get_index()
+        Movie.objects.filter(id=self.movie.id).update(title='Memento')  # no signals
+        cache.delete(autocomplete.VERSION_CACHE_KEY)
+        autocomplete.index.checked_at = 0.0
+        self.assertEqual([r['label'] for r in self.suggest('meme')], ['Memento'])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CreditSyncTests(TestCase):
+    """Person/MovieCredit rows kept in step with the director and cast text (store/credits.py)"""
+
+    def setUp(self):
+        self.movie = make_movie('Heat', director='Michael Mann', cast='Al Pacino, Robert De Niro, Val Kilmer')
+
+    def credits(self):
+        return list(self.movie.credits.order_by('role', 'order').values_list('person__name', 'role', 'order'))
+
+    def test_only_changed_credits_are_written(self):
+        unchanged = MovieCredit.objects.get(movie=self.movie, person__name='Michael Mann').id
+        self.movie.cast = 'Robert De Niro, Al Pacino, Amy Brenneman'
+        self.movie.save()
+
+        self.assertEqual(self.credits(), [
+            ('Robert De Niro', 'cast', 0), ('Al Pacino', 'cast', 1), ('Amy Brenneman', 'cast', 2),
+            ('Michael Mann', 'director', 0),
+        ])
+        self.assertTrue(MovieCredit.objects.filter(id=unchanged).exists())
+        # Val Kilmer has no other credits left
+        self.assertFalse(Person.objects.filter(name='Val Kilmer').exists())
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(credits.sync_movie_credits(self.movie), 0)
+        self.assertFalse([q for q in queries if q['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))])
+
+    def test_people_with_other_credits_are_kept(self):
+        other = make_movie('The Insider', director='Michael Mann', cast='Al Pacino')
+        self.movie.director = 'Someone Else'
+        self.movie.save()
+        self.assertTrue(Person.objects.filter(name='Michael Mann').exists())
+
+        self.movie.delete()
+        other.delete()
+        self.assertFalse(Person.objects.exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHES, STORAGES=PLAIN_STORAGES)
+class FilteredFacetCountTests(TestCase):
+    """Facet counts of a narrowed movie list (store/facets.py)"""
+
+    def setUp(self):
+        self.one = make_movie('Alpha One', genre='comedy')
+        self.two = make_movie('Alpha Two', genre='drama')
+        make_movie('Beta', genre='comedy')
+
+    def genre_counts(self, **params):
+        response = self.client.get(reverse('movie_list'), params, HTTP_HOST='localhost')
+        facets = {facet['name']: facet for facet in response.context['facets']}
+        return {option['label']: option['count'] for option in facets['genre']['options']}
+
+    def test_counts_follow_the_search(self):
+        self.assertEqual(self.genre_counts(search='alpha'), {'Comedy': 1, 'Drama': 1})
+        # A facet's own selection does not narrow its counts
+        self.assertEqual(self.genre_counts(search='alpha', genre='drama'), {'Comedy': 1, 'Drama': 1})
+
+    def test_repeated_request_uses_cached_counts(self):
+        self.genre_counts(search='beta')  # builds the autocomplete index
+        with CaptureQueriesContext(connection) as first:
+            self.genre_counts(search='alpha')
+        with CaptureQueriesContext(connection) as second:
+            self.genre_counts(search='alpha')
+        self.assertEqual(len(first) - len(second), 5)
+
+    def test_counts_follow_movie_edits_and_deletes(self):
+        self.assertEqual(self.genre_counts(search='alpha'), {'Comedy': 1, 'Drama': 1})
+        self.two.genre = 'comedy'
+        self.two.save()
+        self.assertEqual(self.genre_counts(search='alpha'), {'Comedy': 2})
+        self.one.delete()
+        self.assertEqual(self.genre_counts(search='alpha'), {'Comedy': 1})
+
+
+calls = []
+
+
+@taskqueue.task(name='tests.record')
+def record_call(value):
+    calls.append(value)
+
+
+@taskqueue.task(name='tests.fail', max_attempts=2)
+def always_fail():
+    raise RuntimeError('boom')
+
+
+@override_settings(CACHES=LOCMEM_CACHES, TASK_QUEUE_EAGER=False)
+class TaskQueueTests(TestCase):
+    """Claiming, retries, leases and coalescing (store/taskqueue.py, store/tasks.py)"""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_claim_marks_tasks_running_once(self):
+        for value in range(3):
+            record_call.delay(value)
+        record_call.schedule(3600, 'later')
+
+        first = taskqueue.claim('worker-a', 2)
+        self.assertEqual([row.args for row in first], [[0], [1]])
+        self.assertTrue(all(row.status == 'running' and row.locked_by == 'worker-a' for row in first))
+        self.assertEqual([row.args for row in taskqueue.claim('worker-b', 5)], [[2]])
+        self.assertEqual(taskqueue.claim('worker-c', 5), [])
+
+        for row in first:
+            taskqueue.run(row)
+        self.assertEqual(calls, [0, 1])
+        self.assertEqual(Task.objects.filter(status='done').count(), 2)
+
+    def test_failed_task_is_retried_then_fails(self):
+        always_fail.delay()
+        row = taskqueue.run(taskqueue.claim('worker', 1)[0])
+        self.assertEqual((row.status, row.attempts), ('queued', 1))
+        self.assertGreater(row.run_at, timezone.now())
+
+        Task.objects.update(run_at=timezone.now())
+        row = taskqueue.run(taskqueue.claim('worker', 1)[0])
+        self.assertEqual((row.status, row.attempts), ('failed', 2))
+        self.assertIn('boom', row.last_error)
+
+    def test_lapsed_lease_is_requeued_and_counted(self):
+        always_fail.delay()
+        taskqueue.claim('dead-worker', 1)
+        Task.objects.update(locked_at=timezone.now() - taskqueue.STALE_LOCK_TIMEOUT * 2)
+
+        self.assertEqual(taskqueue.release_stale(), 1)
+        row = Task.objects.get()
+        self.assertEqual((row.status, row.attempts, row.locked_by), ('queued', 1, ''))
+
+        taskqueue.claim('dead-worker', 1)
+        Task.objects.update(locked_at=timezone.now() - taskqueue.STALE_LOCK_TIMEOUT * 2)
+        taskqueue.release_stale()
+        row = Task.objects.get()
+        self.assertEqual((row.status, row.attempts), ('failed', 2))
+
+    def test_heartbeat_keeps_long_task_leased(self):
+        record_call.delay('slow')
+        row = taskqueue.claim('worker', 1)[0]
+        Task.objects.update(locked_at=timezone.now() - taskqueue.STALE_LOCK_TIMEOUT * 2)
+        self.assertEqual(taskqueue.heartbeat('worker', [row.id]), 1)
+        self.assertEqual(taskqueue.release_stale(), 0)
+        self.assertEqual(Task.objects.get().status, 'running')
+
+    def test_orders_share_one_trending_refresh_per_region(self):
+        user = make_users(1)[0]
+        movie = make_movie()
+        self.client.force_login(user)
+        for _ in range(3):
+            Cart.objects.get_or_create(user=user)[0].movies.add(movie)
+            self.client.post(reverse('place_order'), HTTP_HOST='localhost')
+
+        queued = Task.objects.filter(name=tasks.refresh_trending.task_name, status='queued')
+        self.assertEqual(sorted(row.args for row in queued), [['global'], ['southeast']])
+        self.assertEqual(Task.objects.filter(name=tasks.refresh_sales_facts.task_name).count(), 1)
+
+
+def png_bytes(size):
+    from PIL import Image
+
+    buffer = BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+@override_settings(CACHES=LOCMEM_CACHES, STORAGES=PLAIN_STORAGES, PROFILE_PICTURE_MAX_BYTES=100 * 1024)
+class ProfilePictureTests(TestCase):
+    """Upload size cap (store/uploads.py) and the picture task's failure handling"""
+
+    def setUp(self):
+        self.user = make_users(1)[0]
+        self.client = Client(HTTP_HOST='localhost')
+        self.client.force_login(self.user)
+
+    def post_picture(self, content, client=None):
+        picture = SimpleUploadedFile('me.png', content, content_type='image/png')
+        return (client or self.client).post(reverse('profile_edit'), {
+            'first_name': 'Ann', 'last_name': 'Lee', 'email': 'ann@example.com', 'bio': 'hi',
+            'profile_picture': picture,
+        })
+
+    def test_oversized_upload_is_dropped_while_streaming(self):
+        received = []
+        original = MemoryFileUploadHandler.receive_data_chunk
+
+        def spy(handler, raw_data, start):
+            received.append(len(raw_data))
+            return original(handler, raw_data, start)
+
+        # Past the cap the rest of the file is never handed on to be buffered
+        with mock.patch.object(MemoryFileUploadHandler, 'receive_data_chunk', spy):
+            response = self.post_picture(b'\0' * 300 * 1024)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Profile pictures can be at most')
+        self.assertLessEqual(sum(received), 100 * 1024)
+        self.assertFalse(UserProfile.objects.get(user=self.user).profile_picture)
+        self.assertFalse(Task.objects.exists())
+
+    def test_picture_under_cap_is_saved_and_queued(self):
+        response = self.post_picture(png_bytes((20, 20)))
+        self.assertRedirects(response, reverse('profile'), fetch_redirect_response=False)
+        self.assertTrue(UserProfile.objects.get(user=self.user).profile_picture)
+        self.assertEqual(Task.objects.get().name, tasks.process_profile_picture.task_name)
+
+    def test_csrf_is_still_checked(self):
+        client = Client(HTTP_HOST='localhost', enforce_csrf_checks=True)
+        client.force_login(self.user)
+        self.assertEqual(self.post_picture(png_bytes((20, 20)), client=client).status_code, 403)
+
+    @override_settings(PROFILE_PICTURE_MAX_DIMENSION=10)
+    def test_oversized_image_fails_without_retry(self):
+        profile = UserProfile.objects.get_or_create(user=self.user)[0]
+        profile.profile_picture.save('big.png', ContentFile(png_bytes((20, 20))))
+        tasks.process_profile_picture.delay(profile.id)
+
+        row = taskqueue.run(taskqueue.claim('worker', 1)[0])
+        self.assertEqual((row.status, row.attempts), ('failed', 1))
+        self.assertIn('too large to decode', row.last_error)
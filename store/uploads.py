@@ -0,0 +1,33 @@
+"""
+Upload handlers.
+
+Django streams a file upload to memory or a temporary file before any form
+sees it, so a size check in form validation only runs once the whole body has
+been received. FileSizeLimitHandler enforces the cap while the upload is
+streaming instead. It must be installed before anything reads request.POST
+or request.FILES (see views.profile_edit).
+"""
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+
+
+class FileSizeLimitHandler(FileUploadHandler):
+    """
+    Drop any uploaded file once it passes `max_bytes`. The rest of the file is
+    discarded unbuffered, the other form fields are still parsed, and the
+    dropped fields are listed in `rejected` so the form can report them.
+    """
+
+    def __init__(self, max_bytes, request=None):
+        super().__init__(request)
+        self.max_bytes = max_bytes
+        self.rejected = set()
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > self.max_bytes:
+            self.rejected.add(self.field_name)
+            raise SkipFile()
+        return raw_data
+
+    def file_complete(self, file_size):
+        # Leave the file to the next handler (memory or temporary file)
+        return None
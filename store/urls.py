@@ -1,6 +1,6 @@
 
 from django.urls import path
-from . import views
+from . import api, metrics, views
 
 urlpatterns = [
     # Home
@@ -18,6 +18,8 @@ urlpatterns = [
     # Movies
     path('movies/', views.movie_list, name='movie_list'),
     path('movies/<int:movie_id>/', views.movie_detail, name='movie_detail'),
+    path('api/autocomplete/', views.api_autocomplete, name='api_autocomplete'),
+    path('people/<int:person_id>/', views.person_detail, name='person_detail'),
     
     # Cart
     path('cart/', views.cart_view, name='cart'),
@@ -35,6 +37,11 @@ urlpatterns = [
     path('reviews/<int:review_id>/update/', views.update_review, name='update_review'),
     path('reviews/<int:review_id>/delete/', views.delete_review, name='delete_review'),
     path('reviews/<int:review_id>/report/', views.report_review, name='report_review'),
+    path('moderation/', views.moderation_queue, name='moderation_queue'),
+    
+    # Staff reporting
+    path('analytics/', views.analytics_dashboard, name='analytics_dashboard'),
+    path('api/analytics/sales/', api.sales_report, name='api_sales_report'),
 
 
     # Popularity
@@ -44,4 +51,14 @@ urlpatterns = [
     
     # Ratings
     path('movies/<int:movie_id>/rate/', views.submit_rating, name='submit_rating'),
+    
+    # JSON API
+    path('api/movies/', api.movie_list, name='api_movie_list'),
+    path('api/movies/batch/', api.movie_batch, name='api_movie_batch'),
+    path('api/movies/<int:movie_id>/', api.movie_detail, name='api_movie_detail'),
+    path('api/ratings/bulk/', api.bulk_rate, name='api_bulk_rate'),
+    path('api/token/', api.issue_api_token, name='api_token'),
+
+    # Monitoring
+    path('metrics', metrics.metrics_view, name='metrics'),
 ]
@@ -1,23 +1,50 @@
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
 from django.contrib.auth import login, logout
-from django.contrib.auth.decorators import login_required
+from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.db.models import Q, Avg, Sum
+from django.db.models import Avg, Value
+from django.db.models.functions import Coalesce
 from django.core.paginator import Paginator
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
-from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
 from django.http import JsonResponse
 from .models import Order, OrderItem
 
-from .models import Movie, Review, Cart, Order, OrderItem, Rating, UserProfile
+from .models import Movie, Review, Cart, Order, OrderItem, Rating, UserProfile, Person, MovieCredit
 from .forms import CustomUserCreationForm, ReviewForm, MovieSearchForm, UserProfileForm
+from .recommendations import get_related_movies, related_movie_ids
+from .feed import get_home_feed
+from .facets import FACETS, apply_facet_filters, get_facet_counts, get_filtered_facet_counts
+from .autocomplete import search_movies, suggest
+from .credits import split_credits
+from .rating_buffer import submit_buffered_rating
+from . import moderation
+from .conditional import conditional_page
+from .ratelimit import login_slot, record_rejection
+from .uploads import FileSizeLimitHandler
+from .tasks import TRENDING_CACHE_TIMEOUT, compute_trending, trending_cache_key, refresh_rating_stats, process_profile_picture, schedule_sales_facts_refresh, schedule_trending_refresh
+from . import analytics
+from .metrics import CART_ADDS, ORDER_ITEMS, ORDERS_PLACED, RATINGS_SUBMITTED, record_cache_lookup
+
+
+logger = logging.getLogger(__name__)
 
 
+@conditional_page(lambda request: ['catalog'])
 def home(request):
     """Home page with app information"""
     featured_movies = Movie.objects.all()[:6]  # Show 6 featured movies
-    return render(request, 'store/home.html', {'featured_movies': featured_movies})
+    recommended_movies = get_home_feed(request.user) if request.user.is_authenticated else []
+    return render(request, 'store/home.html', {
+        'featured_movies': featured_movies,
+        'recommended_movies': recommended_movies,
+    })
 
 
 def register_view(request):
@@ -37,12 +64,19 @@ def register_view(request):
 
 
 def login_view(request):
-    """User login"""
+    """User login (password checks share a few per-process slots, see store/ratelimit.py)"""
     if request.method == 'POST':
         from django.contrib.auth import authenticate
         username = request.POST['username']
         password = request.POST['password']
-        user = authenticate(request, username=username, password=password)
+        with login_slot() as acquired:
+            if not acquired:
+                record_rejection('login')
+                messages.error(request, 'We are handling a lot of logins right now. Please try again in a moment.')
+                response = render(request, 'store/login.html', status=429)
+                response['Retry-After'] = '5'
+                return response
+            user = authenticate(request, username=username, password=password)
         if user is not None:
             login(request, user)
             messages.success(request, 'Login successful!')
@@ -59,33 +93,117 @@ def logout_view(request):
     return redirect('home')
 
 
+@conditional_page(lambda request: ['catalog'])
 def movie_list(request):
-    """List all movies with search functionality"""
+    """List all movies with search and faceted filtering"""
     movies = Movie.objects.all()
     search_form = MovieSearchForm(request.GET)
+    # How the list is narrowed before the facets, for the facet counts cache
+    filters = {}
     
     if search_form.is_valid() and search_form.cleaned_data['search']:
         search_query = search_form.cleaned_data['search']
-        movies = movies.filter(title__icontains=search_query)
-    
-    # Add average rating to each movie
-    for movie in movies:
-        movie.avg_rating = movie.reviews.aggregate(avg_rating=Avg('rating'))['avg_rating'] or 0
+        movies = search_movies(movies, search_query)
+        filters['search'] = search_query
+    
+    # Filter by director/cast member through the indexed credits table
+    person = None
+    person_id = request.GET.get('person')
+    if person_id and person_id.isdigit():
+        person = Person.objects.filter(id=person_id).first()
+        if person:
+            movies = movies.filter(id__in=MovieCredit.objects.filter(person=person).values('movie_id'))
+            filters['person'] = person.id
+    
+    unfaceted = movies
+    movies, selected_facets = apply_facet_filters(movies, request.GET)
+    
+    # Average rating is computed in the page query instead of once per movie
+    # (explicit order_by: Meta.ordering is not applied to GROUP BY queries)
+    movies = movies.annotate(
+        avg_rating=Coalesce(Avg('reviews__rating'), Value(0.0))
+    ).order_by('-created_at', '-id')
     
     paginator = Paginator(movies, 12)  # Show 12 movies per page
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
+    # Facet sidebar: precomputed catalog counts for the unfiltered list, cached
+    # counts of the filtered results otherwise; each option links to the toggled filter
+    if filters or selected_facets:
+        facet_counts = get_filtered_facet_counts(unfaceted, selected_facets, filters)
+    else:
+        facet_counts = get_facet_counts()
+    facets = []
+    for name, label in FACETS:
+        options = []
+        for value, value_label, count in facet_counts[name]:
+            params = request.GET.copy()
+            params.pop('page', None)
+            selected = selected_facets.get(name) == value
+            if selected:
+                params.pop(name, None)
+            else:
+                params[name] = value
+            options.append({
+                'label': value_label,
+                'count': count,
+                'selected': selected,
+                'query': params.urlencode(),
+            })
+        if options:
+            facets.append({'name': name, 'label': label, 'options': options})
+    
+    # Querystring without the page number, for pagination links
+    page_params = request.GET.copy()
+    page_params.pop('page', None)
+    
     return render(request, 'store/movie_list.html', {
         'page_obj': page_obj,
         'search_form': search_form,
+        'facets': facets,
+        'selected_facets': selected_facets,
+        'person': person,
+        'filter_query': page_params.urlencode(),
     })
 
 
+def api_autocomplete(request):
+    """Search-as-you-type suggestions for titles, directors and cast"""
+    query = request.GET.get('q', '')[:100]
+    results = suggest(query)
+    for result in results:
+        if result['movie_id']:
+            result['url'] = reverse('movie_detail', args=[result['movie_id']])
+        else:
+            result['url'] = reverse('person_detail', args=[result['person_id']])
+    return JsonResponse({'query': query, 'results': results})
+
+
+def person_detail(request, person_id):
+    """All movies a person directed or appeared in"""
+    person = get_object_or_404(Person, id=person_id)
+    credits = person.credits.select_related('movie').order_by('-movie__release_year', 'movie__title')
+    directed = [credit.movie for credit in credits if credit.role == 'director']
+    acted = [credit.movie for credit in credits if credit.role == 'cast']
+    return render(request, 'store/person_detail.html', {
+        'person': person,
+        'directed': directed,
+        'acted': acted,
+    })
+
+
+def movie_detail_scopes(request, movie_id):
+    # The related movies' titles, prices and images are rendered on the page too
+    related = [f'movie:{related_id}' for related_id in related_movie_ids(movie_id)]
+    return [f'movie:{movie_id}', 'recommendations', *related]
+
+
+@conditional_page(movie_detail_scopes)
 def movie_detail(request, movie_id):
     """Movie details and reviews"""
     movie = get_object_or_404(Movie, id=movie_id)
-    reviews = movie.reviews.filter(is_reported=False)  # Only show non-reported reviews
+    reviews = movie.reviews.filter(is_reported=False).select_related('user')  # Only show non-reported reviews
     
     # Calculate average rating from both reviews and quick ratings
     review_ratings = reviews.aggregate(avg_rating=Avg('rating'))['avg_rating'] or 0
@@ -118,8 +236,13 @@ def movie_detail(request, movie_id):
     # Review form
     review_form = ReviewForm()
     
+    directors, cast = split_credits(movie)
+    
     return render(request, 'store/movie_detail.html', {
         'movie': movie,
+        'directors': directors,
+        'cast': cast,
+        'related_movies': get_related_movies(movie),
         'reviews': reviews,
         'avg_rating': avg_rating,
         'user_review': user_review,
@@ -145,8 +268,10 @@ def add_to_cart(request, movie_id):
     
     if movie not in cart.movies.all():
         cart.movies.add(movie)
+        CART_ADDS.labels(result='added').inc()
         messages.success(request, f'{movie.title} added to cart!')
     else:
+        CART_ADDS.labels(result='already_in_cart').inc()
         messages.info(request, f'{movie.title} is already in your cart!')
     
     return redirect('movie_detail', movie_id=movie_id)
@@ -201,10 +326,17 @@ def place_order(request):
         region=region     # 👈 stores the user’s region on every order
     )
 
+    items = 0
     for movie in cart.movies.all():
         OrderItem.objects.create(order=order, movie=movie, quantity=1, price=movie.price)
+        items += 1
 
     cart.movies.clear()
+    ORDERS_PLACED.labels(region=region).inc()
+    ORDER_ITEMS.labels(region=region).inc(items)
+    schedule_trending_refresh(region)
+    schedule_trending_refresh('global')
+    schedule_sales_facts_refresh()
     messages.success(request, f"Order #{order.id} placed successfully!")
     return redirect('orders')
 
@@ -226,6 +358,7 @@ def create_review(request, movie_id):
         review.movie = movie
         review.user = request.user
         review.save()
+        refresh_rating_stats.delay(movie.id)
         messages.success(request, 'Review created successfully!')
     else:
         messages.error(request, 'Please correct the errors below.')
@@ -242,6 +375,7 @@ def edit_review(request, review_id):
         form = ReviewForm(request.POST, instance=review)
         if form.is_valid():
             form.save()
+            refresh_rating_stats.delay(review.movie_id)
             messages.success(request, 'Review updated successfully!')
             return redirect('movie_detail', movie_id=review.movie.id)
     else:
@@ -262,6 +396,7 @@ def update_review(request, review_id):
     form = ReviewForm(request.POST, instance=review)
     if form.is_valid():
         form.save()
+        refresh_rating_stats.delay(review.movie_id)
         messages.success(request, 'Review updated successfully!')
     else:
         messages.error(request, 'Please correct the errors below.')
@@ -276,6 +411,7 @@ def delete_review(request, review_id):
     review = get_object_or_404(Review, id=review_id, user=request.user)
     movie_id = review.movie.id
     review.delete()
+    refresh_rating_stats.delay(movie_id)
     messages.success(request, 'Review deleted successfully!')
     return redirect('movie_detail', movie_id=movie_id)
 
@@ -300,48 +436,96 @@ def report_review(request, review_id):
             'message': 'This review has already been reported.'
         })
     
-    # Mark review as reported
-    review.is_reported = True
-    review.save()
+    # Mark review as reported (hidden until a moderator approves it)
+    if not moderation.report_review(review):
+        return JsonResponse({
+            'success': False,
+            'message': 'This review has already been checked by a moderator.'
+        })
     
     return JsonResponse({
         'success': True, 
         'message': 'Review reported successfully. It has been removed from the page.'
     })
 
+
+# Not django.contrib.admin's decorator, which would import the admin with the views
+staff_member_required = user_passes_test(lambda u: u.is_active and u.is_staff)
+
+
+@staff_member_required
+def moderation_queue(request):
+    """Staff queue of reported reviews with bulk approve/remove"""
+    if request.method == 'POST':
+        review_ids = [int(pk) for pk in request.POST.getlist('review_ids') if pk.isdigit()]
+        action = request.POST.get('action')
+        if not review_ids:
+            messages.error(request, 'Select at least one review.')
+        elif action == 'approve':
+            count = moderation.approve_reviews(review_ids)
+            messages.success(request, f'Approved {count} review{"s" if count != 1 else ""}.')
+        elif action == 'remove':
+            count = moderation.remove_reviews(review_ids)
+            messages.success(request, f'Removed {count} review{"s" if count != 1 else ""}.')
+        else:
+            messages.error(request, 'Unknown moderation action.')
+        return redirect(f"{reverse('moderation_queue')}?page={request.POST.get('page', 1)}")
+    
+    paginator = Paginator(moderation.reported_reviews(), 50)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    return render(request, 'store/moderation_queue.html', {'page_obj': page_obj})
+
+
+@staff_member_required
+def analytics_dashboard(request):
+    """Staff sales report: revenue, units or orders per day/week/month"""
+    report, error = None, None
+    try:
+        options = analytics.report_params(request.GET)
+        report = analytics.sales_report(**options)
+    except ImportError:
+        error = 'NumPy is not installed. Install it with: pip install numpy'
+    except ValueError as exc:
+        error = str(exc)
+        options = {'period': 'week', 'metric': 'revenue', 'by': 'region'}
+    
+    rows = []
+    if report:
+        rows = [
+            {'period': period, 'values': [item['values'][index] for item in report['series']], 'total': report['totals'][index]}
+            for index, period in enumerate(report['periods'])
+        ]
+    return render(request, 'store/analytics.html', {
+        'report': report,
+        'rows': rows,
+        'error': error,
+        'options': options,
+        'periods': analytics.PERIODS,
+        'metrics': analytics.METRICS,
+        'breakdowns': analytics.BREAKDOWNS,
+        'regions': Order.REGION_CHOICES,
+    })
+
     # Page: renders the map
 def popularity_map(request):
     regions = dict(Order.REGION_CHOICES)
     return render(request, 'store/popularity_map.html', {'regions': regions})
 
 
+@conditional_page(lambda request, region: ['orders'], anonymous_only=False)
 def api_trending_by_region(request, region):
     """Returns top movies by region, or global if region='global'."""
     valid_regions = {k for k, _ in Order.REGION_CHOICES}
-
-    # Debug log (appears in console)
-    print(f"DEBUG: Requested region = {region}")
-
-    # ✅ Handle the global case first
-    if region == "global":
-        qs = (OrderItem.objects
-              .values('movie__title')
-              .annotate(total=Sum('quantity'))
-              .order_by('-total')[:10])
-        print("DEBUG: Using GLOBAL query")
-    elif region in valid_regions:
-        qs = (OrderItem.objects
-              .filter(order__region=region)
-              .values('movie__title')
-              .annotate(total=Sum('quantity'))
-              .order_by('-total')[:10])
-        print(f"DEBUG: Using REGION query: {region}")
-    else:
-        print("DEBUG: INVALID region triggered")
+    if region != 'global' and region not in valid_regions:
         return JsonResponse({'error': f'invalid region: {region}'}, status=400)
 
-    data = [{'title': row['movie__title'], 'count': row['total']} for row in qs]
-    print(f"DEBUG: Returned {len(data)} movies")
+    # Rollups are refreshed by the worker after each order; compute only on a cold cache
+    data = cache.get(trending_cache_key(region))
+    record_cache_lookup('trending', data is not None)
+    if data is None:
+        data = compute_trending(region)
+        cache.set(trending_cache_key(region), data, TRENDING_CACHE_TIMEOUT)
+        logger.info('Computed trending for %s on a cold cache', region, extra={'region': region})
     return JsonResponse({'region': region, 'top': data})
 
 @login_required
@@ -363,6 +547,20 @@ def submit_rating(request, movie_id):
             'message': 'Invalid rating value.'
         })
     
+    if settings.RATING_WRITE_BEHIND:
+        # Buffered write: coalesced and flushed in bulk, average is optimistic
+        created, avg_rating, total_count = submit_buffered_rating(movie.id, request.user.id, rating_value)
+        action = 'submitted' if created else 'updated'
+        RATINGS_SUBMITTED.labels(result=action).inc()
+        return JsonResponse({
+            'success': True,
+            'message': f'Rating {action} successfully!',
+            'rating': rating_value,
+            'avg_rating': round(avg_rating, 1),
+            'total_count': total_count,
+            'buffered': True,
+        })
+    
     # Create or update rating
     rating, created = Rating.objects.update_or_create(
         movie=movie,
@@ -384,6 +582,7 @@ def submit_rating(request, movie_id):
         avg_rating = 0
     
     action = 'submitted' if created else 'updated'
+    RATINGS_SUBMITTED.labels(result=action).inc()
     
     return JsonResponse({
         'success': True,
@@ -402,14 +601,36 @@ def profile_view(request):
 
 
 @login_required
+@csrf_exempt
 def profile_edit(request):
     """Edit user profile"""
+    # The picture size cap is applied while the upload streams in. Upload
+    # handlers must be installed before request.POST is read, which the CSRF
+    # middleware would do first, so the CSRF check runs in _profile_edit.
+    size_limit = FileSizeLimitHandler(settings.PROFILE_PICTURE_MAX_BYTES, request)
+    request.upload_handlers.insert(0, size_limit)
+    return _profile_edit(request, size_limit)
+
+
+@csrf_protect
+def _profile_edit(request, size_limit):
     profile, created = UserProfile.objects.get_or_create(user=request.user)
     
     if request.method == 'POST':
-        form = UserProfileForm(request.POST, request.FILES, instance=profile)
+        replaced = profile.picture_files()
+        form = UserProfileForm(
+            request.POST, request.FILES, instance=profile, rejected_files=size_limit.rejected,
+        )
         if form.is_valid():
+            new_picture = 'profile_picture' in request.FILES
+            if new_picture:
+                # Templates fall back to the new picture until its avatars are rendered
+                profile.avatar_small = profile.avatar_large = None
             form.save()
+            if new_picture:
+                # Resizing happens in the worker, not on the request thread; the
+                # old files are deleted once the new avatars exist
+                process_profile_picture.delay(profile.id, replaced)
             messages.success(request, 'Profile updated successfully!')
             return redirect('profile')
     else:
@@ -0,0 +1,103 @@
+"""
+Warm-up for freshly started web workers (settings.WARM_UP_ON_STARTUP).
+
+A new worker normally does a good deal of one-off work on its first
+requests: importing the views and admin while loading the URLconf, building
+the resolver's reverse lookup tables (needed by every {% url %}), compiling
+each template into the cached loader and reading the static files manifest.
+An autoscaled worker that receives traffic right away serves those first
+requests noticeably slower than the rest. warm_up() does the same work when
+config/wsgi.py (or asgi.py) is imported, before the server hands the worker
+any requests.
+
+Nothing here touches the database or the shared caches, so it is safe to
+run before the server forks its workers.
+
+`manage.py profile_startup` shows what warm-up costs and what it saves.
+"""
+import logging
+import os
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.template import TemplateDoesNotExist, TemplateSyntaxError
+from django.template.loader import get_template
+from django.urls import get_resolver
+
+
+logger = logging.getLogger(__name__)
+
+# Apps whose templates are compiled up front; the admin's are left to be
+# compiled on first use, as most workers never render them
+TEMPLATE_APPS = ['store']
+
+
+def _populate(resolver):
+    # Reverse tables of namespaced includes (admin:..., etc.) are built lazily
+    # on their own resolvers
+    resolver.reverse_dict
+    for _prefix, included in resolver.namespace_dict.values():
+        _populate(included)
+
+
+def load_urls():
+    """Import the URLconf (views, admin) and build every resolver's lookup tables"""
+    _populate(get_resolver())
+
+
+def template_names():
+    """Names of the templates under TEMPLATES['DIRS'] and the TEMPLATE_APPS' template directories"""
+    directories = [str(directory) for backend in settings.TEMPLATES for directory in backend.get('DIRS', [])]
+    directories += [os.path.join(apps.get_app_config(label).path, 'templates') for label in TEMPLATE_APPS]
+    names = []
+    for directory in directories:
+        for root, _dirs, files in os.walk(directory):
+            for filename in files:
+                if filename.endswith(('.html', '.txt', '.xml')):
+                    names.append(os.path.relpath(os.path.join(root, filename), directory).replace(os.sep, '/'))
+    return sorted(set(names))
+
+
+def load_templates():
+    """Compile every template into the cached loader; returns how many were loaded"""
+    loaded = 0
+    for name in template_names():
+        try:
+            get_template(name)
+        except (TemplateDoesNotExist, TemplateSyntaxError):
+            # Rendering it fails the same way later; not a reason to keep the worker down
+            logger.exception('Could not preload template %s', name)
+        else:
+            loaded += 1
+    return loaded
+
+
+def load_static_manifest():
+    """Read the collectstatic manifest that {% static %} resolves hashed names from"""
+    getattr(staticfiles_storage, 'hashed_files', None)
+
+
+STEPS = [
+    ('urls', load_urls),
+    ('templates', load_templates),
+    ('static', load_static_manifest),
+]
+
+
+def warm_up():
+    """Run every warm-up step; returns {step: seconds}. A failing step is logged and skipped."""
+    timings = {}
+    for name, step in STEPS:
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception:
+            logger.exception('Warm-up step %s failed', name)
+        timings[name] = time.perf_counter() - started
+    logger.info(
+        'Worker warmed up in %.0fms', sum(timings.values()) * 1000,
+        extra={'steps_ms': {name: round(seconds * 1000, 1) for name, seconds in timings.items()}},
+    )
+    return timings